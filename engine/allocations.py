@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import tracemalloc
+from typing import NamedTuple, List, Dict, Tuple, Optional
+
+# Whatever tracemalloc and the tracker allocate for themselves is left out.
+SNAPSHOT_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+
+
+class LineAllocations(NamedTuple):
+    filename: str
+    lineno: int
+    blocks: int
+    size: int
+
+
+class FrameAllocations(NamedTuple):
+    blocks: int
+    size: int
+    lines: List[LineAllocations]
+
+
+class AllocationTracker:
+    __slots__ = 'traceback_depth', 'started_tracing', 'frame_snapshot', 'frame_count', 'totals'
+
+    # Counts the memory blocks each frame leaves allocated, by the source line that allocated them, by comparing
+    # tracemalloc snapshots from the start and the end of the frame. Objects that only live during the frame
+    # cancel out, which is also how CPython's garbage collector counts: it runs once enough more container
+    # objects have been allocated than freed, so every block a steady-state frame keeps brings the next pause
+    # closer. Taking snapshots is slow, this is only for finding where frames allocate.
+
+    def __init__(self, traceback_depth: int = 1) -> None:
+        self.traceback_depth = traceback_depth
+        self.started_tracing = False
+        self.frame_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.frame_count = 0
+        self.totals: Dict[Tuple[str, int], Tuple[int, int]] = {}
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_depth)
+            self.started_tracing = True
+
+    def stop(self) -> None:
+        self.frame_snapshot = None
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def clear(self) -> None:
+        self.frame_count = 0
+        self.totals.clear()
+
+    def begin_frame(self) -> None:
+        if tracemalloc.is_tracing():
+            self.frame_snapshot = take_snapshot()
+
+    def end_frame(self) -> Optional[FrameAllocations]:
+        if not self.frame_snapshot:
+            return None
+        differences = take_snapshot().compare_to(self.frame_snapshot, 'lineno')
+        self.frame_snapshot = None
+        lines: List[LineAllocations] = []
+        for difference in differences:
+            # Blocks freed during the frame were allocated by an earlier one, which has already been counted.
+            if difference.count_diff <= 0:
+                continue
+            frame = difference.traceback[0]
+            lines.append(LineAllocations(frame.filename, frame.lineno, difference.count_diff, difference.size_diff))
+            blocks, size = self.totals.get((frame.filename, frame.lineno), (0, 0))
+            self.totals[frame.filename, frame.lineno] = blocks + difference.count_diff, size + difference.size_diff
+        self.frame_count += 1
+        return FrameAllocations(sum(line.blocks for line in lines), sum(line.size for line in lines), lines)
+
+    def report(self, limit: int = 10) -> str:
+        frame_count = max(1, self.frame_count)
+        blocks = sum(blocks for blocks, _ in self.totals.values())
+        size = sum(size for _, size in self.totals.values())
+        lines = [f'{self.frame_count} frames, {blocks / frame_count:.1f} blocks ({size / frame_count:.0f} B) per frame']
+        top = sorted(self.totals.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        for (filename, lineno), (line_blocks, line_size) in top:
+            lines.append(
+                f'{line_blocks / frame_count:>8.1f} blocks {line_size / frame_count:>8.0f} B  {filename}:{lineno}')
+        return '\n'.join(lines)
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from time import perf_counter
+from typing import Optional, Dict, Deque, Callable, Iterable
+
+from engine.sdl import Renderer, Texture, Surface, Destroyable
+from engine.utils import Rectangle
+
+
+class AssetHandle:
+    __slots__ = 'path', 'decoded', 'texture', 'error'
+
+    # Stands for a texture that is still being loaded, texture is set once it has been created.
+
+    def __init__(self, path: bytes, decoded: Future[Surface]) -> None:
+        self.path = path
+        self.decoded = decoded
+        self.texture: Optional[Texture] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.texture is not None
+
+    def result(self) -> Texture:
+        if self.error:
+            raise self.error
+        if self.texture is None:
+            raise RuntimeError(f'{self.path!r} has not been loaded yet')
+        return self.texture
+
+
+class AssetLoader(Destroyable):
+    __slots__ = 'renderer', 'decode', 'executor', 'handles', 'pending', 'frame_budget'
+
+    # Images are decoded into surfaces on a pool of worker threads. Textures can only be created on
+    # the main thread, so update turns decoded surfaces into textures there, in the order they were
+    # requested, until the frame's budget (in milliseconds) is spent.
+
+    def __init__(
+            self, renderer: Renderer, workers: int = 4, frame_budget: float = 2,
+            decode: Callable[[bytes], Surface] = Surface.load) -> None:
+        self.renderer = renderer
+        self.decode = decode
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='AssetLoader')
+        self.handles: Dict[bytes, AssetHandle] = {}
+        self.pending: Deque[AssetHandle] = deque()
+        self.frame_budget = frame_budget
+
+    def load(self, path: bytes) -> AssetHandle:
+        handle = self.handles.get(path)
+        if handle is None:
+            handle = self.handles[path] = AssetHandle(path, self.executor.submit(self.decode, path))
+            self.pending.append(handle)
+        return handle
+
+    def load_all(self, paths: Iterable[bytes]) -> Dict[bytes, AssetHandle]:
+        return {path: self.load(path) for path in paths}
+
+    def update(self) -> int:
+        # Returns how many textures were created.
+        deadline = perf_counter() + self.frame_budget / 1000
+        created = 0
+        while self.pending and self.pending[0].decoded.done():
+            self.create_texture(self.pending.popleft())
+            created += 1
+            if perf_counter() >= deadline:
+                break
+        return created
+
+    def wait(self, handles: Iterable[AssetHandle]) -> None:
+        # Blocks until the given handles are ready, for loading screens and start-up.
+        # Anything requested before them is created too, keeping the order.
+        for handle in handles:
+            while handle in self.pending:
+                self.create_texture(self.pending.popleft())
+
+    def create_texture(self, handle: AssetHandle) -> None:
+        try:
+            surface = handle.decoded.result()
+        except BaseException as error:
+            handle.error = error
+            return
+        if self.handles.get(handle.path) is not handle:
+            # Unloaded while it was being decoded.
+            surface.destroy()
+            return
+        try:
+            handle.texture = self.renderer.create_texture_from_surface(
+                surface, Rectangle(upper_left=0, dimensions=surface.dimensions))
+        except BaseException as error:
+            handle.error = error
+        finally:
+            surface.destroy()
+
+    def unload(self, path: bytes) -> None:
+        handle = self.handles.pop(path, None)
+        if handle and handle.texture:
+            handle.texture.destroy()
+            handle.texture = None
+
+    def destroy(self) -> None:
+        self.executor.shutdown(wait=True)
+        for handle in self.pending:
+            if handle.decoded.exception() is None:
+                handle.decoded.result().destroy()
+        self.pending.clear()
+        for handle in self.handles.values():
+            if handle.texture:
+                handle.texture.destroy()
+        self.handles.clear()
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import ctypes
+from typing import Dict
+
+import numpy as np
+
+from engine.graphics import Camera
+from engine.sdl import Texture, RawRect, RawVertex, Flip, Color
+from engine.utils import Rectangle
+
+VERTEX_DTYPE = np.dtype([
+    ('x', np.float32), ('y', np.float32),
+    ('r', np.uint8), ('g', np.uint8), ('b', np.uint8), ('a', np.uint8),
+    ('u', np.float32), ('v', np.float32)])
+
+# Two triangles per quad, over its corners in the order upper left, upper right, lower right, lower left.
+QUAD_INDICES = np.array([0, 1, 2, 0, 2, 3], dtype=np.intc)
+
+
+class SpriteBatch:
+    __slots__ = (
+        'capacity', 'count', 'rectangles', 'raw_sources', 'sources', 'flips', 'colors', 'scaled',
+        'raw_destinations', 'destinations', 'visible', 'raw_vertices', 'vertices', 'raw_indices')
+
+    # Destination rectangles are kept in world coordinates as rows of (x, y, w, h). transform maps them all through
+    # the camera at once and writes the visible ones, packed at the front, into raw_destinations, which the
+    # destinations array shares its memory with. visible holds the index of the sprite behind each of them.
+    # The ctypes arrays handed to SDL and the numpy arrays filling them always share their memory.
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity = 0
+        self.count = 0
+        self.rectangles = np.zeros((0, 4))
+        self.raw_sources = (RawRect * 0)()
+        self.sources = np.zeros((0, 4), dtype=np.intc)
+        self.flips = np.zeros(0, dtype=np.intc)
+        self.colors = np.zeros((0, 4), dtype=np.uint8)
+        self.scaled = np.zeros((0, 4))
+        self.raw_destinations = (RawRect * 0)()
+        self.destinations = np.zeros((0, 4), dtype=np.intc)
+        self.visible = np.zeros(0, dtype=np.intp)
+        self.raw_vertices = (RawVertex * 0)()
+        self.vertices = np.zeros((0, 4), dtype=VERTEX_DTYPE)
+        self.raw_indices = (ctypes.c_int * 0)()
+        self.grow(capacity)
+
+    def grow(self, capacity: int) -> None:
+        count = self.count
+        self.rectangles = grown(self.rectangles, capacity, count)
+        self.flips = grown(self.flips, capacity, count)
+        self.colors = grown(self.colors, capacity, count)
+        raw_sources = (RawRect * capacity)()
+        sources = np.frombuffer(memoryview(raw_sources), dtype=np.intc).reshape(capacity, 4)
+        sources[:count] = self.sources[:count]
+        self.raw_sources = raw_sources
+        self.sources = sources
+        self.scaled = np.zeros((capacity, 4))
+        self.raw_destinations = (RawRect * capacity)()
+        self.destinations = np.frombuffer(memoryview(self.raw_destinations), dtype=np.intc).reshape(capacity, 4)
+        self.raw_vertices = (RawVertex * (4 * capacity))()
+        self.vertices = np.frombuffer(memoryview(self.raw_vertices), dtype=VERTEX_DTYPE).reshape(capacity, 4)
+        self.raw_indices = (ctypes.c_int * (6 * capacity))()
+        indices = np.frombuffer(memoryview(self.raw_indices), dtype=np.intc).reshape(capacity, 6)
+        indices[:] = QUAD_INDICES + 4 * np.arange(capacity, dtype=np.intc)[:, np.newaxis]
+        self.capacity = capacity
+
+    def clear(self) -> None:
+        self.count = 0
+
+    def add(
+            self, destination: Rectangle, frame: RawRect, flip: Flip = Flip.NONE, color: Color = Color.white()) -> None:
+        count = self.count
+        if count == self.capacity:
+            self.grow(max(1, self.capacity * 2))
+        self.rectangles[count] = (
+            destination.upper_left.real, destination.upper_left.imag,
+            destination.dimensions.real, destination.dimensions.imag)
+        self.sources[count] = (frame.x, frame.y, frame.w, frame.h)
+        self.flips[count] = flip
+        self.colors[count] = color
+        self.count = count + 1
+
+    def transform(self, camera: Camera) -> int:
+        count = self.count
+        rectangles = self.rectangles[:count]
+        scaled = self.scaled[:count]
+        offset = camera.offset
+        window_dimensions = camera.window_dimensions
+        if camera.native:
+            # Matches Camera.draw_texture_frame: world coordinates are rounded, like the whole-pixel offset.
+            np.rint(rectangles, out=scaled)
+            scaled[:, 0] -= offset.real
+            scaled[:, 1] -= offset.imag
+        else:
+            view_dimensions = camera.view.dimensions
+            scaled[:] = rectangles
+            scaled[:, 0] -= offset.real
+            scaled[:, 1] -= offset.imag
+            scaled[:, 0::2] *= window_dimensions.real / view_dimensions.real
+            scaled[:, 1::2] *= window_dimensions.imag / view_dimensions.imag
+
+        x, y, w, h = scaled.T
+        self.visible = np.flatnonzero(
+            (x < window_dimensions.real) & (x + w > 0) & (y < window_dimensions.imag) & (y + h > 0))
+        visible_count = len(self.visible)
+        # Truncates towards zero, like int().
+        self.destinations[:visible_count] = scaled[self.visible]
+        return visible_count
+
+    def render(self, camera: Camera, texture: Texture) -> None:
+        # One SDL_RenderCopyEx per visible sprite, for renderers without SDL_RenderGeometry.
+        self.transform(camera)
+        renderer = camera.renderer
+        raw_sources = self.raw_sources
+        raw_destinations = self.raw_destinations
+        flips = self.flips.tolist()
+        for index, sprite_index in enumerate(self.visible.tolist()):
+            renderer.draw_raw_texture(
+                texture, raw_sources[sprite_index], raw_destinations[index], Flip(flips[sprite_index]))
+
+    def render_geometry(self, camera: Camera, texture: Texture) -> None:
+        visible_count = self.transform(camera)
+        if visible_count:
+            self.build_vertices(visible_count, texture.dimensions)
+            camera.renderer.draw_geometry(
+                texture, self.raw_vertices, 4 * visible_count, self.raw_indices, 6 * visible_count)
+
+    def build_vertices(self, visible_count: int, texture_dimensions: complex) -> None:
+        visible = self.visible
+        destinations = self.destinations[:visible_count]
+        left = destinations[:, 0]
+        top = destinations[:, 1]
+        right = left + destinations[:, 2]
+        bottom = top + destinations[:, 3]
+
+        sources = self.sources[visible]
+        flips = self.flips[visible]
+        u_left = sources[:, 0] / texture_dimensions.real
+        u_right = (sources[:, 0] + sources[:, 2]) / texture_dimensions.real
+        v_top = sources[:, 1] / texture_dimensions.imag
+        v_bottom = (sources[:, 1] + sources[:, 3]) / texture_dimensions.imag
+        # Flipping swaps the texture coordinates of the opposite edges.
+        horizontal = (flips & Flip.HORIZONTAL) != 0
+        vertical = (flips & Flip.VERTICAL) != 0
+        u_left, u_right = np.where(horizontal, u_right, u_left), np.where(horizontal, u_left, u_right)
+        v_top, v_bottom = np.where(vertical, v_bottom, v_top), np.where(vertical, v_top, v_bottom)
+
+        vertices = self.vertices[:visible_count]
+        vertices['x'] = np.column_stack((left, right, right, left))
+        vertices['y'] = np.column_stack((top, top, bottom, bottom))
+        vertices['u'] = np.column_stack((u_left, u_right, u_right, u_left))
+        vertices['v'] = np.column_stack((v_top, v_top, v_bottom, v_bottom))
+        colors = self.colors[visible]
+        for channel, name in enumerate('rgba'):
+            vertices[name] = colors[:, channel, np.newaxis]
+
+
+def grown(values: np.ndarray, capacity: int, count: int) -> np.ndarray:
+    new_values = np.zeros((capacity,) + values.shape[1:], dtype=values.dtype)
+    new_values[:count] = values[:count]
+    return new_values
+
+
+class SpriteBatches:
+    __slots__ = 'capacity', 'batches'
+
+    # Sprites are grouped by texture so that each texture is drawn with a single SDL_RenderGeometry call,
+    # or one SDL_RenderCopyEx per sprite where SDL is too old to have it.
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity = capacity
+        self.batches: Dict[Texture, SpriteBatch] = {}
+
+    def add(
+            self, texture: Texture, destination: Rectangle, frame: RawRect,
+            flip: Flip = Flip.NONE, color: Color = Color.white()) -> None:
+        batch = self.batches.get(texture)
+        if batch is None:
+            batch = self.batches[texture] = SpriteBatch(self.capacity)
+        batch.add(destination, frame, flip, color)
+
+    def flush(self, camera: Camera) -> None:
+        supports_geometry = camera.renderer.supports_geometry
+        for texture, batch in self.batches.items():
+            if supports_geometry:
+                batch.render_geometry(camera, texture)
+            else:
+                batch.render(camera, texture)
+            batch.clear()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import ctypes
+import os
+from abc import ABC, abstractmethod
+from queue import Queue, Empty
+from threading import Thread
+from typing import BinaryIO, Optional, Tuple, Union
+
+from engine.sdl import Renderer, Destroyable, Surface, raw_surface_from_pixels, destroying
+
+Pixels = Union[bytes, bytearray, memoryview]
+
+
+class FrameCapture:
+    __slots__ = 'renderer', 'dimensions', 'pixels', 'frame_count'
+
+    # Reads drawn frames back into a single reusable RGBA buffer, which is overwritten by every capture.
+    # The dimensions are the output's at creation, later captures of a resized window are clipped to them.
+
+    def __init__(self, renderer: Renderer) -> None:
+        self.renderer = renderer
+        self.dimensions = renderer.output_dimensions
+        self.pixels = bytearray(4 * int(self.dimensions.real) * int(self.dimensions.imag))
+        self.frame_count = 0
+
+    def capture(self) -> bytearray:
+        # Between drawing a frame and presenting it.
+        self.renderer.read_pixels(self.pixels, self.dimensions)
+        self.frame_count += 1
+        return self.pixels
+
+    def save_png(self, path: str) -> None:
+        save_png(path, self.pixels, self.dimensions)
+
+
+def save_png(path: str, pixels: bytearray, dimensions: complex) -> None:
+    # Pixels are RGBA, 4 bytes each, row after row. SDL_image encodes them where they are, without a copy.
+    buffer = (ctypes.c_char * len(pixels)).from_buffer(pixels)
+    raw_surface = raw_surface_from_pixels(ctypes.addressof(buffer), dimensions, pitch=4 * int(dimensions.real))
+    with destroying(Surface(raw_surface)) as surface:
+        surface.save_png(os.fsencode(path))
+
+
+def load_png(path: str) -> Tuple[bytes, complex]:
+    with destroying(Surface.load(os.fsencode(path))) as surface:
+        return surface.read_pixels(), surface.dimensions
+
+
+def count_different_pixels(pixels: Pixels, expected_pixels: Pixels, tolerance: int = 0, width: int = 256) -> int:
+    # Pixels differ when any of their channels differs by more than the tolerance. Rows of width pixels are
+    # compared whole first, only the pixels of rows that differ are compared one by one.
+    if len(pixels) != len(expected_pixels):
+        raise ValueError(f'Cannot compare {len(pixels)} bytes of pixels with {len(expected_pixels)}')
+    actual = memoryview(pixels)
+    expected = memoryview(expected_pixels)
+    row_size = 4 * width
+    different = 0
+    for row_offset in range(0, len(actual), row_size):
+        row_end = min(row_offset + row_size, len(actual))
+        if actual[row_offset:row_end] == expected[row_offset:row_end]:
+            continue
+        for offset in range(row_offset, row_end, 4):
+            if actual[offset:offset + 4] != expected[offset:offset + 4] and any(
+                    abs(actual[offset + channel] - expected[offset + channel]) > tolerance
+                    for channel in range(4)):
+                different += 1
+    return different
+
+
+class FrameWriter(ABC):
+    @abstractmethod
+    def write(self, frame_num: int, pixels: bytearray, dimensions: complex) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class RawFrameWriter(FrameWriter):
+    __slots__ = 'stream'
+
+    # Frames one after another as raw RGBA, e.g. for ffmpeg -f rawvideo -pixel_format rgba.
+    # Dropped frames leave no gap.
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self.stream = stream
+
+    def write(self, frame_num: int, pixels: bytearray, dimensions: complex) -> None:
+        self.stream.write(pixels)
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+class PngSequenceWriter(FrameWriter):
+    __slots__ = 'directory'
+
+    # One PNG per frame, named after the frame number, so dropped frames show up as missing numbers.
+
+    def __init__(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def write(self, frame_num: int, pixels: bytearray, dimensions: complex) -> None:
+        save_png(os.path.join(self.directory, f'{frame_num:06}.png'), pixels, dimensions)
+
+
+CapturedFrame = Optional[Tuple[int, bytearray]]
+
+
+class CapturePipeline(Destroyable):
+    __slots__ = (
+        'renderer', 'writer', 'dimensions', 'free_buffers', 'captured_frames', 'thread',
+        'frame_num', 'dropped', 'error')
+
+    # The main thread only copies frames into free buffers from a fixed pool and queues them,
+    # a writer thread writes them out and returns the buffers to the pool. When every buffer is still
+    # waiting to be written, the frame is dropped instead of waiting for the writer.
+    # Like FrameCapture, every frame has the output dimensions the pipeline was created with.
+
+    def __init__(self, renderer: Renderer, writer: FrameWriter, buffer_count: int = 8) -> None:
+        self.renderer = renderer
+        self.writer = writer
+        self.dimensions = renderer.output_dimensions
+        self.free_buffers: Queue[bytearray] = Queue()
+        for _ in range(buffer_count):
+            self.free_buffers.put(bytearray(4 * int(self.dimensions.real) * int(self.dimensions.imag)))
+        self.captured_frames: Queue[CapturedFrame] = Queue()
+        self.frame_num = 0
+        self.dropped = 0
+        self.error: Optional[BaseException] = None
+        self.thread = Thread(target=self.write_frames, name='CapturePipeline', daemon=True)
+        self.thread.start()
+
+    def capture(self) -> bool:
+        # Between drawing a frame and presenting it.
+        frame_num = self.frame_num
+        self.frame_num += 1
+        try:
+            pixels = self.free_buffers.get_nowait()
+        except Empty:
+            self.dropped += 1
+            return False
+        self.renderer.read_pixels(pixels, self.dimensions)
+        self.captured_frames.put((frame_num, pixels))
+        return True
+
+    def write_frames(self) -> None:
+        while True:
+            captured_frame = self.captured_frames.get()
+            if captured_frame is None:
+                return
+            frame_num, pixels = captured_frame
+            try:
+                if not self.error:
+                    self.writer.write(frame_num, pixels, self.dimensions)
+            except BaseException as error:
+                # Kept for destroy to raise on the main thread, later frames are skipped.
+                self.error = error
+            self.free_buffers.put(pixels)
+
+    def destroy(self) -> None:
+        # Waits for the frames already captured to be written.
+        self.captured_frames.put(None)
+        self.thread.join()
+        self.writer.close()
+        if self.error:
+            raise self.error
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import ctypes
+from array import array
+from typing import Dict, Iterable, Tuple, Type, TypeVar
+
+from engine.graphics import Camera
+from engine.sdl import Renderer, Color, RawRect, RawPoint
+from engine.utils import Rectangle, Line
+
+T_Raw = TypeVar('T_Raw', RawRect, RawPoint)
+
+
+def grown(raw_array: ctypes.Array[T_Raw], element_type: Type[T_Raw]) -> ctypes.Array[T_Raw]:
+    new_array = (element_type * (2 * len(raw_array)))()
+    ctypes.memmove(new_array, raw_array, ctypes.sizeof(raw_array))
+    return new_array
+
+
+class DrawBatch:
+    __slots__ = (
+        'points', 'point_count', 'strip_starts', 'filled', 'filled_count', 'outlined', 'outlined_count')
+
+    # Lines are kept as polyline strips, since SDL_RenderDrawLines always connects consecutive points.
+    # A segment that starts where the previous one ended extends the current strip.
+
+    def __init__(self, capacity: int) -> None:
+        self.points = (RawPoint * capacity)()
+        self.point_count = 0
+        self.strip_starts = array('i')
+        self.filled = (RawRect * capacity)()
+        self.filled_count = 0
+        self.outlined = (RawRect * capacity)()
+        self.outlined_count = 0
+
+    def clear(self) -> None:
+        self.point_count = 0
+        del self.strip_starts[:]
+        self.filled_count = 0
+        self.outlined_count = 0
+
+    def start_strip(self) -> None:
+        self.strip_starts.append(self.point_count)
+
+    def add_point(self, x: int, y: int) -> None:
+        if self.point_count == len(self.points):
+            self.points = grown(self.points, RawPoint)
+        point = self.points[self.point_count]
+        point.x = x
+        point.y = y
+        self.point_count += 1
+
+    def continues_strip(self, x: int, y: int) -> bool:
+        if not self.point_count:
+            return False
+        last_point = self.points[self.point_count - 1]
+        return bool(last_point.x == x and last_point.y == y)
+
+    def add_rectangle(self, x: int, y: int, w: int, h: int, fill: bool) -> None:
+        if fill:
+            if self.filled_count == len(self.filled):
+                self.filled = grown(self.filled, RawRect)
+            rectangle = self.filled[self.filled_count]
+            self.filled_count += 1
+        else:
+            if self.outlined_count == len(self.outlined):
+                self.outlined = grown(self.outlined, RawRect)
+            rectangle = self.outlined[self.outlined_count]
+            self.outlined_count += 1
+        rectangle.x = x
+        rectangle.y = y
+        rectangle.w = w
+        rectangle.h = h
+
+    def submit(self, renderer: Renderer) -> None:
+        if self.filled_count:
+            renderer.fill_raw_rectangles(self.filled, self.filled_count)
+        if self.outlined_count:
+            renderer.draw_raw_rectangles(self.outlined, self.outlined_count)
+        strip_ends = len(self.strip_starts)
+        for strip in range(strip_ends):
+            start = self.strip_starts[strip]
+            end = self.strip_starts[strip + 1] if strip + 1 < strip_ends else self.point_count
+            if end - start > 1:
+                renderer.draw_raw_lines(self.points[start], end - start)
+
+
+class DebugDraw:
+    __slots__ = 'renderer', 'capacity', 'batches', 'native', 'offset', 'real_scale', 'imag_scale'
+
+    # Collects debug shapes in world coordinates during a frame and draws them all in flush,
+    # with one colour change per colour and one SDL call per primitive kind (one per strip for lines).
+    # Coordinates are mapped like Camera.draw_texture_frame maps sprites, so shapes line up with them.
+
+    def __init__(self, renderer: Renderer, capacity: int = 64) -> None:
+        self.renderer = renderer
+        self.capacity = capacity
+        self.batches: Dict[Color, DrawBatch] = {}
+        self.native = True
+        self.offset = 0j
+        self.real_scale = 1.0
+        self.imag_scale = 1.0
+
+    def begin(self, camera: Camera) -> None:
+        self.native = camera.native
+        self.offset = camera.offset
+        self.real_scale = camera.window_dimensions.real / camera.view.dimensions.real
+        self.imag_scale = camera.window_dimensions.imag / camera.view.dimensions.imag
+
+    def batch(self, color: Color) -> DrawBatch:
+        batch = self.batches.get(color)
+        if batch is None:
+            batch = self.batches[color] = DrawBatch(self.capacity)
+        return batch
+
+    def to_window_real(self, real: float) -> int:
+        if self.native:
+            return round(real) - int(self.offset.real)
+        return int((real - self.offset.real) * self.real_scale)
+
+    def to_window_imag(self, imag: float) -> int:
+        if self.native:
+            return round(imag) - int(self.offset.imag)
+        return int((imag - self.offset.imag) * self.imag_scale)
+
+    def to_window_dimensions(self, dimensions: complex) -> Tuple[int, int]:
+        if self.native:
+            return round(dimensions.real), round(dimensions.imag)
+        return int(dimensions.real * self.real_scale), int(dimensions.imag * self.imag_scale)
+
+    def line(self, color: Color, line: Line) -> None:
+        batch = self.batch(color)
+        x = self.to_window_real(line.origin.real)
+        y = self.to_window_imag(line.origin.imag)
+        if not batch.continues_strip(x, y):
+            batch.start_strip()
+            batch.add_point(x, y)
+        batch.add_point(self.to_window_real(line.origin.real + line.offset.real),
+                        self.to_window_imag(line.origin.imag + line.offset.imag))
+
+    def polyline(self, color: Color, points: Iterable[complex]) -> None:
+        batch = self.batch(color)
+        batch.start_strip()
+        for point in points:
+            batch.add_point(self.to_window_real(point.real), self.to_window_imag(point.imag))
+
+    def rectangle(self, color: Color, rectangle: Rectangle, fill: bool) -> None:
+        w, h = self.to_window_dimensions(rectangle.dimensions)
+        self.batch(color).add_rectangle(
+            self.to_window_real(rectangle.upper_left.real), self.to_window_imag(rectangle.upper_left.imag), w, h, fill)
+
+    def flush(self) -> None:
+        for color, batch in self.batches.items():
+            if not (batch.point_count or batch.filled_count or batch.outlined_count):
+                continue
+            self.renderer.set_draw_color(color)
+            batch.submit(self.renderer)
+            batch.clear()
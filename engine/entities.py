@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from typing import Generic, TypeVar, Callable, Optional, List, Iterable, Iterator, Dict, Type, Set, Any, cast
+
+T = TypeVar('T')
+# A pooled entity type, which must be a subtype of the manager's T. Type variables can't be bound to another one.
+E = TypeVar('E')
+
+
+class ObjectPool(Generic[T]):
+    __slots__ = 'factory', 'reset', 'free'
+
+    def __init__(
+            self, factory: Callable[[], T], reset: Optional[Callable[[T], None]] = None, capacity: int = 0) -> None:
+        self.factory = factory
+        self.reset = reset
+        self.free = [factory() for _ in range(capacity)]
+
+    def acquire(self) -> T:
+        if self.free:
+            return self.free.pop()
+        return self.factory()
+
+    def release(self, item: T) -> None:
+        if self.reset:
+            self.reset(item)
+        self.free.append(item)
+
+
+class EntityManager(Generic[T]):
+    __slots__ = (
+        'entities', 'spawn_queue', 'despawn_queue', 'despawning', 'pools', 'generation', 'on_spawned', 'on_despawned')
+
+    # Spawning and despawning are deferred until apply_pending, which the integrator calls between steps,
+    # so entities can be added or removed while the manager is being iterated over.
+    # Despawning compacts the list in place, which keeps the iteration order stable. Despawned entities
+    # go back to their pools in the order they were despawned, so pools hand them out the same way every run.
+    # `on_spawned` is called as soon as an entity is spawned, `on_despawned` once it is removed, before it goes
+    # back to its pool.
+
+    def __init__(
+            self, entities: Iterable[T] = (), on_spawned: Optional[Callable[[T], None]] = None,
+            on_despawned: Optional[Callable[[T], None]] = None) -> None:
+        self.entities: List[T] = list(entities)
+        self.spawn_queue: List[T] = []
+        self.despawn_queue: List[T] = []
+        # The same entities as the despawn queue, for membership tests.
+        self.despawning: Set[T] = set()
+        self.pools: Dict[type, ObjectPool[Any]] = {}
+        # Counts the changes to the set of entities.
+        self.generation = 0
+        self.on_spawned = on_spawned
+        self.on_despawned = on_despawned
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.entities)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def register_pool(self, entity_type: Type[E], pool: ObjectPool[E]) -> None:
+        self.pools[entity_type] = pool
+
+    def spawn(self, entity: T) -> None:
+        if self.on_spawned:
+            self.on_spawned(entity)
+        self.spawn_queue.append(entity)
+
+    def spawn_pooled(self, entity_type: Type[E]) -> E:
+        entity: E = self.pools[entity_type].acquire()
+        self.spawn(cast(T, entity))
+        return entity
+
+    def despawn(self, entity: T) -> None:
+        if entity not in self.despawning:
+            self.despawning.add(entity)
+            self.despawn_queue.append(entity)
+
+    def apply_pending(self) -> None:
+        if self.despawn_queue:
+            self.remove_despawned()
+            self.generation += 1
+        if self.spawn_queue:
+            self.entities.extend(self.spawn_queue)
+            self.spawn_queue.clear()
+            self.generation += 1
+
+    def remove_despawned(self) -> None:
+        remove_in_place(self.entities, self.despawning)
+        if self.spawn_queue:
+            remove_in_place(self.spawn_queue, self.despawning)
+
+        for entity in self.despawn_queue:
+            if self.on_despawned:
+                self.on_despawned(entity)
+            pool = self.pools.get(type(entity))
+            if pool:
+                pool.release(entity)
+        self.despawn_queue.clear()
+        self.despawning.clear()
+
+
+def remove_in_place(items: List[T], removed: Set[T]) -> None:
+    write_index = 0
+    for item in items:
+        if item not in removed:
+            items[write_index] = item
+            write_index += 1
+    del items[write_index:]
+
+
+def chain_hooks(
+        first: Optional[Callable[[T], None]], second: Optional[Callable[[T], None]]) -> Optional[Callable[[T], None]]:
+    if not first or not second:
+        return first or second
+    first_hook, second_hook = first, second
+
+    def call_both(entity: T) -> None:
+        first_hook(entity)
+        second_hook(entity)
+
+    return call_both
@@ -1,22 +1,34 @@
 from __future__ import annotations
 
 from collections import OrderedDict
-from typing import Iterable, Generic, TypeVar, Optional
+from itertools import chain
+from time import sleep
+from typing import Iterable, Generic, TypeVar, Optional, BinaryIO, Tuple, List, Callable
 
-from engine.graphics import Camera, SpritePlayer, Sprite
+from engine.allocations import AllocationTracker
+from engine.graphics import Camera, SpritePlayer, Sprite, AnimationSystem
 from engine.physics import PhysicalEntity
-from engine.sdl import Flip, Destroyable, EventHandler, Keyboard
+from engine.profile_capture import ProfileCapture
+from engine.profiler import FrameProfiler, Phase
+from engine.replay import InputRecorder, InputLog, ReplayEventHandler
+from engine.sdl import Flip, Destroyable, EventHandler, Keyboard, Scancode
+from engine.snapshot import Snapshottable, SnapshotCursor
+from engine.telemetry import TelemetryWriter
 from engine.timer import Time
 from engine.utils import Rectangle
 
+# Starts and stops a cProfile capture of the next frames.
+PROFILE_CAPTURE_KEY = Scancode.F5
+
 
 class Actor(PhysicalEntity):
     __slots__ = 'sprite_player', 'flip'
 
     def __init__(
-            self, sprite: Sprite, checkbox: Rectangle, flip: Flip = Flip.NONE, gravity_scale: float = 1) -> None:
+            self, sprite: Sprite, checkbox: Rectangle, animation_system: AnimationSystem, flip: Flip = Flip.NONE,
+            gravity_scale: float = 1) -> None:
         super().__init__(checkbox, gravity_scale)
-        self.sprite_player = SpritePlayer(sprite)
+        self.sprite_player = SpritePlayer(sprite, animation_system)
         self.flip = flip
 
     @property
@@ -24,23 +36,66 @@ class Actor(PhysicalEntity):
         return self.sprite_player.sprite
 
     def switch_sprite(self, new_sprite: Sprite) -> None:
-        self.sprite_player = SpritePlayer(new_sprite)
+        self.sprite_player.switch(new_sprite)
 
-    def update(self, time: Time) -> None:
-        self.sprite_player.update(time)
+    def on_screen_changed(self) -> None:
+        if self.on_screen:
+            self.sprite_player.resume()
+        else:
+            self.sprite_player.pause()
+
+    def on_spawned(self) -> None:
+        self.sprite_player.acquire()
+
+    def on_despawned(self) -> None:
+        self.sprite_player.release()
 
     def render(self, camera: Camera) -> None:
-        self.sprite.render(camera, destination=self.checkbox, flip=self.flip)
+        self.sprite_player.render(camera, destination=self.checkbox, flip=self.flip)
+
+    def save_state(self, cursor: SnapshotCursor) -> None:
+        super().save_state(cursor)
+        self.sprite_player.save_state(cursor)
+        cursor.write(self.flip)
+
+    def restore_state(self, cursor: SnapshotCursor) -> None:
+        super().restore_state(cursor)
+        self.sprite_player.restore_state(cursor)
+        self.flip = Flip(int(cursor.read()))
 
 
 T_Parent = TypeVar('T_Parent')
 
 
-class State(Generic[T_Parent]):
-    __slots__ = 'trigger'
+class Triggers:
+    __slots__ = 'mask'
 
     def __init__(self) -> None:
-        self.trigger = False
+        self.mask = 0
+
+
+class State(Snapshottable, Generic[T_Parent]):
+    __slots__ = 'state_id', 'mask', 'triggers'
+
+    # Triggers are kept as bits of a mask shared by the whole state graph, so the state machine
+    # can find the triggered state with the highest priority in a single operation.
+    # Until a state is compiled into a StateGraph it owns a private mask.
+
+    def __init__(self) -> None:
+        self.state_id = -1
+        self.mask = 1
+        self.triggers = Triggers()
+
+    @property
+    def trigger(self) -> bool:
+        return bool(self.triggers.mask & self.mask)
+
+    @trigger.setter
+    def trigger(self, value: bool) -> None:
+        if value:
+            self.triggers.mask |= self.mask
+        else:
+            self.triggers.mask &= ~self.mask
 
     def enter(self, parent: T_Parent) -> None:
         pass
@@ -54,22 +109,66 @@ class State(Generic[T_Parent]):
     def exit(self, parent: T_Parent) -> None:
         pass
 
+    def save_state(self, cursor: SnapshotCursor) -> None:
+        cursor.write(self.trigger)
+
+    def restore_state(self, cursor: SnapshotCursor) -> None:
+        self.trigger = bool(cursor.read())
+
 
 class StateGraph(Generic[T_Parent]):
-    __slots__ = 'connections', 'any_state_connections'
+    __slots__ = (
+        'connections', 'any_state_connections', 'states', 'all_states',
+        'triggers', 'triggerable_mask', 'reachable_masks', 'reachable_states')
+
+    # Compiled once: every state gets an integer ID, lower IDs (earlier connections) win when several
+    # states are triggered at once, and reachability is a precomputed bitmask per state.
 
     def __init__(
             self,
             connections: OrderedDict[State[T_Parent], Iterable[State[T_Parent]]],
             any_state_connections: Iterable[State[T_Parent]]) -> None:
-        self.connections = connections
-        self.any_state_connections = any_state_connections
-
-
-class GenericStateMachine(Generic[T_Parent]):
+        self.connections = OrderedDict((state, tuple(targets)) for state, targets in connections.items())
+        self.any_state_connections = tuple(any_state_connections)
+        self.states = tuple(self.connections.keys())
+        self.all_states = self.states + tuple(StateGraph.unlisted_states(self.connections, self.any_state_connections))
+        self.triggers = Triggers()
+        for state_id, state in enumerate(self.all_states):
+            triggered = state.trigger
+            state.state_id = state_id
+            state.mask = 1 << state_id
+            state.triggers = self.triggers
+            state.trigger = triggered
+
+        self.triggerable_mask = StateGraph.combined_mask(self.states)
+        self.reachable_states = tuple(
+            self.connections.get(state, ()) + self.any_state_connections for state in self.all_states)
+        self.reachable_masks = tuple(StateGraph.combined_mask(states) for states in self.reachable_states)
+
+    @staticmethod
+    def unlisted_states(
+            connections: OrderedDict[State[T_Parent], Tuple[State[T_Parent], ...]],
+            any_state_connections: Tuple[State[T_Parent], ...]) -> Iterable[State[T_Parent]]:
+        unlisted: List[State[T_Parent]] = []
+        for state in chain(chain.from_iterable(connections.values()), any_state_connections):
+            if state not in connections and state not in unlisted:
+                unlisted.append(state)
+        return unlisted
+
+    @staticmethod
+    def combined_mask(states: Iterable[State[T_Parent]]) -> int:
+        mask = 0
+        for state in states:
+            mask |= state.mask
+        return mask
+
+
+class GenericStateMachine(Snapshottable, Generic[T_Parent]):
     __slots__ = 'parent', 'current_state', 'default_state', 'state_graph'
 
     def __init__(self, parent: T_Parent, default_state: State[T_Parent], state_graph: StateGraph[T_Parent]) -> None:
+        if default_state.triggers is not state_graph.triggers:
+            raise ValueError('The default state is not a part of the state graph')
         self.parent = parent
         self.current_state = default_state
         self.current_state.enter(self.parent)
@@ -85,17 +184,17 @@ class GenericStateMachine(Generic[T_Parent]):
         self.current_state.physics_update(timestep, self.parent)
 
     def execute_triggers(self) -> bool:
-        return any(self.execute_trigger(state) for state in self.states)
-
-    def execute_trigger(self, state: State[T_Parent]) -> bool:
-        if not state.trigger:
+        graph = self.state_graph
+        candidates = (graph.triggers.mask & graph.triggerable_mask &
+                      (graph.reachable_masks[self.current_state.state_id] | self.current_state.mask))
+        if not candidates:
             return False
-        return self.switch_state(state)
+        return self.switch_state(graph.all_states[(candidates & -candidates).bit_length() - 1])
 
     def switch_state(self, new_state: State[T_Parent]) -> bool:
         if new_state is self.current_state:
             return True
-        if new_state not in self.reachable_states:
+        if not self.state_graph.reachable_masks[self.current_state.state_id] & new_state.mask:
             return False
 
         self.current_state.exit(self.parent)
@@ -104,26 +203,48 @@ class GenericStateMachine(Generic[T_Parent]):
 
         return True
 
+    def save_state(self, cursor: SnapshotCursor) -> None:
+        # Restoring does not run exit/enter, the state's own side effects are part of the snapshot too.
+        cursor.write(self.current_state.state_id)
+        for state in self.state_graph.all_states:
+            state.save_state(cursor)
+
+    def restore_state(self, cursor: SnapshotCursor) -> None:
+        self.current_state = self.state_graph.all_states[int(cursor.read())]
+        for state in self.state_graph.all_states:
+            state.restore_state(cursor)
+
     @property
     def states(self) -> Iterable[State[T_Parent]]:
-        return self.state_graph.connections.keys()
+        return self.state_graph.states
 
     @property
     def reachable_states(self) -> Iterable[State[T_Parent]]:
-        if self.current_state in self.state_graph.connections:
-            yield from self.state_graph.connections[self.current_state]
-        yield from self.state_graph.any_state_connections
+        return self.state_graph.reachable_states[self.current_state.state_id]
 
 
 class Game(Destroyable):
-    __slots__ = 'frame_time', 'event_handler'
+    __slots__ = (
+        'frame_time', 'event_handler', 'recorder', 'animation_system', 'profiler', 'telemetry', 'allocations',
+        'profile_capture')
 
-    def __init__(self, fps: int, event_handler: Optional[EventHandler] = None) -> None:
+    def __init__(
+            self, fps: int, event_handler: Optional[EventHandler] = None,
+            animation_system: Optional[AnimationSystem] = None) -> None:
         self.frame_time = round(1000 / fps)
         self.event_handler = event_handler or EventHandler()
+        self.recorder: Optional[InputRecorder] = None
+        self.animation_system = animation_system or AnimationSystem()
+        self.profiler = FrameProfiler()
+        self.telemetry: Optional[TelemetryWriter] = None
+        self.allocations: Optional[AllocationTracker] = None
+        self.profile_capture = ProfileCapture()
+        if isinstance(self.event_handler, EventHandler):
+            self.event_handler.hotkeys[PROFILE_CAPTURE_KEY] = self.profile_capture.toggle
 
     def destroy(self) -> None:
-        pass
+        self.stop_recording()
+        self.profile_capture.stop()
 
     @property
     def keyboard(self) -> Keyboard:
@@ -134,9 +255,65 @@ class Game(Destroyable):
         while not self.event_handler.quit_requested:
             new_time = time.updated()
             if new_time.delta < self.frame_time:
+                # Lets other threads take the GIL while waiting.
+                sleep(0)
                 continue
             time = new_time
             self.frame_advance(time)
+            self.end_frame()
 
     def frame_advance(self, time: Time) -> None:
+        self.handle_events(time)
+        self.animation_system.update(time)
+        self.profiler.end_phase(Phase.ANIMATION)
+
+    def handle_events(self, time: Time) -> None:
+        if self.allocations:
+            # Before the frame's timing starts, snapshots are slow.
+            self.allocations.begin_frame()
+        self.profiler.begin_frame()
+        if self.telemetry:
+            self.telemetry.begin_frame()
         self.event_handler.update()
+        if self.recorder:
+            self.recorder.record_frame(time.delta)
+        self.profiler.end_phase(Phase.EVENTS)
+
+    def end_frame(self) -> None:
+        self.profiler.end_frame()
+        if self.profile_capture.active:
+            self.profile_capture.end_frame()
+        if self.telemetry:
+            self.telemetry.end_frame()
+        if self.allocations:
+            self.allocations.end_frame()
+
+    def start_recording(self, stream: BinaryIO) -> None:
+        self.stop_recording()
+        self.recorder = InputRecorder(stream, start_time=Time.now().current)
+        self.keyboard.recorder = self.recorder
+
+    def stop_recording(self) -> None:
+        if not self.recorder:
+            return
+        self.keyboard.recorder = None
+        self.recorder.close()
+        self.recorder = None
+
+    def replay(self, log: InputLog, advance: Optional[Callable[[Time], None]] = None) -> None:
+        # Runs frames back to back as fast as possible, SDL events are never polled during a replay.
+        # Frames are advanced by `advance`, frame_advance by default, which can e.g. look at what they drew.
+        advance = advance or self.frame_advance
+        event_handler = self.event_handler
+        replay_event_handler = ReplayEventHandler(event_handler.keyboard)
+        self.event_handler = replay_event_handler
+        self.keyboard.reset()
+        try:
+            time = Time(current=log.start_time, delta=0)
+            for frame in log:
+                replay_event_handler.key_changes = frame.key_changes
+                time = Time(current=time.current + frame.delta, delta=frame.delta)
+                advance(time)
+                self.end_frame()
+        finally:
+            self.event_handler = event_handler
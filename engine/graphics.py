@@ -1,33 +1,95 @@
 from __future__ import annotations
 
+from array import array
+from math import floor, ceil
+from typing import List, Tuple, Callable
+
 from engine.physics import PhysicalEntity
-from engine.sdl import Texture, Renderer, Flip, get_current_time
+from engine.sdl import Texture, Renderer, Flip, RawRect, raw_rectangle_parameter, Destroyable, Surface, destroying
+from engine.snapshot import Snapshottable, SnapshotCursor
 from engine.timer import Time
 from engine.utils import Rectangle, Line
 
 
 class Camera:
-    __slots__ = 'view', 'window_dimensions', 'renderer'
+    __slots__ = 'view', 'window_dimensions', 'renderer', 'raw_destination', 'native', 'offset_x', 'offset_y'
+
+    # A native camera's view is as large as what it draws to (the renderer's logical size scales that to the window),
+    # so positions only need the view's offset, rounded once per frame to move everything by whole pixels.
 
     def __init__(self, view: Rectangle, window_dimensions: complex, renderer: Renderer) -> None:
         self.view = view
         self.window_dimensions = window_dimensions
         self.renderer = renderer
+        self.raw_destination = RawRect()
+        self.native = view.dimensions == window_dimensions
+        self.offset_x = 0
+        self.offset_y = 0
+        self.snap_offset()
 
     def update(self) -> None:
-        pass
+        self.snap_offset()
+
+    def center_on(self, point: complex) -> None:
+        self.view.center = point
+        self.snap_offset()
+
+    def snap_offset(self) -> None:
+        self.offset_x = round(self.view.upper_left.real)
+        self.offset_y = round(self.view.upper_left.imag)
+
+    def to_native(self, rectangle: Rectangle) -> Rectangle:
+        # Rounded like the offset, truncating one but not the other makes sprites jitter by a pixel as the view moves.
+        return Rectangle(
+            complex(round(rectangle.upper_left.real) - self.offset_x, round(rectangle.upper_left.imag) - self.offset_y),
+            complex(round(rectangle.dimensions.real), round(rectangle.dimensions.imag)))
+
+    @property
+    def offset(self) -> complex:
+        return complex(self.offset_x, self.offset_y) if self.native else self.view.upper_left
 
     def draw_texture(
             self, texture: Texture, source: Rectangle, destination: Rectangle, flip: Flip = Flip.NONE) -> None:
-        destination = scale_rectangle(self.view, destination, new_dimensions=self.window_dimensions)
+        if self.native:
+            destination = self.to_native(destination)
+        else:
+            destination = scale_rectangle(self.view, destination, new_dimensions=self.window_dimensions)
         self.renderer.draw_texture(texture, source, destination, flip)
 
+    def draw_texture_frame(
+            self, texture: Texture, frame: RawRect, destination: Rectangle, flip: Flip = Flip.NONE) -> None:
+        # Same as draw_texture, but written straight into a reused RawRect so drawing a sprite allocates nothing.
+        raw_destination = self.raw_destination
+        if self.native:
+            raw_destination.x = round(destination.upper_left.real) - self.offset_x
+            raw_destination.y = round(destination.upper_left.imag) - self.offset_y
+            raw_destination.w = round(destination.dimensions.real)
+            raw_destination.h = round(destination.dimensions.imag)
+        else:
+            view = self.view
+            raw_destination.x = int(
+                ((destination.upper_left.real - view.upper_left.real) * self.window_dimensions.real) /
+                view.dimensions.real)
+            raw_destination.y = int(
+                ((destination.upper_left.imag - view.upper_left.imag) * self.window_dimensions.imag) /
+                view.dimensions.imag)
+            raw_destination.w = int((destination.dimensions.real * self.window_dimensions.real) / view.dimensions.real)
+            raw_destination.h = int((destination.dimensions.imag * self.window_dimensions.imag) / view.dimensions.imag)
+        self.renderer.draw_raw_texture(texture, frame, raw_destination, flip)
+
     def draw_rectangle(self, rectangle: Rectangle, fill: bool) -> None:
-        self.renderer.draw_rectangle(
-            scale_rectangle(self.view, rectangle, new_dimensions=self.window_dimensions), fill)
+        if self.native:
+            rectangle = self.to_native(rectangle)
+        else:
+            rectangle = scale_rectangle(self.view, rectangle, new_dimensions=self.window_dimensions)
+        self.renderer.draw_rectangle(rectangle, fill)
 
     def draw_line(self, line: Line) -> None:
-        self.renderer.draw_line(scale_line(self.view, line, new_dimensions=self.window_dimensions))
+        if self.native:
+            line = Line(origin=line.origin - self.offset, offset=line.offset)
+        else:
+            line = scale_line(self.view, line, new_dimensions=self.window_dimensions)
+        self.renderer.draw_line(line)
 
 
 def draw_background(background_texture: Texture, camera: Camera) -> None:
@@ -37,6 +99,87 @@ def draw_background(background_texture: Texture, camera: Camera) -> None:
     camera.draw_texture(background_texture, source, destination)
 
 
+class TiledBackground(Destroyable):
+    __slots__ = 'tiles', 'tile_sources', 'dimensions', 'tile_size', 'columns', 'rows', 'parallax', 'destination'
+
+    # A background image cut into tile textures when it is loaded, so it never exceeds the maximum texture size
+    # and only the tiles inside the camera's view are drawn. The parallax scales how far the layer scrolls
+    # when the camera moves, 0.5 scrolls it half as far and 0 keeps it fixed to the view.
+
+    def __init__(self, tiles: List[Texture], dimensions: complex, tile_size: int, parallax: complex = 1 + 1j) -> None:
+        self.dimensions = dimensions
+        self.tile_size = tile_size
+        self.columns = ceil(dimensions.real / tile_size)
+        self.rows = ceil(dimensions.imag / tile_size)
+        if len(tiles) != self.columns * self.rows:
+            raise ValueError(f'Expected {self.columns * self.rows} tiles, got {len(tiles)}')
+        self.tiles = tiles
+        self.tile_sources = [
+            RawRect(0, 0, int(tile_dimensions.real), int(tile_dimensions.imag))
+            for tile_dimensions in (self.tile_dimensions(row, column)
+                                    for row in range(self.rows) for column in range(self.columns))]
+        self.parallax = parallax
+        self.destination = Rectangle(upper_left=0, dimensions=0)
+
+    @staticmethod
+    def load(
+            renderer: Renderer, path: bytes, tile_size: int = 256, parallax: complex = 1 + 1j,
+            decode: Callable[[bytes], Surface] = Surface.load) -> TiledBackground:
+        tiles: List[Texture] = []
+        with destroying(decode(path)) as surface:
+            dimensions = surface.dimensions
+            try:
+                for row in range(ceil(dimensions.imag / tile_size)):
+                    for column in range(ceil(dimensions.real / tile_size)):
+                        tiles.append(renderer.create_texture_from_surface(surface, Rectangle(
+                            upper_left=complex(column * tile_size, row * tile_size),
+                            dimensions=tile_dimensions(dimensions, tile_size, row, column))))
+            except Exception:
+                for tile in tiles:
+                    tile.destroy()
+                raise
+        return TiledBackground(tiles, dimensions, tile_size, parallax)
+
+    def destroy(self) -> None:
+        for tile in self.tiles:
+            tile.destroy()
+
+    def tile_dimensions(self, row: int, column: int) -> complex:
+        return tile_dimensions(self.dimensions, self.tile_size, row, column)
+
+    def layer_offset(self, view: Rectangle) -> complex:
+        # How far the layer is moved along with the view, so that it appears to scroll by the parallax.
+        return complex(
+            view.upper_left.real * (1 - self.parallax.real), view.upper_left.imag * (1 - self.parallax.imag))
+
+    def visible_tiles(self, view: Rectangle) -> Tuple[range, range]:
+        upper_left = view.upper_left - self.layer_offset(view)
+        lower_right = upper_left + view.dimensions
+        return (
+            range(max(0, floor(upper_left.imag / self.tile_size)),
+                  min(self.rows, ceil(lower_right.imag / self.tile_size))),
+            range(max(0, floor(upper_left.real / self.tile_size)),
+                  min(self.columns, ceil(lower_right.real / self.tile_size))))
+
+    def render(self, camera: Camera) -> None:
+        layer_offset = self.layer_offset(camera.view)
+        destination = self.destination
+        rows, columns = self.visible_tiles(camera.view)
+        for row in rows:
+            for column in columns:
+                index = row * self.columns + column
+                source = self.tile_sources[index]
+                destination.upper_left = layer_offset + complex(column * self.tile_size, row * self.tile_size)
+                destination.dimensions = complex(source.w, source.h)
+                camera.draw_texture_frame(self.tiles[index], source, destination)
+
+
+def tile_dimensions(dimensions: complex, tile_size: int, row: int, column: int) -> complex:
+    # Tiles are tile_size squares, except along the right and bottom edges.
+    return complex(
+        min(tile_size, dimensions.real - column * tile_size), min(tile_size, dimensions.imag - row * tile_size))
+
+
 def scale_rectangle(view: Rectangle, rectangle: Rectangle, new_dimensions: complex) -> Rectangle:
     return Rectangle(
         upper_left=scale_coordinates(view, rectangle.upper_left - view.upper_left, new_dimensions),
@@ -66,29 +209,175 @@ class FollowerCamera(Camera):
         self.target = target
 
     def update(self) -> None:
-        self.view.center = self.target.checkbox.center
+        self.center_on(self.target.checkbox.center)
+
+
+class AnimationSystem:
+    __slots__ = (
+        'current_time', 'capacity', 'frame_nums', 'advance_times', 'frame_delays',
+        'frame_counts', 'loops', 'running', 'paused', 'free_slots')
+
+    # Every sprite player owns a slot in these arrays. The clock is read once per frame (in Game.frame_advance)
+    # and all the slots are advanced in one pass, catching up on every frame delay that has passed.
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.current_time = 0
+        self.capacity = 0
+        self.frame_nums = array('i')
+        self.advance_times = array('q')
+        self.frame_delays = array('i')
+        self.frame_counts = array('i')
+        self.loops = array('b')
+        self.running = array('b')
+        self.paused = array('b')
+        self.free_slots: List[int] = []
+        self.grow(capacity)
+
+    def grow(self, capacity: int) -> None:
+        added = capacity - self.capacity
+        self.frame_nums.extend([0] * added)
+        self.advance_times.extend([0] * added)
+        self.frame_delays.extend([0] * added)
+        self.frame_counts.extend([0] * added)
+        self.loops.extend([0] * added)
+        self.running.extend([0] * added)
+        self.paused.extend([0] * added)
+        self.free_slots.extend(reversed(range(self.capacity, capacity)))
+        self.capacity = capacity
+
+    def allocate(self) -> int:
+        if not self.free_slots:
+            self.grow(self.capacity * 2)
+        return self.free_slots.pop()
+
+    def release(self, slot: int) -> None:
+        self.running[slot] = False
+        self.paused[slot] = False
+        self.free_slots.append(slot)
+
+    def start(self, slot: int, animation: Animation) -> None:
+        self.restore(slot, animation, frame_num=0, advance_time=self.current_time + animation.frame_delay)
+
+    def restore(self, slot: int, animation: Animation, frame_num: int, advance_time: int) -> None:
+        self.frame_nums[slot] = frame_num
+        self.advance_times[slot] = advance_time
+        self.frame_delays[slot] = animation.frame_delay
+        self.frame_counts[slot] = animation.frame_count
+        self.loops[slot] = animation.loop
+        # Animations without a frame delay just show their first frame.
+        self.running[slot] = animation.frame_delay > 0 and (animation.loop or frame_num < animation.frame_count)
+        self.paused[slot] = False
+
+    def pause(self, slot: int) -> None:
+        # While paused, the slot keeps the time that was left until its next frame instead of when that is due.
+        if self.running[slot]:
+            self.running[slot] = False
+            self.paused[slot] = True
+            self.advance_times[slot] -= self.current_time
+
+    def resume(self, slot: int) -> None:
+        if self.paused[slot]:
+            self.paused[slot] = False
+            self.running[slot] = True
+            self.advance_times[slot] += self.current_time
+
+    def advance_time(self, slot: int) -> int:
+        # When the next frame is due, as if the slot had not been paused since.
+        if self.paused[slot]:
+            return self.advance_times[slot] + self.current_time
+        return self.advance_times[slot]
 
-
-class SpritePlayer:
-    __slots__ = 'sprite', 'advance_time'
-
-    def __init__(self, sprite: Sprite) -> None:
+    def update(self, time: Time) -> None:
+        current_time = self.current_time = time.current
+        advance_times = self.advance_times
+        running = self.running
+        for slot in range(self.capacity):
+            if not running[slot] or current_time < advance_times[slot]:
+                continue
+
+            frame_delay = self.frame_delays[slot]
+            passed_frames = (current_time - advance_times[slot]) // frame_delay + 1
+            advance_times[slot] += passed_frames * frame_delay
+            frame_num = self.frame_nums[slot] + passed_frames
+            frame_count = self.frame_counts[slot]
+            if frame_num >= frame_count:
+                if self.loops[slot]:
+                    frame_num %= frame_count
+                else:
+                    frame_num = frame_count
+                    running[slot] = False
+            self.frame_nums[slot] = frame_num
+
+
+class SpritePlayer(Snapshottable):
+    __slots__ = 'sprite', 'animation_system', 'slot', 'paused'
+
+    # A released player has no slot (-1) until it is acquired again, e.g. while its actor waits in a pool.
+    # Pausing and resuming it is remembered for then, reading or restoring its animation needs a slot.
+
+    def __init__(self, sprite: Sprite, animation_system: AnimationSystem) -> None:
         self.sprite = sprite
-        self.advance_time = get_current_time() + self.sprite.animation.frame_delay
-        # I don't like using get_current_time, but using a current_time parameter is so bad.
-        # The parameter ends up leaking into so many other declarations and it just looks awkward.
+        self.animation_system = animation_system
+        self.slot = self.animation_system.allocate()
+        self.animation_system.start(self.slot, sprite.animation)
+        self.paused = False
 
-    def update(self, time: Time) -> None:
-        if self.is_done:
+    def switch(self, sprite: Sprite) -> None:
+        self.sprite = sprite
+        if self.slot < 0:
             return
+        self.animation_system.start(self.slot, sprite.animation)
+        if self.paused:
+            self.animation_system.pause(self.slot)
+
+    def pause(self) -> None:
+        self.paused = True
+        if self.slot >= 0:
+            self.animation_system.pause(self.slot)
+
+    def resume(self) -> None:
+        self.paused = False
+        if self.slot >= 0:
+            self.animation_system.resume(self.slot)
+
+    def acquire(self) -> None:
+        if self.slot < 0:
+            self.slot = self.animation_system.allocate()
+            self.switch(self.sprite)
+
+    def release(self) -> None:
+        if self.slot >= 0:
+            self.animation_system.release(self.slot)
+            self.slot = -1
 
-        if time.current >= self.advance_time:
-            self.sprite.animation.advance()
-            self.advance_time += self.sprite.animation.frame_delay
+    @property
+    def frame_num(self) -> int:
+        assert self.slot >= 0
+        return min(self.animation_system.frame_nums[self.slot], self.sprite.animation.frame_count - 1)
 
     @property
     def is_done(self) -> bool:
-        return self.sprite.animation.is_done
+        assert self.slot >= 0
+        return (not self.sprite.animation.loop and
+                self.animation_system.frame_nums[self.slot] >= self.sprite.animation.frame_count)
+
+    def render(self, camera: Camera, destination: Rectangle, flip: Flip = Flip.NONE) -> None:
+        self.sprite.render(camera, destination, flip, self.frame_num)
+
+    def save_state(self, cursor: SnapshotCursor) -> None:
+        assert self.slot >= 0
+        cursor.write_reference(self.sprite)
+        cursor.write(self.animation_system.frame_nums[self.slot])
+        cursor.write(self.animation_system.advance_time(self.slot))
+
+    def restore_state(self, cursor: SnapshotCursor) -> None:
+        assert self.slot >= 0
+        self.sprite = cursor.read_reference()
+        frame_num = int(cursor.read())
+        advance_time = int(cursor.read())
+        self.animation_system.restore(self.slot, self.sprite.animation, frame_num, advance_time)
+        if self.paused:
+            self.animation_system.pause(self.slot)
 
 
 class Sprite:
@@ -98,37 +387,24 @@ class Sprite:
         self.texture = texture
         self.animation = animation
 
-    def render(self, camera: Camera, destination: Rectangle, flip: Flip = Flip.NONE) -> None:
-        camera.draw_texture(self.texture, source=self.animation.active_frame, destination=destination, flip=flip)
+    def render(self, camera: Camera, destination: Rectangle, flip: Flip = Flip.NONE, frame_num: int = 0) -> None:
+        camera.draw_texture_frame(self.texture, self.animation.raw_frames[frame_num], destination, flip)
 
 
 class Animation:
-    __slots__ = 'starting_frame', 'frame_count', 'frame_delay', 'current_frame_num', 'loop'
+    __slots__ = 'starting_frame', 'frame_count', 'frame_delay', 'loop', 'raw_frames'
 
     def __init__(self, starting_frame: Rectangle, frame_count: int, frame_delay: int, loop: bool = False) -> None:
         self.starting_frame = starting_frame
         self.frame_count = frame_count
         self.frame_delay = frame_delay
-        self.current_frame_num = 0
         self.loop = loop
+        self.raw_frames = tuple(raw_rectangle_parameter(self.frame(frame_num)) for frame_num in range(frame_count))
 
-    def advance(self) -> None:
-        self.current_frame_num += 1
-        if self.loop and self.is_done:
-            self.reset()
-
-    @property
-    def is_done(self) -> bool:
-        return self.current_frame_num >= self.frame_count
-
-    def reset(self) -> None:
-        self.current_frame_num = 0
-
-    @property
-    def active_frame(self) -> Rectangle:
+    def frame(self, frame_num: int) -> Rectangle:
         return Rectangle(
             upper_left=(self.starting_frame.upper_left.real +
-                        self.starting_frame.dimensions.real * self.current_frame_num +
+                        self.starting_frame.dimensions.real * frame_num +
                         self.starting_frame.upper_left.imag * 1j),
             dimensions=self.starting_frame.dimensions)
 
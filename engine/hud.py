@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from array import array
+from typing import Dict, List, Tuple
+
+from engine.sdl import Renderer, RawRect, Color, Destroyable
+from engine.timer import Time
+
+GLYPH_WIDTH = 3
+GLYPH_HEIGHT = 5
+
+# 3x5 glyphs, one string of rows per character, '#' marks a lit pixel.
+GLYPHS = {
+    ' ': '... ... ... ... ...',
+    '0': '### #.# #.# #.# ###',
+    '1': '.#. ##. .#. .#. ###',
+    '2': '### ..# ### #.. ###',
+    '3': '### ..# .## ..# ###',
+    '4': '#.# #.# ### ..# ..#',
+    '5': '### #.. ### ..# ###',
+    '6': '### #.. ### #.# ###',
+    '7': '### ..# ..# .#. .#.',
+    '8': '### #.# ### #.# ###',
+    '9': '### #.# ### ..# ###',
+    '.': '... ... ... ... .#.',
+    ':': '... .#. ... .#. ...',
+    '/': '..# ..# .#. #.. #..',
+    '%': '#.# ..# .#. #.. #.#',
+    '-': '... ... ### ... ...',
+    'A': '.#. #.# ### #.# #.#',
+    'B': '##. #.# ##. #.# ##.',
+    'C': '.## #.. #.. #.. .##',
+    'D': '##. #.# #.# #.# ##.',
+    'E': '### #.. ##. #.. ###',
+    'F': '### #.. ##. #.. #..',
+    'G': '.## #.. #.# #.# .##',
+    'H': '#.# #.# ### #.# #.#',
+    'I': '### .#. .#. .#. ###',
+    'J': '..# ..# ..# #.# .#.',
+    'K': '#.# #.# ##. #.# #.#',
+    'L': '#.. #.. #.. #.. ###',
+    'M': '#.# ### ### #.# #.#',
+    'N': '##. #.# #.# #.# #.#',
+    'O': '.#. #.# #.# #.# .#.',
+    'P': '##. #.# ##. #.. #..',
+    'Q': '.#. #.# #.# ##. .##',
+    'R': '##. #.# ##. #.# #.#',
+    'S': '.## #.. .#. ..# ##.',
+    'T': '### .#. .#. .#. .#.',
+    'U': '#.# #.# #.# #.# ###',
+    'V': '#.# #.# #.# #.# .#.',
+    'W': '#.# #.# ### ### #.#',
+    'X': '#.# #.# .#. #.# #.#',
+    'Y': '#.# #.# .#. .#. .#.',
+    'Z': '### ..# .#. #.. ###',
+}
+
+
+def glyph_atlas_pixels() -> bytes:
+    # All the glyphs side by side in a single row, white where lit and transparent elsewhere.
+    width = GLYPH_WIDTH * len(GLYPHS)
+    pixels = bytearray(4 * width * GLYPH_HEIGHT)
+    for index, glyph in enumerate(GLYPHS.values()):
+        for y, row in enumerate(glyph.split()):
+            for x, pixel in enumerate(row):
+                if pixel == '#':
+                    offset = 4 * (y * width + index * GLYPH_WIDTH + x)
+                    pixels[offset:offset + 4] = b'\xff\xff\xff\xff'
+    return bytes(pixels)
+
+
+class BitmapFont(Destroyable):
+    __slots__ = 'atlas', 'glyph_sources'
+
+    def __init__(self, renderer: Renderer) -> None:
+        self.atlas = renderer.create_texture(
+            glyph_atlas_pixels(), dimensions=complex(GLYPH_WIDTH * len(GLYPHS), GLYPH_HEIGHT))
+        self.glyph_sources: Dict[str, RawRect] = {
+            character: RawRect(index * GLYPH_WIDTH, 0, GLYPH_WIDTH, GLYPH_HEIGHT)
+            for index, character in enumerate(GLYPHS)}
+
+    def destroy(self) -> None:
+        self.atlas.destroy()
+
+    def layout(self, text: str, position: complex, scale: int) -> List[Tuple[RawRect, RawRect]]:
+        quads = []
+        x = int(position.real)
+        for character in text.upper():
+            if character != ' ' and character in self.glyph_sources:
+                quads.append((
+                    self.glyph_sources[character],
+                    RawRect(x, int(position.imag), GLYPH_WIDTH * scale, GLYPH_HEIGHT * scale)))
+            x += (GLYPH_WIDTH + 1) * scale
+        return quads
+
+
+class TextLabel:
+    __slots__ = 'font', 'position', 'scale', 'text', 'quads'
+
+    # Keeps the quads of its text laid out, they are only rebuilt when the text changes.
+
+    def __init__(self, font: BitmapFont, position: complex, scale: int = 2) -> None:
+        self.font = font
+        self.position = position
+        self.scale = scale
+        self.text = ''
+        self.quads: List[Tuple[RawRect, RawRect]] = []
+
+    def set_text(self, text: str) -> None:
+        if text == self.text:
+            return
+        self.text = text
+        self.quads = self.font.layout(text, self.position, self.scale)
+
+    def render(self, renderer: Renderer) -> None:
+        atlas = self.font.atlas
+        for source, destination in self.quads:
+            renderer.draw_raw_texture(atlas, source, destination)
+
+
+class PerformanceHud(Destroyable):
+    __slots__ = (
+        'renderer', 'font', 'labels', 'frame_deltas', 'frame_index', 'graph_rectangles',
+        'graph_origin', 'next_text_update', 'background', 'budget_line', 'own_draw_calls')
+
+    LABEL_COUNT = 5
+    TEXT_UPDATE_INTERVAL = 250
+    GRAPH_FRAMES = 120
+    GRAPH_HEIGHT = 50
+    GRAPH_MILLISECONDS_PER_PIXEL = 1
+
+    # The text is refreshed a few times per second so the labels mostly draw from their cached quads,
+    # and the frame-time graph is submitted as a single SDL_RenderFillRects call. A line across the graph
+    # marks the frame budget, the frame time the game runs at.
+
+    def __init__(self, renderer: Renderer, frame_budget: int, position: complex = 4 + 4j, scale: int = 2) -> None:
+        self.renderer = renderer
+        self.font = BitmapFont(renderer)
+        line_height = (GLYPH_HEIGHT + 2) * scale
+        self.labels = [
+            TextLabel(self.font, position + 4 + (4 + line * line_height) * 1j, scale)
+            for line in range(PerformanceHud.LABEL_COUNT)]
+        self.graph_origin = position + 4 + (8 + PerformanceHud.LABEL_COUNT * line_height) * 1j
+        self.background = RawRect(
+            int(position.real), int(position.imag), PerformanceHud.GRAPH_FRAMES + 8,
+            int(self.graph_origin.imag - position.imag) + PerformanceHud.GRAPH_HEIGHT + 4)
+        # At the top of the bar of a frame that took exactly the budget.
+        self.budget_line = RawRect(
+            int(self.graph_origin.real),
+            int(self.graph_origin.imag) + PerformanceHud.GRAPH_HEIGHT - graph_bar_height(frame_budget),
+            PerformanceHud.GRAPH_FRAMES, 1)
+        self.frame_deltas = array('i', bytes(4 * PerformanceHud.GRAPH_FRAMES))
+        self.frame_index = 0
+        self.graph_rectangles = (RawRect * PerformanceHud.GRAPH_FRAMES)()
+        for x, rectangle in enumerate(self.graph_rectangles):
+            rectangle.x = int(self.graph_origin.real) + x
+            rectangle.w = 1
+        self.next_text_update = 0
+        self.own_draw_calls = 0
+
+    def destroy(self) -> None:
+        self.font.destroy()
+
+    def update(self, time: Time, physics_steps: int, draw_calls: int, entity_count: int) -> None:
+        # draw_calls are the ones of the last presented frame, the HUD's own calls are left out.
+        self.frame_deltas[self.frame_index] = time.delta
+        self.frame_index = (self.frame_index + 1) % PerformanceHud.GRAPH_FRAMES
+
+        if time.current < self.next_text_update:
+            return
+        self.next_text_update = time.current + PerformanceHud.TEXT_UPDATE_INTERVAL
+        average_delta = sum(self.frame_deltas) / PerformanceHud.GRAPH_FRAMES
+        fps = 1000 / average_delta if average_delta else 0
+        self.labels[0].set_text(f'FPS {fps:.0f}')
+        self.labels[1].set_text(f'FRAME {average_delta:.1f} MS')
+        self.labels[2].set_text(f'STEPS {physics_steps}')
+        self.labels[3].set_text(f'DRAWS {draw_calls - self.own_draw_calls}')
+        self.labels[4].set_text(f'ENTITIES {entity_count}')
+
+    def render(self) -> None:
+        draw_calls = self.renderer.draw_calls
+        self.renderer.set_draw_color(Color.black(a=160))
+        self.renderer.fill_raw_rectangles(self.background, 1)
+        for label in self.labels:
+            label.render(self.renderer)
+
+        bottom = int(self.graph_origin.imag) + PerformanceHud.GRAPH_HEIGHT
+        for x, rectangle in enumerate(self.graph_rectangles):
+            delta = self.frame_deltas[(self.frame_index + x) % PerformanceHud.GRAPH_FRAMES]
+            rectangle.h = graph_bar_height(delta)
+            rectangle.y = bottom - rectangle.h
+        self.renderer.set_draw_color(Color.green(a=200))
+        self.renderer.fill_raw_rectangles(self.graph_rectangles, PerformanceHud.GRAPH_FRAMES)
+        self.renderer.set_draw_color(Color.red(a=200))
+        self.renderer.fill_raw_rectangles(self.budget_line, 1)
+        self.own_draw_calls = self.renderer.draw_calls - draw_calls
+
+
+def graph_bar_height(milliseconds: int) -> int:
+    return min(round(milliseconds / PerformanceHud.GRAPH_MILLISECONDS_PER_PIXEL), PerformanceHud.GRAPH_HEIGHT)
@@ -1,16 +1,29 @@
 from __future__ import annotations
 
+import enum
 from abc import ABC, abstractmethod
-from typing import Iterable
+from typing import Iterable, Union, Optional, NamedTuple, Dict, Tuple, List, Set, Callable
 
-from math import isclose
+from math import isclose, hypot, floor, inf
+from operator import methodcaller
 
+from engine.entities import EntityManager, chain_hooks
+from engine.snapshot import Snapshottable, SnapshotCursor, SnapshotError
 from engine.timer import Time
-from engine.utils import Rectangle, Line, Corner
+from engine.utils import Rectangle, Line, Corner, intersection_fraction
 
 
-class PhysicalEntity:
-    __slots__ = 'checkbox', 'acceleration', 'velocity', 'gravity_scale', 'on_ground'
+@enum.unique
+class UpdateLevel(enum.IntEnum):
+    FULL = 0
+    REDUCED = 1
+    SUSPENDED = 2
+
+
+class PhysicalEntity(Snapshottable):
+    __slots__ = (
+        'checkbox', 'acceleration', 'velocity', 'gravity_scale', 'on_ground',
+        'on_screen', 'update_level', 'last_update_time')
 
     def __init__(self, checkbox: Rectangle, gravity_scale: float = 1) -> None:
         self.checkbox = checkbox
@@ -18,13 +31,41 @@ class PhysicalEntity:
         self.velocity = 0 + 0j
         self.gravity_scale = gravity_scale
         self.on_ground = False
+        # Only maintained by an UpdateLod.
+        self.on_screen = True
+        self.update_level = UpdateLevel.FULL
+        self.last_update_time: Optional[int] = None
 
     def update(self, time: Time) -> None:
         pass
 
+    def on_screen_changed(self) -> None:
+        pass
+
+    # Called by the integrator's entity manager.
+    def on_spawned(self) -> None:
+        pass
+
+    def on_despawned(self) -> None:
+        pass
+
     def physics_update(self, timestep: float) -> None:
         pass
 
+    def save_state(self, cursor: SnapshotCursor) -> None:
+        cursor.write_complex(self.checkbox.upper_left)
+        cursor.write_complex(self.checkbox.dimensions)
+        cursor.write_complex(self.velocity)
+        cursor.write_complex(self.acceleration)
+        cursor.write(self.on_ground)
+
+    def restore_state(self, cursor: SnapshotCursor) -> None:
+        self.checkbox.upper_left = cursor.read_complex()
+        self.checkbox.dimensions = cursor.read_complex()
+        self.velocity = cursor.read_complex()
+        self.acceleration = cursor.read_complex()
+        self.on_ground = bool(cursor.read())
+
     def hit_ground(self, ground_imag: float) -> None:
         self.checkbox.lower_imag = ground_imag
         self.velocity = self.velocity.real
@@ -56,6 +97,35 @@ class TerrainElement(ABC):
     def is_ground(self, entity: PhysicalEntity) -> bool:
         return False
 
+    @property
+    @abstractmethod
+    def bounds(self) -> Rectangle:
+        pass
+
+    @abstractmethod
+    def raycast(self, ray: Line) -> Optional[float]:
+        # How far along the ray it first hits the element, as a fraction of its length.
+        pass
+
+    def contains_point(self, point: complex) -> bool:
+        # Only elements with an inside are solid.
+        return False
+
+
+class LineTerrainElement(TerrainElement, ABC):
+    __slots__ = ()
+
+    line: Line
+
+    @property
+    def bounds(self) -> Rectangle:
+        return Rectangle(
+            upper_left=complex(self.line.left_real, self.line.upper_imag),
+            dimensions=complex(self.line.bounding_box_width, self.line.bounding_box_height))
+
+    def raycast(self, ray: Line) -> Optional[float]:
+        return intersection_fraction(ray, self.line)
+
 
 # Perhaps in the future I should delete this class
 class Block(TerrainElement):
@@ -88,8 +158,26 @@ class Block(TerrainElement):
         return (self.checkbox.overlaps_on_real_axis(entity.checkbox) and
                 isclose(self.checkbox.upper_imag, entity.checkbox.lower_imag, abs_tol=0.0001))
 
+    @property
+    def bounds(self) -> Rectangle:
+        return self.checkbox
 
-class Platform(TerrainElement):
+    def raycast(self, ray: Line) -> Optional[float]:
+        checkbox = self.checkbox
+        if checkbox.contains_point(ray.origin):
+            return 0
+        hit: Optional[float] = None
+        for edge in (checkbox.top_line, checkbox.bottom_line, checkbox.left_line, checkbox.right_line):
+            fraction = intersection_fraction(ray, edge)
+            if fraction is not None and (hit is None or fraction < hit):
+                hit = fraction
+        return hit
+
+    def contains_point(self, point: complex) -> bool:
+        return self.checkbox.contains_point(point)
+
+
+class Platform(LineTerrainElement):
     __slots__ = 'line'
 
     def __init__(self, origin: complex, width: float) -> None:
@@ -111,7 +199,7 @@ class Platform(TerrainElement):
                 isclose(self.line.origin.imag, entity.checkbox.lower_imag, abs_tol=0.0001))
 
 
-class Wall(TerrainElement):
+class Wall(LineTerrainElement):
     __slots__ = 'line'
 
     def __init__(self, origin: complex, height: float) -> None:
@@ -128,7 +216,7 @@ class Wall(TerrainElement):
             solve_real_axis_collision(entity, Corner.UPPER_LEFT, self.line, timestep)
 
 
-class Roof(TerrainElement):
+class Roof(LineTerrainElement):
     __slots__ = 'line'
 
     def __init__(self, origin: complex, width: float) -> None:
@@ -172,32 +260,218 @@ def solve_real_axis_collision(entity: PhysicalEntity, corner: Corner, line: Line
         assert False
 
 
-class Integrator:
+class RaycastHit(NamedTuple):
+    element: TerrainElement
+    point: complex
+    distance: float
+
+
+class TerrainIndex:
+    __slots__ = 'cell_size', 'cells', 'order'
+
+    # A uniform grid over the terrain, where every cell lists the elements whose bounds touch it, so queries only
+    # look at the elements near them. Terrain does not move, the grid is built once and only grows.
+
+    def __init__(self, terrain: Iterable[TerrainElement] = (), cell_size: float = 64) -> None:
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[TerrainElement]] = {}
+        # Results keep the order elements were added in.
+        self.order: Dict[TerrainElement, int] = {}
+        for element in terrain:
+            self.add(element)
+
+    def add(self, element: TerrainElement) -> None:
+        self.order[element] = len(self.order)
+        columns, rows = self.cell_ranges(element.bounds)
+        for row in rows:
+            for column in columns:
+                self.cells.setdefault((column, row), []).append(element)
+
+    def cell_ranges(self, region: Rectangle) -> Tuple[range, range]:
+        cell_size = self.cell_size
+        return (
+            range(floor(region.left_real / cell_size), floor(region.right_real / cell_size) + 1),
+            range(floor(region.upper_imag / cell_size), floor(region.lower_imag / cell_size) + 1))
+
+    def query_region(self, region: Rectangle) -> List[TerrainElement]:
+        # Elements whose bounds overlap the region, touching edges included.
+        found: Set[TerrainElement] = set()
+        columns, rows = self.cell_ranges(region)
+        for row in rows:
+            for column in columns:
+                for element in self.cells.get((column, row), ()):
+                    if element not in found and element.bounds.overlaps(region):
+                        found.add(element)
+        return sorted(found, key=self.order.__getitem__)
+
+    def point_in_solid(self, point: complex) -> bool:
+        cell_size = self.cell_size
+        for element in self.cells.get((floor(point.real / cell_size), floor(point.imag / cell_size)), ()):
+            if element.contains_point(point):
+                return True
+        return False
+
+    def raycast(
+            self, ray: Line, predicate: Optional[Callable[[TerrainElement], bool]] = None) -> Optional[RaycastHit]:
+        # The first element the ray hits, optionally only among those the predicate accepts.
+        # Walks the cells along the ray in order and stops at the first cell that ends past the closest hit so far.
+        cell_size = self.cell_size
+        origin = ray.origin
+        offset = ray.offset
+        column = floor(origin.real / cell_size)
+        row = floor(origin.imag / cell_size)
+        # Fractions of the ray at which it crosses into the next column and row, and how much they grow per cell.
+        column_step, next_column, column_delta = cell_crossings(origin.real, offset.real, column, cell_size)
+        row_step, next_row, row_delta = cell_crossings(origin.imag, offset.imag, row, cell_size)
+
+        tested: Set[TerrainElement] = set()
+        hit_element: Optional[TerrainElement] = None
+        hit_fraction = inf
+        while True:
+            for element in self.cells.get((column, row), ()):
+                if element in tested:
+                    continue
+                tested.add(element)
+                if predicate and not predicate(element):
+                    continue
+                fraction = element.raycast(ray)
+                if fraction is not None and fraction < hit_fraction:
+                    hit_element = element
+                    hit_fraction = fraction
+            cell_exit = min(next_column, next_row)
+            if hit_fraction <= cell_exit or cell_exit > 1:
+                break
+            if next_column < next_row:
+                column += column_step
+                next_column += column_delta
+            else:
+                row += row_step
+                next_row += row_delta
+
+        if hit_element is None:
+            return None
+        return RaycastHit(hit_element, origin + offset * hit_fraction, hit_fraction * abs(offset))
+
+
+def cell_crossings(origin: float, offset: float, cell: int, cell_size: float) -> Tuple[int, float, float]:
+    if offset > 0:
+        return 1, ((cell + 1) * cell_size - origin) / offset, cell_size / offset
+    if offset < 0:
+        return -1, (cell * cell_size - origin) / offset, -cell_size / offset
+    return 0, inf, inf
+
+
+class UpdateLod:
+    __slots__ = 'view', 'full_distance', 'suspend_distance', 'reduced_interval', 'frame_num'
+
+    # Decides how often entities are updated by how far they are from the view, usually a camera's.
+    # Entities up to full_distance away are updated every frame. Farther ones only run their update every
+    # reduced_interval frames, staggered, with all the time passed since, and beyond suspend_distance
+    # they are frozen, physics included, until they come closer again. Animations only run on screen.
+
+    def __init__(
+            self, view: Rectangle, full_distance: float = 64, suspend_distance: float = 512,
+            reduced_interval: int = 4) -> None:
+        self.view = view
+        self.full_distance = full_distance
+        self.suspend_distance = suspend_distance
+        self.reduced_interval = reduced_interval
+        self.frame_num = 0
+
+    def distance(self, checkbox: Rectangle) -> float:
+        view = self.view
+        distance_real = max(view.left_real - checkbox.right_real, checkbox.left_real - view.right_real, 0)
+        distance_imag = max(view.upper_imag - checkbox.lower_imag, checkbox.upper_imag - view.lower_imag, 0)
+        return hypot(distance_real, distance_imag)
+
+    def update(self, entities: Iterable[PhysicalEntity], time: Time) -> None:
+        self.frame_num += 1
+        for index, entity in enumerate(entities):
+            distance = self.distance(entity.checkbox)
+            on_screen = distance == 0
+            if on_screen != entity.on_screen:
+                entity.on_screen = on_screen
+                entity.on_screen_changed()
+
+            if distance <= self.full_distance:
+                entity.update_level = UpdateLevel.FULL
+            elif distance <= self.suspend_distance:
+                entity.update_level = UpdateLevel.REDUCED
+                if (self.frame_num + index) % self.reduced_interval:
+                    continue
+            else:
+                # Time stands still for suspended entities.
+                entity.update_level = UpdateLevel.SUSPENDED
+                entity.last_update_time = time.current
+                continue
+
+            last_update_time = entity.last_update_time
+            if last_update_time is None or last_update_time == time.current - time.delta:
+                entity.update(time)
+            else:
+                entity.update(Time(current=time.current, delta=time.current - last_update_time))
+            entity.last_update_time = time.current
+
+
+class Integrator(Snapshottable):
     __slots__ = (
         'timestep_milliseconds', 'timestep_seconds', 'time_accumulator',
-        'gravity', 'horizontal_drag', 'entities', 'terrain')
+        'gravity', 'horizontal_drag', 'entities', 'terrain', 'terrain_index', 'step_count', 'lod')
 
     def __init__(
             self, timestep: int, gravity: float, horizontal_drag: float,
-            entities: Iterable[PhysicalEntity], terrain: Iterable[TerrainElement]):
+            entities: Union[EntityManager[PhysicalEntity], Iterable[PhysicalEntity]],
+            terrain: Iterable[TerrainElement], lod: Optional[UpdateLod] = None):
         self.timestep_milliseconds = timestep
         self.timestep_seconds = timestep / 1000
         self.time_accumulator = 0
         self.gravity = gravity
         self.horizontal_drag = horizontal_drag
-        self.entities = entities
-        self.terrain = terrain
+        self.entities = entities if isinstance(entities, EntityManager) else EntityManager(entities)
+        # Around whatever hooks the manager was given, entities acquire their resources first and release them last.
+        self.entities.on_spawned = chain_hooks(methodcaller('on_spawned'), self.entities.on_spawned)
+        self.entities.on_despawned = chain_hooks(self.entities.on_despawned, methodcaller('on_despawned'))
+        self.terrain = list(terrain)
+        # For game logic's queries, like line of sight or whether there is floor ahead.
+        self.terrain_index = TerrainIndex(self.terrain)
+        self.step_count = 0
+        self.lod = lod
 
     def update(self, time: Time) -> None:
         self.time_accumulator += time.delta
-        for entity in self.entities:
-            entity.update(time)
+        self.entities.apply_pending()
+        if self.lod:
+            self.lod.update(self.entities, time)
+        else:
+            for entity in self.entities:
+                entity.update(time)
+        self.step_count = 0
         while self.time_accumulator >= self.timestep_milliseconds:
+            self.entities.apply_pending()
             self.update_physics()
             self.time_accumulator -= self.timestep_milliseconds
+            self.step_count += 1
+
+    def save_state(self, cursor: SnapshotCursor) -> None:
+        cursor.write(self.time_accumulator)
+        cursor.write(len(self.entities))
+        for entity in self.entities:
+            entity.save_state(cursor)
+
+    def snapshot_layout(self) -> int:
+        return self.entities.generation
+
+    def restore_state(self, cursor: SnapshotCursor) -> None:
+        self.time_accumulator = int(cursor.read())
+        if int(cursor.read()) != len(self.entities):
+            raise SnapshotError('Entities were spawned or despawned since the snapshot was taken')
+        for entity in self.entities:
+            entity.restore_state(cursor)
 
     def update_physics(self) -> None:
         for entity in self.entities:
+            if entity.update_level is UpdateLevel.SUSPENDED:
+                continue
             self.apply_gravity(entity)
             entity.velocity += entity.acceleration * self.timestep_seconds
             entity.velocity -= entity.velocity.real * self.horizontal_drag
@@ -218,4 +492,9 @@ class Integrator:
         if entity.velocity.imag < 0:
             entity.on_ground = False
             return
-        entity.on_ground = any(terrain_element.is_ground(entity) for terrain_element in self.terrain)
+        # A loop rather than any() over a generator, which would be allocated on every physics step.
+        for terrain_element in self.terrain:
+            if terrain_element.is_ground(entity):
+                entity.on_ground = True
+                return
+        entity.on_ground = False
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import cProfile
+import os
+from time import strftime
+from typing import Optional, Callable, List
+
+
+class ProfileCapture:
+    __slots__ = 'frame_count', 'directory', 'on_saved', 'profile', 'remaining_frames', 'saved_paths'
+
+    # Profiles the rest of the frame it is started in and the next `frame_count` frames with cProfile, then saves
+    # the stats as a .pstats file. Every captured frame ends with a call to frame_boundary, so the number of frames
+    # and the time per frame can be read from the stats. While not capturing, no profiler is installed at all.
+
+    def __init__(
+            self, frame_count: int = 120, directory: str = 'profiles',
+            on_saved: Optional[Callable[[str], None]] = None) -> None:
+        self.frame_count = frame_count
+        self.directory = directory
+        self.on_saved = on_saved
+        self.profile: Optional[cProfile.Profile] = None
+        self.remaining_frames = 0
+        self.saved_paths: List[str] = []
+
+    @property
+    def active(self) -> bool:
+        return self.profile is not None
+
+    def toggle(self) -> None:
+        if self.profile:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self) -> None:
+        if self.profile:
+            return
+        self.remaining_frames = self.frame_count
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def end_frame(self) -> None:
+        if not self.profile:
+            return
+        frame_boundary()
+        self.remaining_frames -= 1
+        if self.remaining_frames <= 0:
+            self.stop()
+
+    def stop(self) -> Optional[str]:
+        # Returns where the stats were saved.
+        profile = self.profile
+        if not profile:
+            return None
+        profile.disable()
+        self.profile = None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'frames-{strftime("%Y%m%d-%H%M%S")}-{len(self.saved_paths)}.pstats')
+        profile.dump_stats(path)
+        self.saved_paths.append(path)
+        if self.on_saved:
+            self.on_saved(path)
+        return path
+
+
+def frame_boundary() -> None:
+    # Only called to mark the end of each captured frame in the stats.
+    pass
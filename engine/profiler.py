@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import enum
+from array import array
+from time import perf_counter_ns
+from typing import NamedTuple, Sequence, List
+
+
+@enum.unique
+class Phase(enum.IntEnum):
+    EVENTS = 0
+    ANIMATION = 1
+    PHYSICS = 2
+    CAMERA = 3
+    REDRAW = 4
+    PRESENT = 5
+
+
+PHASE_COUNT = len(Phase)
+
+
+class Percentiles(NamedTuple):
+    p50: float
+    p95: float
+    p99: float
+
+    @staticmethod
+    def of(samples: Sequence[float]) -> Percentiles:
+        if not samples:
+            return Percentiles(0, 0, 0)
+        ordered = sorted(samples)
+        return Percentiles(
+            p50=nearest_rank(ordered, 50), p95=nearest_rank(ordered, 95), p99=nearest_rank(ordered, 99))
+
+
+def nearest_rank(ordered: Sequence[float], percentile: float) -> float:
+    rank = max(1, -(-len(ordered) * percentile // 100))
+    return ordered[int(rank) - 1]
+
+
+class FrameProfiler:
+    __slots__ = (
+        'enabled', 'capacity', 'phase_times', 'frame_times', 'physics_steps', 'draw_calls',
+        'frame_index', 'count', 'frame_start', 'phase_start')
+
+    # Timings are kept in nanoseconds in fixed-size ring buffers holding the last `capacity` frames.
+    # While disabled, every hook returns immediately.
+
+    def __init__(self, capacity: int = 600, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.capacity = capacity
+        self.phase_times = array('q', bytes(8 * capacity * PHASE_COUNT))
+        self.frame_times = array('q', bytes(8 * capacity))
+        self.physics_steps = array('i', bytes(4 * capacity))
+        self.draw_calls = array('i', bytes(4 * capacity))
+        self.frame_index = 0
+        self.count = 0
+        self.frame_start = 0
+        self.phase_start = 0
+
+    def clear(self) -> None:
+        self.frame_index = 0
+        self.count = 0
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self.frame_start = self.phase_start = perf_counter_ns()
+        offset = self.frame_index * PHASE_COUNT
+        self.phase_times[offset:offset + PHASE_COUNT] = ZERO_PHASES
+        self.physics_steps[self.frame_index] = 0
+        self.draw_calls[self.frame_index] = 0
+
+    def end_phase(self, phase: Phase) -> None:
+        if not self.enabled or not self.frame_start:
+            return
+        now = perf_counter_ns()
+        self.phase_times[self.frame_index * PHASE_COUNT + phase] += now - self.phase_start
+        self.phase_start = now
+
+    def record_physics_steps(self, steps: int) -> None:
+        if self.enabled:
+            self.physics_steps[self.frame_index] += steps
+
+    def record_draw_calls(self, draw_calls: int) -> None:
+        if self.enabled:
+            self.draw_calls[self.frame_index] += draw_calls
+
+    def end_frame(self) -> None:
+        if not self.enabled or not self.frame_start:
+            return
+        self.frame_times[self.frame_index] = perf_counter_ns() - self.frame_start
+        self.frame_start = 0
+        self.frame_index = (self.frame_index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def recorded_frames(self) -> range:
+        return range(self.frame_index - self.count, self.frame_index)
+
+    def phase_percentiles(self, phase: Phase) -> Percentiles:
+        return Percentiles.of([
+            self.phase_times[(frame % self.capacity) * PHASE_COUNT + phase] / 1e6 for frame in self.recorded_frames()])
+
+    def frame_percentiles(self) -> Percentiles:
+        return Percentiles.of([self.frame_times[frame % self.capacity] / 1e6 for frame in self.recorded_frames()])
+
+    def physics_steps_percentiles(self) -> Percentiles:
+        return Percentiles.of([self.physics_steps[frame % self.capacity] for frame in self.recorded_frames()])
+
+    def draw_calls_percentiles(self) -> Percentiles:
+        return Percentiles.of([self.draw_calls[frame % self.capacity] for frame in self.recorded_frames()])
+
+    def report(self) -> str:
+        title = f'{self.count} frames'
+        lines: List[str] = [f'{title:<16}' + ''.join(f'{name:>9}' for name in Percentiles._fields)]
+        for phase in Phase:
+            lines.append(format_percentiles(f'{phase.name.lower()} (ms)', self.phase_percentiles(phase)))
+        lines.append(format_percentiles('frame (ms)', self.frame_percentiles()))
+        lines.append(format_percentiles('physics steps', self.physics_steps_percentiles()))
+        lines.append(format_percentiles('draw calls', self.draw_calls_percentiles()))
+        return '\n'.join(lines)
+
+
+ZERO_PHASES = array('q', bytes(8 * PHASE_COUNT))
+
+
+def format_percentiles(name: str, percentiles: Percentiles) -> str:
+    return f'{name:<16}' + ''.join(f'{value:>9.3f}' for value in percentiles)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import warnings
+from typing import BinaryIO, List, NamedTuple, Tuple, Iterator, Optional
+
+from engine.sdl import EventHandler, Keyboard, Scancode
+
+LOG_MAGIC = b'MRNI'
+LOG_VERSION = 1
+
+# Every frame is stored as a varint header (delta << 1 | has_key_changes), optionally followed by
+# a varint count and that many varint key changes (scancode << 1 | pressed).
+# An idle frame at 60 FPS fits in a single byte, so an hour of play is roughly 200 KB.
+
+# Keys without a Scancode are never read by the game, replays skip them.
+KNOWN_SCANCODES = frozenset(Scancode)
+
+
+class KeyChange(NamedTuple):
+    scancode: Scancode
+    pressed: bool
+
+
+class InputFrame(NamedTuple):
+    delta: int
+    key_changes: Tuple[KeyChange, ...]
+
+
+class InputRecorder:
+    __slots__ = 'stream', 'buffer', 'pending_key_changes', 'flush_interval', 'unflushed_time'
+
+    # Flushes after every flush_interval milliseconds of recorded frames, so a crash loses at most that much.
+
+    def __init__(self, stream: BinaryIO, start_time: int, flush_interval: int = 1000) -> None:
+        self.stream = stream
+        self.buffer = bytearray(LOG_MAGIC)
+        self.buffer.append(LOG_VERSION)
+        write_varint(self.buffer, start_time)
+        self.pending_key_changes: List[int] = []
+        self.flush_interval = flush_interval
+        self.unflushed_time = 0
+
+    def record_key(self, scancode: int, pressed: bool) -> None:
+        self.pending_key_changes.append(scancode << 1 | pressed)
+
+    def record_frame(self, delta: int) -> None:
+        if self.pending_key_changes:
+            write_varint(self.buffer, delta << 1 | 1)
+            write_varint(self.buffer, len(self.pending_key_changes))
+            for key_change in self.pending_key_changes:
+                write_varint(self.buffer, key_change)
+            self.pending_key_changes.clear()
+        else:
+            write_varint(self.buffer, delta << 1)
+
+        self.unflushed_time += delta
+        if self.unflushed_time >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self.stream.write(self.buffer)
+        self.stream.flush()
+        del self.buffer[:]
+        self.unflushed_time = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.stream.close()
+
+
+class InputLog:
+    __slots__ = 'start_time', 'data', 'frames_offset'
+
+    def __init__(self, data: bytes) -> None:
+        if data[:len(LOG_MAGIC)] != LOG_MAGIC:
+            raise ValueError('Not an input log')
+        version = data[len(LOG_MAGIC)]
+        if version != LOG_VERSION:
+            raise ValueError(f'Unsupported input log version: {version}')
+        self.data = data
+        self.start_time, self.frames_offset = read_varint(data, len(LOG_MAGIC) + 1)
+
+    @staticmethod
+    def load(path: str) -> InputLog:
+        with open(path, 'rb') as f:
+            return InputLog(f.read())
+
+    def __iter__(self) -> Iterator[InputFrame]:
+        # A log cut short, e.g. by a crash while recording, ends with its last complete frame.
+        offset = self.frames_offset
+        frame_count = 0
+        while offset < len(self.data):
+            try:
+                frame, offset = self.read_frame(offset)
+            except IndexError:
+                warnings.warn(f'Input log truncated after {frame_count} frames')
+                return
+            frame_count += 1
+            yield frame
+
+    def read_frame(self, offset: int) -> Tuple[InputFrame, int]:
+        header, offset = read_varint(self.data, offset)
+        key_changes: Tuple[KeyChange, ...] = ()
+        if header & 1:
+            count, offset = read_varint(self.data, offset)
+            changes = []
+            for _ in range(count):
+                key_change, offset = read_varint(self.data, offset)
+                scancode = key_change >> 1
+                if scancode in KNOWN_SCANCODES:
+                    changes.append(KeyChange(scancode=Scancode(scancode), pressed=bool(key_change & 1)))
+            key_changes = tuple(changes)
+        return InputFrame(delta=header >> 1, key_changes=key_changes), offset
+
+
+class ReplayEventHandler(EventHandler):
+    __slots__ = 'key_changes'
+
+    def __init__(self, keyboard: Optional[Keyboard] = None) -> None:
+        super().__init__(keyboard)
+        self.key_changes: Tuple[KeyChange, ...] = ()
+
+    def update(self) -> None:
+        self.keyboard.update_keys()
+        for key_change in self.key_changes:
+            if key_change.pressed:
+                self.keyboard.press(key_change.scancode)
+            else:
+                self.keyboard.release(key_change.scancode)
+        self.key_changes = ()
+
+
+def write_varint(buffer: bytearray, value: int) -> None:
+    while value >= 0x80:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
@@ -4,12 +4,18 @@ import ctypes
 import ctypes.util
 import enum
 import os
+import sys
 from abc import ABC, abstractmethod
+from array import array
 from contextlib import contextmanager
-from typing import NamedTuple, List, Optional, Dict, TypeVar, Iterator, cast, DefaultDict
+from typing import (
+    NamedTuple, List, Optional, Dict, TypeVar, Iterator, cast, DefaultDict, TYPE_CHECKING, Union, Tuple, Callable)
 
 from engine.utils import Rectangle, Line
 
+if TYPE_CHECKING:
+    from engine.replay import InputRecorder
+
 
 @enum.unique
 class EventType(enum.IntEnum):
@@ -34,6 +40,13 @@ class Scancode(enum.IntEnum):
     LEFT = 80
     LEFT_CTRL = 224
     SPACE = 44
+    BACKSPACE = 42
+    F3 = 60
+    F5 = 62
+
+
+# SDL_NUM_SCANCODES, every scancode is below it.
+SCANCODE_COUNT = 512
 
 
 def load_library(library_name: str) -> ctypes.CDLL:
@@ -44,9 +57,13 @@ def load_library(library_name: str) -> ctypes.CDLL:
     return ctypes.CDLL(lib)
 
 
+def has_render_geometry() -> bool:
+    return hasattr(libsdl2, 'SDL_RenderGeometry')
+
+
 @contextmanager
-def init_and_quit() -> Iterator[None]:
-    init_subsystems()
+def init_and_quit(headless: bool = False) -> Iterator[None]:
+    init_subsystems(headless)
     yield
     quit_subsystems()
 
@@ -55,7 +72,11 @@ libsdl2 = load_library('sdl2')
 libsdl2_image = load_library('sdl2_image')
 
 
-def init_subsystems() -> None:
+def init_subsystems(headless: bool = False) -> None:
+    if headless:
+        # Windows are never shown, only the software renderer can draw into them.
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
     libsdl2.SDL_GetError.restype = ctypes.c_char_p
     libsdl2.SDL_CreateWindow.restype = ctypes.c_void_p
     libsdl2.SDL_GetTicks.restype = ctypes.c_uint32
@@ -67,12 +88,16 @@ def init_subsystems() -> None:
     libsdl2.SDL_SetRenderDrawColor.argtypes = (
         ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint8, ctypes.c_uint8, ctypes.c_uint8)
     libsdl2.SDL_SetRenderDrawBlendMode.argtypes = ctypes.c_void_p, ctypes.c_int
+    libsdl2.SDL_SetRenderTarget.argtypes = ctypes.c_void_p, ctypes.c_void_p
     libsdl2.SDL_RenderClear.argtypes = (ctypes.c_void_p,)
     libsdl2.SDL_RenderPresent.argtypes = (ctypes.c_void_p,)
     libsdl2.SDL_RenderFillRect.argtypes = ctypes.c_void_p, ctypes.c_void_p
+    libsdl2.SDL_RenderDrawRect.argtypes = ctypes.c_void_p, ctypes.c_void_p
+    libsdl2.SDL_RenderDrawRects.argtypes = ctypes.c_void_p, ctypes.POINTER(RawRect), ctypes.c_int
+    libsdl2.SDL_RenderDrawLines.argtypes = ctypes.c_void_p, ctypes.POINTER(RawPoint), ctypes.c_int
     libsdl2.SDL_RenderDrawLine.argtypes = ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int
     libsdl2.SDL_RenderCopyEx.argtypes = (
-        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p,
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(RawRect), ctypes.POINTER(RawRect),
         ctypes.c_double, ctypes.c_void_p, ctypes.c_int)
     libsdl2.SDL_DestroyWindow.argtypes = (ctypes.c_void_p,)
     libsdl2.SDL_DestroyRenderer.argtypes = (ctypes.c_void_p,)
@@ -81,8 +106,36 @@ def init_subsystems() -> None:
     libsdl2.SDL_QueryTexture.argtypes = (
         ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p)
 
+    libsdl2.SDL_CreateTexture.argtypes = (
+        ctypes.c_void_p, ctypes.c_uint32, ctypes.c_int, ctypes.c_int, ctypes.c_int)
+    libsdl2.SDL_CreateTexture.restype = ctypes.c_void_p
+    libsdl2.SDL_UpdateTexture.argtypes = ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int
+    libsdl2.SDL_ConvertSurfaceFormat.argtypes = ctypes.c_void_p, ctypes.c_uint32, ctypes.c_uint32
+    libsdl2.SDL_ConvertSurfaceFormat.restype = ctypes.POINTER(RawSurface)
+    libsdl2.SDL_FreeSurface.argtypes = (ctypes.c_void_p,)
+    libsdl2.SDL_CreateRGBSurfaceWithFormatFrom.argtypes = (
+        ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_uint32)
+    libsdl2.SDL_CreateRGBSurfaceWithFormatFrom.restype = ctypes.POINTER(RawSurface)
+    libsdl2.SDL_SetTextureBlendMode.argtypes = ctypes.c_void_p, ctypes.c_int
+    libsdl2.SDL_SetTextureColorMod.argtypes = ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint8, ctypes.c_uint8
+    libsdl2.SDL_SetTextureAlphaMod.argtypes = ctypes.c_void_p, ctypes.c_uint8
+    libsdl2.SDL_RenderFillRects.argtypes = ctypes.c_void_p, ctypes.POINTER(RawRect), ctypes.c_int
+    # Only in SDL 2.0.18 and later, older libraries like the bundled SDL2.dll lack it.
+    if has_render_geometry():
+        libsdl2.SDL_RenderGeometry.argtypes = (
+            ctypes.c_void_p, ctypes.c_void_p,
+            ctypes.POINTER(RawVertex), ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.c_int)
+    libsdl2.SDL_RenderReadPixels.argtypes = (
+        ctypes.c_void_p, ctypes.POINTER(RawRect), ctypes.c_uint32, ctypes.c_void_p, ctypes.c_int)
+    libsdl2.SDL_GetRendererOutputSize.argtypes = (
+        ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int))
+    libsdl2.SDL_RenderSetLogicalSize.argtypes = ctypes.c_void_p, ctypes.c_int, ctypes.c_int
+
     libsdl2_image.IMG_LoadTexture.argtypes = ctypes.c_void_p, ctypes.c_char_p
     libsdl2_image.IMG_LoadTexture.restype = ctypes.c_void_p
+    libsdl2_image.IMG_Load.argtypes = (ctypes.c_char_p,)
+    libsdl2_image.IMG_Load.restype = ctypes.c_void_p
+    libsdl2_image.IMG_SavePNG.argtypes = ctypes.c_void_p, ctypes.c_char_p
 
     sdl_init_everything = 62001
     if libsdl2.SDL_Init(sdl_init_everything) < 0:
@@ -99,23 +152,38 @@ def quit_subsystems() -> None:
 
 
 class EventHandler:
-    __slots__ = 'keyboard', 'quit_requested'
+    __slots__ = 'keyboard', 'quit_requested', 'hotkeys'
+
+    # Hotkeys are reserved for the engine, pressing one calls its callback and never reaches the keyboard,
+    # so the game never sees them and input recordings leave them out.
 
     def __init__(self, keyboard: Optional[Keyboard] = None) -> None:
         self.keyboard = keyboard or Keyboard()
         self.quit_requested = False
+        self.hotkeys: Dict[int, Callable[[], None]] = {}
 
     def update(self) -> None:
+        # Keys are promoted once per frame, before its events, which is also what replays do.
         self.keyboard.update_keys()
         self.handle_pending_events()
 
     def handle_pending_events(self) -> None:
         for event in EventHandler.pending_events():
             if event.type == EventType.KEY_DOWN or event.type == EventType.KEY_UP:
-                self.keyboard.update(event)
+                if self.hotkeys and self.handle_hotkey(event):
+                    continue
+                self.keyboard.handle_event(event)
             elif event.type == EventType.QUIT:
                 self.quit_requested = True
 
+    def handle_hotkey(self, event: RawEvent) -> bool:
+        callback = self.hotkeys.get(event.key.keysym)
+        if not callback:
+            return False
+        if event.type == EventType.KEY_DOWN and not event.key.repeat:
+            callback()
+        return True
+
     @staticmethod
     def pending_events() -> Iterator[RawEvent]:
         event = RawEvent()
@@ -154,14 +222,11 @@ class KeyState(enum.Enum):
 
 
 class Keyboard:
-    __slots__ = 'keys'
+    __slots__ = 'keys', 'recorder'
 
     def __init__(self) -> None:
         self.keys = DefaultDict[Scancode, KeyState](lambda: KeyState.UP)
-
-    def update(self, event: Optional[RawEvent]) -> None:
-        self.update_keys()
-        self.handle_event(event)
+        self.recorder: Optional[InputRecorder] = None
 
     def update_keys(self) -> None:
         for key, state in self.keys.items():
@@ -175,9 +240,23 @@ class Keyboard:
             return
 
         if event.type == EventType.KEY_DOWN:
-            self.keys[event.key.keysym] = KeyState.PRESSED
+            self.press(event.key.keysym)
         elif event.type == EventType.KEY_UP:
-            self.keys[event.key.keysym] = KeyState.RELEASED
+            self.release(event.key.keysym)
+        else:
+            return
+
+        if self.recorder:
+            self.recorder.record_key(event.key.keysym, pressed=event.type == EventType.KEY_DOWN)
+
+    def press(self, scancode: Scancode) -> None:
+        self.keys[scancode] = KeyState.PRESSED
+
+    def release(self, scancode: Scancode) -> None:
+        self.keys[scancode] = KeyState.RELEASED
+
+    def reset(self) -> None:
+        self.keys.clear()
 
     def key_state(self, scancode: Scancode) -> KeyState:
         return self.keys[scancode]
@@ -240,6 +319,18 @@ class RawRect(ctypes.Structure):
     ]
 
 
+class RawPoint(ctypes.Structure):
+    _fields_ = [('x', ctypes.c_int), ('y', ctypes.c_int)]
+
+
+class RawVertex(ctypes.Structure):
+    _fields_ = [
+        ('x', ctypes.c_float), ('y', ctypes.c_float),
+        ('r', ctypes.c_uint8), ('g', ctypes.c_uint8), ('b', ctypes.c_uint8), ('a', ctypes.c_uint8),
+        ('u', ctypes.c_float), ('v', ctypes.c_float)
+    ]
+
+
 def get_current_time() -> int:
     return cast(int, libsdl2.SDL_GetTicks())
 
@@ -250,29 +341,43 @@ class Destroyable(ABC):
         pass
 
 
+WINDOW_RESIZABLE = 0x20
+
+
 class Window(Destroyable):
     __slots__ = 'raw_window'
 
-    def __init__(self, title: bytes, dimensions: complex) -> None:
+    def __init__(self, title: bytes, dimensions: complex, resizable: bool = False) -> None:
         x = int(dimensions.real / 2)
         y = int(dimensions.imag / 2)
-        self.raw_window = libsdl2.SDL_CreateWindow(title, x, y, int(dimensions.real), int(dimensions.imag), 0)
+        flags = WINDOW_RESIZABLE if resizable else 0
+        self.raw_window = libsdl2.SDL_CreateWindow(title, x, y, int(dimensions.real), int(dimensions.imag), flags)
         if not self.raw_window:
             raise Error
 
     def destroy(self) -> None:
         libsdl2.SDL_DestroyWindow(self.raw_window)
 
-    def renderer(self, draw_color: Optional[Color] = None) -> Renderer:
-        return Renderer(self, draw_color)
+    def renderer(self, draw_color: Optional[Color] = None, software: bool = False) -> Renderer:
+        return Renderer(self, draw_color, software)
+
+
+PIXEL_FORMAT_RGBA32 = 0x16762004 if sys.byteorder == 'little' else 0x16462004
+TEXTURE_ACCESS_STATIC = 0
 
 
 class Texture(Destroyable):
     __slots__ = 'raw_texture'
 
-    def __init__(self, renderer: Renderer, path: bytes) -> None:
-        self.raw_texture = libsdl2_image.IMG_LoadTexture(renderer.raw_renderer, path)
-        if not self.raw_texture:
+    def __init__(self, raw_texture: Optional[int]) -> None:
+        if not raw_texture:
+            raise Error
+        self.raw_texture = raw_texture
+
+    def set_color_modulation(self, color: Color) -> None:
+        if libsdl2.SDL_SetTextureColorMod(self.raw_texture, color.r, color.g, color.b) < 0:
+            raise Error
+        if libsdl2.SDL_SetTextureAlphaMod(self.raw_texture, color.a) < 0:
             raise Error
 
     @property
@@ -302,75 +407,308 @@ class Texture(Destroyable):
 LoadedTextures = Dict[bytes, Texture]
 
 
+class RawSurface(ctypes.Structure):
+    # Only the leading fields of SDL_Surface, which is never allocated from Python.
+    _fields_ = [
+        ('flags', ctypes.c_uint32), ('format', ctypes.c_void_p),
+        ('w', ctypes.c_int), ('h', ctypes.c_int), ('pitch', ctypes.c_int),
+        ('pixels', ctypes.c_void_p)
+    ]
+
+
+class Surface(Destroyable):
+    __slots__ = 'raw_surface'
+
+    # Pixels in main memory, always converted to RGBA so they can be uploaded to textures in parts.
+
+    def __init__(self, raw_surface: ctypes._Pointer[RawSurface]) -> None:
+        if not raw_surface:
+            raise Error
+        self.raw_surface = raw_surface
+
+    @staticmethod
+    def load(path: bytes) -> Surface:
+        loaded_surface = libsdl2_image.IMG_Load(path)
+        if not loaded_surface:
+            raise Error
+        try:
+            return Surface(libsdl2.SDL_ConvertSurfaceFormat(loaded_surface, PIXEL_FORMAT_RGBA32, 0))
+        finally:
+            libsdl2.SDL_FreeSurface(loaded_surface)
+
+    @property
+    def dimensions(self) -> complex:
+        return complex(self.raw_surface.contents.w, self.raw_surface.contents.h)
+
+    @property
+    def pitch(self) -> int:
+        return cast(int, self.raw_surface.contents.pitch)
+
+    def pixels_address(self, x: int, y: int) -> int:
+        return cast(int, self.raw_surface.contents.pixels) + y * self.pitch + x * 4
+
+    def read_pixels(self) -> bytes:
+        # Row after row, without whatever padding the rows have in the surface.
+        row_size = 4 * int(self.dimensions.real)
+        return b''.join(
+            ctypes.string_at(self.pixels_address(0, y), row_size) for y in range(int(self.dimensions.imag)))
+
+    def save_png(self, path: bytes) -> None:
+        if libsdl2_image.IMG_SavePNG(self.raw_surface, path) < 0:
+            raise Error
+
+    def destroy(self) -> None:
+        libsdl2.SDL_FreeSurface(self.raw_surface)
+
+
+def raw_surface_from_pixels(address: int, dimensions: complex, pitch: int) -> ctypes._Pointer[RawSurface]:
+    # The surface points to the RGBA pixels at the address without copying them, they must outlive it.
+    return cast('ctypes._Pointer[RawSurface]', libsdl2.SDL_CreateRGBSurfaceWithFormatFrom(
+        address, int(dimensions.real), int(dimensions.imag), 32, pitch, PIXEL_FORMAT_RGBA32))
+
+
+@enum.unique
+class RenderCall(enum.IntEnum):
+    CLEAR = 0
+    PRESENT = 1
+    SET_DRAW_COLOR = 2
+    SET_BLEND_MODE = 3
+    SET_RENDER_TARGET = 4
+    DRAW_TEXTURE = 5
+    DRAW_LINE = 6
+    DRAW_LINES = 7
+    FILL_RECTANGLE = 8
+    FILL_RECTANGLES = 9
+    DRAW_RECTANGLE = 10
+    DRAW_RECTANGLES = 11
+    DRAW_GEOMETRY = 12
+
+
+DRAW_CALLS = tuple(call for call in RenderCall if call >= RenderCall.DRAW_TEXTURE)
+
+
+@enum.unique
+class BlendMode(enum.IntEnum):
+    NONE = 0
+    BLEND = 1
+    ADD = 2
+    MOD = 4
+
+
+class RenderStats:
+    __slots__ = 'issued', 'skipped', 'presented_issued', 'presented_skipped'
+
+    # Native calls issued and redundant calls skipped, per call type, for the frame being drawn
+    # and for the last presented frame.
+
+    def __init__(self) -> None:
+        self.issued = array('i', bytes(4 * len(RenderCall)))
+        self.skipped = array('i', bytes(4 * len(RenderCall)))
+        self.presented_issued = array('i', bytes(4 * len(RenderCall)))
+        self.presented_skipped = array('i', bytes(4 * len(RenderCall)))
+
+    def end_frame(self) -> None:
+        self.presented_issued[:] = self.issued
+        self.presented_skipped[:] = self.skipped
+        self.issued[:] = ZERO_RENDER_CALLS
+        self.skipped[:] = ZERO_RENDER_CALLS
+
+    @property
+    def draw_calls(self) -> int:
+        return sum(self.issued[call] for call in DRAW_CALLS)
+
+    @property
+    def presented_draw_calls(self) -> int:
+        return sum(self.presented_issued[call] for call in DRAW_CALLS)
+
+    def presented(self) -> Dict[str, Tuple[int, int]]:
+        return {call.name.lower(): (self.presented_issued[call], self.presented_skipped[call]) for call in RenderCall}
+
+
+ZERO_RENDER_CALLS = array('i', bytes(4 * len(RenderCall)))
+
+
+RENDERER_SOFTWARE = 0x1
+
+
 class Renderer(Destroyable):
-    __slots__ = 'raw_renderer'
+    __slots__ = 'raw_renderer', 'stats', 'draw_color', 'blend_mode', 'render_target', 'supports_geometry'
+
+    # The draw colour, blend mode and render target are tracked here, so setting them to what they
+    # already are does not reach SDL.
 
-    def __init__(self, window: Window, draw_color: Optional[Color] = None) -> None:
-        self.raw_renderer = libsdl2.SDL_CreateRenderer(window.raw_window, -1, 0)
+    def __init__(self, window: Window, draw_color: Optional[Color] = None, software: bool = False) -> None:
+        flags = RENDERER_SOFTWARE if software else 0
+        self.raw_renderer = libsdl2.SDL_CreateRenderer(window.raw_window, -1, flags)
         if not self.raw_renderer:
             raise Error
+        self.stats = RenderStats()
+        self.draw_color: Optional[Color] = None
+        self.blend_mode: Optional[BlendMode] = None
+        self.render_target: Optional[Texture] = None
+        self.supports_geometry = has_render_geometry()
         self.set_draw_color(draw_color or Color.white())
         self.enable_alpha_blending()
 
     def destroy(self) -> None:
         libsdl2.SDL_DestroyRenderer(self.raw_renderer)
 
+    @property
+    def draw_calls(self) -> int:
+        return self.stats.draw_calls
+
+    @property
+    def presented_draw_calls(self) -> int:
+        return self.stats.presented_draw_calls
+
+    @property
+    def output_dimensions(self) -> complex:
+        w = ctypes.c_int(0)
+        h = ctypes.c_int(0)
+        if libsdl2.SDL_GetRendererOutputSize(self.raw_renderer, ctypes.byref(w), ctypes.byref(h)) < 0:
+            raise Error
+        return complex(w.value, h.value)
+
+    def read_pixels(self, pixels: bytearray, dimensions: complex) -> None:
+        # Reads the given dimensions from the top left of the output as RGBA into pixels, 4 bytes per pixel.
+        # SDL clips the rectangle to the output, so a window resized since the buffer was sized can't overflow it.
+        # Must be called before present, the back buffer is undefined afterwards.
+        width, height = int(dimensions.real), int(dimensions.imag)
+        if len(pixels) < 4 * width * height:
+            raise ValueError(f'{len(pixels)} bytes cannot hold {width}x{height} pixels')
+        buffer = (ctypes.c_char * len(pixels)).from_buffer(pixels)
+        rect = RawRect(0, 0, width, height)
+        if libsdl2.SDL_RenderReadPixels(
+                self.raw_renderer, ctypes.byref(rect), PIXEL_FORMAT_RGBA32, buffer, width * 4) < 0:
+            raise Error
+
+    def set_logical_size(self, dimensions: complex) -> None:
+        # Everything is drawn at this resolution and SDL scales it to the window, keeping the aspect ratio.
+        if libsdl2.SDL_RenderSetLogicalSize(self.raw_renderer, int(dimensions.real), int(dimensions.imag)) < 0:
+            raise Error
+
     def load_texture(self, path: bytes) -> Texture:
-        return Texture(self, path)
+        return Texture(libsdl2_image.IMG_LoadTexture(self.raw_renderer, path))
+
+    def create_texture(self, pixels: Union[bytes, int], dimensions: complex, pitch: Optional[int] = None) -> Texture:
+        # Pixels are RGBA, 4 bytes each, row after row, given as bytes or as the address of the first one.
+        # Rows start pitch bytes apart, which is the width of the texture by default.
+        width = int(dimensions.real)
+        texture = Texture(libsdl2.SDL_CreateTexture(
+            self.raw_renderer, PIXEL_FORMAT_RGBA32, TEXTURE_ACCESS_STATIC, width, int(dimensions.imag)))
+        if (libsdl2.SDL_UpdateTexture(texture.raw_texture, None, pixels, pitch or width * 4) < 0 or
+                libsdl2.SDL_SetTextureBlendMode(texture.raw_texture, BlendMode.BLEND) < 0):
+            texture.destroy()
+            raise Error
+        return texture
+
+    def create_texture_from_surface(self, surface: Surface, region: Rectangle) -> Texture:
+        return self.create_texture(
+            surface.pixels_address(int(region.upper_left.real), int(region.upper_left.imag)),
+            region.dimensions, pitch=surface.pitch)
 
     def load_textures(self, paths: List[bytes]) -> LoadedTextures:
         return {path: self.load_texture(path) for path in paths}
 
     def clear(self) -> None:
+        self.stats.issued[RenderCall.CLEAR] += 1
         if libsdl2.SDL_RenderClear(self.raw_renderer) < 0:
             raise Error
 
     def present(self) -> None:
+        self.stats.issued[RenderCall.PRESENT] += 1
         if libsdl2.SDL_RenderPresent(self.raw_renderer) < 0:
             raise Error
+        self.stats.end_frame()
 
     def draw_rectangle(self, rectangle: Rectangle, fill: bool) -> None:
         if fill:
+            self.stats.issued[RenderCall.FILL_RECTANGLE] += 1
             if libsdl2.SDL_RenderFillRect(self.raw_renderer, ctypes.byref(raw_rectangle_parameter(rectangle))) < 0:
                 raise Error
         else:
-            raise NotImplementedError
+            self.stats.issued[RenderCall.DRAW_RECTANGLE] += 1
+            if libsdl2.SDL_RenderDrawRect(self.raw_renderer, ctypes.byref(raw_rectangle_parameter(rectangle))) < 0:
+                raise Error
+
+    def draw_raw_rectangles(self, rectangles: Union[RawRect, ctypes.Array[RawRect]], count: int) -> None:
+        self.stats.issued[RenderCall.DRAW_RECTANGLES] += 1
+        if libsdl2.SDL_RenderDrawRects(self.raw_renderer, rectangles, count) < 0:
+            raise Error
+
+    def draw_raw_lines(self, points: Union[RawPoint, ctypes.Array[RawPoint]], count: int) -> None:
+        # Draws a connected polyline through count points, starting from the given one.
+        self.stats.issued[RenderCall.DRAW_LINES] += 1
+        if libsdl2.SDL_RenderDrawLines(self.raw_renderer, points, count) < 0:
+            raise Error
+
+    def fill_raw_rectangles(self, rectangles: Union[RawRect, ctypes.Array[RawRect]], count: int) -> None:
+        self.stats.issued[RenderCall.FILL_RECTANGLES] += 1
+        if libsdl2.SDL_RenderFillRects(self.raw_renderer, rectangles, count) < 0:
+            raise Error
 
     def draw_line(self, line: Line) -> None:
+        self.stats.issued[RenderCall.DRAW_LINE] += 1
         if libsdl2.SDL_RenderDrawLine(
                 self.raw_renderer, int(line.origin.real), int(line.origin.imag),
                 int(line.end.real), int(line.end.imag)) < 0:
             raise Error
 
     def get_draw_color(self) -> Color:
-        r = ctypes.c_int()
-        g = ctypes.c_int()
-        b = ctypes.c_int()
-        a = ctypes.c_int()
-
-        if libsdl2.SDL_GetRenderDrawColor(
-                self.raw_renderer,
-                ctypes.byref(r), ctypes.byref(g), ctypes.byref(b), ctypes.byref(a)) < 0:
-            raise Error
-
-        return Color(r.value, g.value, b.value, a.value)
+        assert self.draw_color
+        return self.draw_color
 
     def set_draw_color(self, color: Color) -> None:
+        if color == self.draw_color:
+            self.stats.skipped[RenderCall.SET_DRAW_COLOR] += 1
+            return
+        self.stats.issued[RenderCall.SET_DRAW_COLOR] += 1
         if libsdl2.SDL_SetRenderDrawColor(self.raw_renderer, color.r, color.g, color.b, color.a) < 0:
             raise Error
+        self.draw_color = color
+
+    def set_blend_mode(self, blend_mode: BlendMode) -> None:
+        if blend_mode is self.blend_mode:
+            self.stats.skipped[RenderCall.SET_BLEND_MODE] += 1
+            return
+        self.stats.issued[RenderCall.SET_BLEND_MODE] += 1
+        if libsdl2.SDL_SetRenderDrawBlendMode(self.raw_renderer, blend_mode) < 0:
+            raise Error
+        self.blend_mode = blend_mode
 
     def enable_alpha_blending(self) -> None:
-        if libsdl2.SDL_SetRenderDrawBlendMode(self.raw_renderer, 1) < 0:
+        self.set_blend_mode(BlendMode.BLEND)
+
+    def set_render_target(self, texture: Optional[Texture]) -> None:
+        # None renders to the window again.
+        if texture is self.render_target:
+            self.stats.skipped[RenderCall.SET_RENDER_TARGET] += 1
+            return
+        self.stats.issued[RenderCall.SET_RENDER_TARGET] += 1
+        if libsdl2.SDL_SetRenderTarget(self.raw_renderer, texture.raw_texture if texture else None) < 0:
             raise Error
+        self.render_target = texture
 
     def draw_texture(
             self, texture: Texture,
             source: Rectangle, destination: Rectangle,
             flip: Flip = Flip.NONE) -> None:
-        if libsdl2.SDL_RenderCopyEx(
-                self.raw_renderer, texture.raw_texture,
-                ctypes.byref(raw_rectangle_parameter(source)), ctypes.byref(raw_rectangle_parameter(destination)),
-                ctypes.c_double(0), None, flip) < 0:
+        self.draw_raw_texture(texture, raw_rectangle_parameter(source), raw_rectangle_parameter(destination), flip)
+
+    def draw_raw_texture(self, texture: Texture, source: RawRect, destination: RawRect, flip: Flip = Flip.NONE) -> None:
+        # The rectangles are passed by reference as they are, so callers can reuse them between draws.
+        self.stats.issued[RenderCall.DRAW_TEXTURE] += 1
+        if libsdl2.SDL_RenderCopyEx(self.raw_renderer, texture.raw_texture, source, destination, 0, None, flip) < 0:
+            raise Error
+
+    def draw_geometry(
+            self, texture: Texture, vertices: ctypes.Array[RawVertex], vertex_count: int,
+            indices: ctypes.Array[ctypes.c_int], index_count: int) -> None:
+        # Triangles given by indices into the vertices, all textured from the same texture. Needs SDL 2.0.18,
+        # see supports_geometry.
+        self.stats.issued[RenderCall.DRAW_GEOMETRY] += 1
+        if libsdl2.SDL_RenderGeometry(
+                self.raw_renderer, texture.raw_texture, vertices, vertex_count, indices, index_count) < 0:
             raise Error
 
 
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from array import array
+from threading import Thread
+from time import sleep
+from typing import Generic, TypeVar, Callable, List
+
+from engine.game import Actor
+from engine.graphics import Camera, Sprite, AnimationSystem
+from engine.physics import Integrator
+from engine.sdl import Destroyable, Flip, Keyboard, KeyState, Scancode, SCANCODE_COUNT
+from engine.timer import Time
+from engine.utils import Rectangle
+
+T = TypeVar('T')
+
+
+class TripleBuffer(Generic[T]):
+    __slots__ = 'buffers', 'latest', 'reading'
+
+    # One writer fills a buffer that is neither the latest published one nor the one being read,
+    # so publishing and reading never wait for each other. Only references are swapped,
+    # which is atomic under the GIL.
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        self.buffers = (factory(), factory(), factory())
+        self.latest = self.buffers[0]
+        self.reading = self.buffers[0]
+
+    def write_buffer(self) -> T:
+        latest = self.latest
+        reading = self.reading
+        for buffer in self.buffers:
+            if buffer is not latest and buffer is not reading:
+                return buffer
+        assert False
+
+    def publish(self, buffer: T) -> None:
+        self.latest = buffer
+
+    def read(self) -> T:
+        # Once the buffer is marked as being read while it is still the latest one, the writer will avoid it.
+        while True:
+            buffer = self.latest
+            self.reading = buffer
+            if buffer is self.latest:
+                return buffer
+
+
+class RenderSnapshot:
+    __slots__ = (
+        'time', 'physics_steps', 'entity_count', 'count', 'rectangles', 'velocities', 'on_ground', 'flips',
+        'frame_nums', 'sprites', 'destination')
+
+    # What drawing the actors, their debug shapes and the HUD needs, copied out at the end of a simulation step:
+    # the integrator's counts, checkboxes as (x, y, w, h), velocities as (x, y), flips, sprites and their frames.
+
+    def __init__(self) -> None:
+        self.time = Time(current=0, delta=0)
+        self.physics_steps = 0
+        self.entity_count = 0
+        self.count = 0
+        self.rectangles = array('d')
+        self.velocities = array('d')
+        self.on_ground = array('b')
+        self.flips = array('b')
+        self.frame_nums = array('i')
+        self.sprites: List[Sprite] = []
+        self.destination = Rectangle(upper_left=0, dimensions=0)
+
+    def capture(self, integrator: Integrator, time: Time) -> None:
+        self.time = time
+        self.physics_steps = integrator.step_count
+        self.entity_count = len(integrator.entities)
+        count = 0
+        for actor in integrator.entities:
+            if not isinstance(actor, Actor):
+                continue
+            if count == len(self.sprites):
+                self.rectangles.extend((0, 0, 0, 0))
+                self.velocities.extend((0, 0))
+                self.on_ground.append(0)
+                self.flips.append(0)
+                self.frame_nums.append(0)
+                self.sprites.append(actor.sprite)
+            checkbox = actor.checkbox
+            offset = 4 * count
+            self.rectangles[offset] = checkbox.upper_left.real
+            self.rectangles[offset + 1] = checkbox.upper_left.imag
+            self.rectangles[offset + 2] = checkbox.dimensions.real
+            self.rectangles[offset + 3] = checkbox.dimensions.imag
+            self.velocities[2 * count] = actor.velocity.real
+            self.velocities[2 * count + 1] = actor.velocity.imag
+            self.on_ground[count] = actor.on_ground
+            self.flips[count] = actor.flip
+            self.frame_nums[count] = actor.sprite_player.frame_num
+            self.sprites[count] = actor.sprite
+            count += 1
+        self.count = count
+
+    def center(self, index: int) -> complex:
+        offset = 4 * index
+        rectangles = self.rectangles
+        return complex(
+            rectangles[offset] + rectangles[offset + 2] / 2, rectangles[offset + 1] + rectangles[offset + 3] / 2)
+
+    def checkbox(self, index: int) -> Rectangle:
+        offset = 4 * index
+        rectangles = self.rectangles
+        return Rectangle(
+            upper_left=complex(rectangles[offset], rectangles[offset + 1]),
+            dimensions=complex(rectangles[offset + 2], rectangles[offset + 3]))
+
+    def velocity(self, index: int) -> complex:
+        return complex(self.velocities[2 * index], self.velocities[2 * index + 1])
+
+    def render(self, camera: Camera) -> None:
+        destination = self.destination
+        rectangles = self.rectangles
+        for index in range(self.count):
+            offset = 4 * index
+            destination.upper_left = complex(rectangles[offset], rectangles[offset + 1])
+            destination.dimensions = complex(rectangles[offset + 2], rectangles[offset + 3])
+            self.sprites[index].render(camera, destination, Flip(self.flips[index]), self.frame_nums[index])
+
+
+class InputSnapshot:
+    __slots__ = 'down', 'down_scancodes'
+
+    # Which keys were down at the end of a frame of the main thread, as a flag per scancode and as a list.
+
+    def __init__(self) -> None:
+        self.down = array('b', bytes(SCANCODE_COUNT))
+        self.down_scancodes: List[Scancode] = []
+
+    def capture(self, keyboard: Keyboard) -> None:
+        down = self.down
+        for scancode in self.down_scancodes:
+            down[scancode] = False
+        self.down_scancodes.clear()
+        for scancode, state in keyboard.keys.items():
+            if state is KeyState.PRESSED or state is KeyState.DOWN:
+                down[scancode] = True
+                self.down_scancodes.append(scancode)
+
+    def apply(self, keyboard: Keyboard) -> None:
+        # Presses and releases are found by comparing with the keyboard, so they are seen once by the
+        # simulation however many frames the main thread ran since its last step.
+        keyboard.update_keys()
+        keys = keyboard.keys
+        down = self.down
+        for scancode, state in keys.items():
+            if state is KeyState.DOWN and not down[scancode]:
+                keys[scancode] = KeyState.RELEASED
+        for scancode in self.down_scancodes:
+            if keys.get(scancode) is not KeyState.DOWN:
+                keyboard.press(scancode)
+
+
+class SimulationThread(Destroyable):
+    __slots__ = 'integrator', 'animation_system', 'keyboard', 'frame_time', 'snapshots', 'inputs', 'running', 'thread'
+
+    # Runs the animations and the integrator at a fixed rate on a thread of its own, and publishes
+    # a RenderSnapshot of the actors after every update. The main thread keeps handling SDL events and drawing
+    # the latest snapshot at its own pace, and publishes an InputSnapshot after handling each frame's events.
+    # Entities read the keyboard given here, which only the simulation thread updates from the latest one.
+
+    def __init__(self, integrator: Integrator, animation_system: AnimationSystem, keyboard: Keyboard, fps: int) -> None:
+        self.integrator = integrator
+        self.animation_system = animation_system
+        self.keyboard = keyboard
+        self.frame_time = round(1000 / fps)
+        self.snapshots: TripleBuffer[RenderSnapshot] = TripleBuffer(RenderSnapshot)
+        self.inputs: TripleBuffer[InputSnapshot] = TripleBuffer(InputSnapshot)
+        self.running = False
+        self.thread = Thread(target=self.run, name='Simulation', daemon=True)
+
+    def start(self) -> None:
+        self.publish_snapshot(Time.now())
+        self.running = True
+        self.thread.start()
+
+    def destroy(self) -> None:
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def run(self) -> None:
+        time = Time.now()
+        while self.running:
+            new_time = time.updated()
+            if new_time.delta < self.frame_time:
+                # Sleeping lets go of the GIL, unlike waiting in a loop.
+                sleep((self.frame_time - new_time.delta) / 1000)
+                continue
+            time = new_time
+            self.step(time)
+
+    def publish_input(self, keyboard: Keyboard) -> None:
+        # Called by the main thread.
+        snapshot = self.inputs.write_buffer()
+        snapshot.capture(keyboard)
+        self.inputs.publish(snapshot)
+
+    def step(self, time: Time) -> None:
+        self.inputs.read().apply(self.keyboard)
+        self.animation_system.update(time)
+        self.integrator.update(time)
+        self.publish_snapshot(time)
+
+    def publish_snapshot(self, time: Time) -> None:
+        snapshot = self.snapshots.write_buffer()
+        snapshot.capture(self.integrator, time)
+        self.snapshots.publish(snapshot)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from array import array
+from typing import Any, List, Tuple
+
+
+class SnapshotCursor:
+    __slots__ = 'values', 'references', 'value_index', 'reference_index'
+
+    def __init__(self, values: array[float], references: List[Any]) -> None:
+        self.values = values
+        self.references = references
+        self.value_index = 0
+        self.reference_index = 0
+
+    def seek(self, value_index: int, reference_index: int) -> None:
+        self.value_index = value_index
+        self.reference_index = reference_index
+
+    def write(self, value: float) -> None:
+        self.values[self.value_index] = value
+        self.value_index += 1
+
+    def write_complex(self, value: complex) -> None:
+        self.values[self.value_index] = value.real
+        self.values[self.value_index + 1] = value.imag
+        self.value_index += 2
+
+    def write_reference(self, reference: Any) -> None:
+        self.references[self.reference_index] = reference
+        self.reference_index += 1
+
+    def read(self) -> float:
+        value = self.values[self.value_index]
+        self.value_index += 1
+        return value
+
+    def read_complex(self) -> complex:
+        value = complex(self.values[self.value_index], self.values[self.value_index + 1])
+        self.value_index += 2
+        return value
+
+    def read_reference(self) -> Any:
+        reference = self.references[self.reference_index]
+        self.reference_index += 1
+        return reference
+
+
+class Snapshottable(ABC):
+    __slots__ = ()
+
+    @abstractmethod
+    def save_state(self, cursor: SnapshotCursor) -> None:
+        pass
+
+    @abstractmethod
+    def restore_state(self, cursor: SnapshotCursor) -> None:
+        pass
+
+    def snapshot_layout(self) -> int:
+        # Changes whenever what save_state writes changes shape, e.g. when entities are spawned or despawned.
+        return 0
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class WorldSnapshots:
+    __slots__ = (
+        'world', 'capacity', 'layout', 'frame_values', 'frame_references',
+        'values', 'references', 'cursor', 'newest', 'count')
+
+    # All snapshots live in one preallocated array of floats plus one list of object references,
+    # each snapshot occupying a fixed-size slot. Saving or restoring never allocates, unless the world's
+    # layout changed: snapshots from an older layout cannot be restored, so they are forgotten, and
+    # the slots are measured again when the world no longer fits in them.
+
+    def __init__(self, world: Snapshottable, capacity: int) -> None:
+        self.world = world
+        self.capacity = capacity
+        self.layout = world.snapshot_layout()
+        self.allocate()
+        self.newest = -1
+        self.count = 0
+
+    def allocate(self) -> None:
+        self.frame_values, self.frame_references = WorldSnapshots.measure(self.world)
+        self.values = array('d', bytes(8 * self.frame_values * self.capacity))
+        self.references: List[Any] = [None] * (self.frame_references * self.capacity)
+        self.cursor = SnapshotCursor(self.values, self.references)
+
+    @staticmethod
+    def measure(world: Snapshottable) -> Tuple[int, int]:
+        size = 256
+        while True:
+            cursor = SnapshotCursor(array('d', bytes(8 * size)), [None] * size)
+            try:
+                world.save_state(cursor)
+            except IndexError:
+                size *= 2
+                continue
+            return cursor.value_index, cursor.reference_index
+
+    def __len__(self) -> int:
+        return self.count
+
+    def clear(self) -> None:
+        self.newest = -1
+        self.count = 0
+
+    def layout_changed(self) -> bool:
+        # Forgets the snapshots if they no longer match the world.
+        layout = self.world.snapshot_layout()
+        if layout == self.layout:
+            return False
+        self.layout = layout
+        self.clear()
+        return True
+
+    def save(self) -> None:
+        self.layout_changed()
+        if not self.save_in_slot((self.newest + 1) % self.capacity):
+            self.clear()
+            self.allocate()
+            if not self.save_in_slot(0):
+                raise SnapshotError('The world does not fit the snapshot layout it was measured for')
+        self.newest = (self.newest + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def save_in_slot(self, slot: int) -> bool:
+        self.seek(slot)
+        try:
+            self.world.save_state(self.cursor)
+        except IndexError:
+            return False
+        return (self.cursor.value_index <= (slot + 1) * self.frame_values and
+                self.cursor.reference_index <= (slot + 1) * self.frame_references)
+
+    def restore(self, age: int = 0) -> bool:
+        # Returns whether the snapshot could be restored, it cannot when the world's layout has changed since.
+        if self.layout_changed():
+            return False
+        self.seek(self.slot(age))
+        self.world.restore_state(self.cursor)
+        return True
+
+    def rewind(self, age: int) -> bool:
+        # Restores an older snapshot and forgets everything newer, so recording continues from there.
+        if not self.restore(age):
+            return False
+        self.newest = self.slot(age)
+        self.count -= age
+        return True
+
+    def slot(self, age: int) -> int:
+        if not 0 <= age < self.count:
+            raise IndexError(f'No snapshot {age} frames back')
+        return (self.newest - age) % self.capacity
+
+    def seek(self, slot: int) -> None:
+        self.cursor.seek(slot * self.frame_values, slot * self.frame_references)
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import gc
+import struct
+from array import array
+from threading import Thread, Event
+from time import perf_counter_ns
+from typing import BinaryIO, NamedTuple, Iterator, Dict, Any, Optional, List, Sequence
+
+from engine.profiler import Percentiles
+from engine.sdl import Destroyable
+
+TELEMETRY_MAGIC = b'MRTL'
+TELEMETRY_VERSION = 1
+TELEMETRY_HEADER = struct.Struct('<4sI')
+# Frame time in nanoseconds, physics steps, entity count, draw calls and garbage collections.
+TELEMETRY_RECORD = struct.Struct('<qiiii')
+FIELD_COUNT = 5
+
+
+class FrameRecord(NamedTuple):
+    frame_time: float
+    physics_steps: int
+    entity_count: int
+    draw_calls: int
+    gc_collections: int
+
+
+class TelemetryRing:
+    __slots__ = 'capacity', 'records', 'written', 'read', 'dropped'
+
+    # A preallocated ring with one producer and one consumer thread. Only the producer moves `written`
+    # and only the consumer moves `read`, both count records since the start, so neither needs a lock.
+    # When the consumer falls a whole ring behind, new records are dropped.
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.records = array('q', bytes(8 * FIELD_COUNT * capacity))
+        self.written = 0
+        self.read = 0
+        self.dropped = 0
+
+    def push(
+            self, frame_time: int, physics_steps: int, entity_count: int, draw_calls: int,
+            gc_collections: int) -> bool:
+        written = self.written
+        if written - self.read >= self.capacity:
+            self.dropped += 1
+            return False
+        offset = (written % self.capacity) * FIELD_COUNT
+        records = self.records
+        records[offset] = frame_time
+        records[offset + 1] = physics_steps
+        records[offset + 2] = entity_count
+        records[offset + 3] = draw_calls
+        records[offset + 4] = gc_collections
+        # Published only once the record is complete.
+        self.written = written + 1
+        return True
+
+    def drain(self, buffer: bytearray) -> int:
+        # Appends the records written so far to the buffer, packed, and returns how many there were.
+        read = self.read
+        written = self.written
+        records = self.records
+        for index in range(read, written):
+            offset = (index % self.capacity) * FIELD_COUNT
+            buffer += TELEMETRY_RECORD.pack(*records[offset:offset + FIELD_COUNT])
+        self.read = written
+        return written - read
+
+
+class TelemetryWriter(Destroyable):
+    __slots__ = (
+        'stream', 'ring', 'interval', 'thread', 'stopping', 'frame_start', 'collections', 'frame_collections',
+        'physics_steps', 'entity_count', 'draw_calls', 'error')
+
+    # The game thread only pushes one record per frame into a ring, a writer thread wakes up every `interval`
+    # seconds and writes whatever has been pushed since, in one go. The stream is closed when destroyed.
+
+    def __init__(self, stream: BinaryIO, capacity: int = 4096, interval: float = 0.5) -> None:
+        self.stream = stream
+        self.ring = TelemetryRing(capacity)
+        self.interval = interval
+        self.frame_start = 0
+        self.collections = 0
+        self.frame_collections = 0
+        self.physics_steps = 0
+        self.entity_count = 0
+        self.draw_calls = 0
+        self.error: Optional[BaseException] = None
+        stream.write(TELEMETRY_HEADER.pack(TELEMETRY_MAGIC, TELEMETRY_VERSION))
+        gc.callbacks.append(self.count_collection)
+        self.stopping = Event()
+        self.thread = Thread(target=self.write_records, name='TelemetryWriter', daemon=True)
+        self.thread.start()
+
+    def count_collection(self, phase: str, info: Dict[str, Any]) -> None:
+        if phase == 'stop':
+            self.collections += 1
+
+    def begin_frame(self) -> None:
+        self.frame_start = perf_counter_ns()
+        self.frame_collections = self.collections
+
+    def record_counts(self, physics_steps: int, entity_count: int, draw_calls: int) -> None:
+        self.physics_steps = physics_steps
+        self.entity_count = entity_count
+        self.draw_calls = draw_calls
+
+    def end_frame(self) -> None:
+        if not self.frame_start:
+            return
+        self.ring.push(
+            perf_counter_ns() - self.frame_start, self.physics_steps, self.entity_count, self.draw_calls,
+            self.collections - self.frame_collections)
+        self.frame_start = 0
+        self.physics_steps = self.entity_count = self.draw_calls = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.ring.dropped
+
+    def write_records(self) -> None:
+        buffer = bytearray()
+        while not self.stopping.wait(self.interval):
+            self.flush(buffer)
+        self.flush(buffer)
+
+    def flush(self, buffer: bytearray) -> None:
+        if not self.ring.drain(buffer) or self.error:
+            buffer.clear()
+            return
+        try:
+            self.stream.write(buffer)
+            self.stream.flush()
+        except BaseException as error:
+            # Kept for destroy to raise on the main thread.
+            self.error = error
+        buffer.clear()
+
+    def destroy(self) -> None:
+        gc.callbacks.remove(self.count_collection)
+        self.stopping.set()
+        self.thread.join()
+        self.stream.close()
+        if self.error:
+            raise self.error
+
+
+def read_telemetry(stream: BinaryIO) -> Iterator[FrameRecord]:
+    header = stream.read(TELEMETRY_HEADER.size)
+    if len(header) < TELEMETRY_HEADER.size:
+        raise ValueError('Not a telemetry file')
+    magic, version = TELEMETRY_HEADER.unpack(header)
+    if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION:
+        raise ValueError('Not a telemetry file, or one from another version')
+    data = stream.read()
+    # A run that was killed may have left half a record at the end.
+    data = data[:len(data) - len(data) % TELEMETRY_RECORD.size]
+    for frame_time, physics_steps, entity_count, draw_calls, gc_collections in TELEMETRY_RECORD.iter_unpack(data):
+        yield FrameRecord(frame_time / 1e6, physics_steps, entity_count, draw_calls, gc_collections)
+
+
+def load_telemetry(path: str) -> List[FrameRecord]:
+    with open(path, 'rb') as stream:
+        return list(read_telemetry(stream))
+
+
+# The smallest differences worth reporting, so that e.g. one more garbage collection than zero is not infinitely worse.
+REGRESSION_THRESHOLDS = FrameRecord(frame_time=0.1, physics_steps=1, entity_count=1, draw_calls=1, gc_collections=1)
+
+
+class Regression(NamedTuple):
+    field: str
+    percentile: str
+    baseline: float
+    value: float
+
+
+def summarize(records: Sequence[FrameRecord]) -> Dict[str, Percentiles]:
+    return {
+        field: Percentiles.of([record[index] for record in records]) for index, field in enumerate(FrameRecord._fields)}
+
+
+def find_regressions(
+        summary: Dict[str, Percentiles], baseline: Dict[str, Percentiles], tolerance: float = 0.1) -> List[Regression]:
+    # Percentiles more than `tolerance` (a fraction) above the baseline's.
+    regressions: List[Regression] = []
+    for index, field in enumerate(FrameRecord._fields):
+        for percentile, value, baseline_value in zip(Percentiles._fields, summary[field], baseline[field]):
+            if value > baseline_value * (1 + tolerance) and value - baseline_value >= REGRESSION_THRESHOLDS[index]:
+                regressions.append(Regression(field, percentile, baseline_value, value))
+    return regressions
@@ -0,0 +1,88 @@
+import unittest
+from statistics import median
+from typing import List
+
+from engine.allocations import AllocationTracker
+from engine.game import Game, Actor
+from engine.graphics import Sprite, Animation
+from engine.physics import Integrator, Block
+from engine.replay import ReplayEventHandler
+from engine.timer import Time
+from engine.utils import Rectangle
+
+# Memory blocks a typical steady-state frame may leave allocated. Frames that allocate nothing still show a few
+# now and then, from the interpreter's own caches and whatever earlier tests left behind, hence the median.
+ALLOCATION_BUDGET = 4
+
+
+class WorldGame(Game):
+    # Walking and standing actors on the ground, without a window.
+
+    def __init__(self) -> None:
+        super().__init__(fps=60, event_handler=ReplayEventHandler())
+        sprite = Sprite(texture=None, animation=Animation(  # type: ignore
+            starting_frame=Rectangle(upper_left=0, dimensions=16 + 32j), frame_count=3, frame_delay=100, loop=True))
+        actors = [
+            Actor(
+                sprite, Rectangle(upper_left=x * 20 + 150j, dimensions=16 + 32j),
+                animation_system=self.animation_system)
+            for x in range(10)]
+        for actor in actors[:5]:
+            actor.velocity = 30
+        self.integrator = Integrator(
+            timestep=2, gravity=300, horizontal_drag=0, entities=actors,
+            terrain=[Block(upper_left=200j, dimensions=1000 + 24j)])
+        self.time = Time(current=0, delta=0)
+
+    def frame_advance(self, time: Time) -> None:
+        super().frame_advance(time)
+        self.integrator.update(time)
+
+    def next_times(self, count: int) -> List[Time]:
+        times = [
+            Time(current=self.time.current + frame * self.frame_time, delta=self.frame_time)
+            for frame in range(1, count + 1)]
+        self.time = times[-1]
+        return times
+
+    def run_frame(self, time: Time) -> None:
+        self.frame_advance(time)
+        self.end_frame()
+
+
+class AllocationTrackerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tracker = AllocationTracker()
+        self.tracker.start()
+
+    def tearDown(self) -> None:
+        self.tracker.stop()
+
+    def test_counts_blocks_kept_by_line(self) -> None:
+        kept: List[object] = []
+        self.tracker.begin_frame()
+        kept.extend(object() for _ in range(100))
+        allocations = self.tracker.end_frame()
+
+        assert allocations is not None
+        self.assertGreaterEqual(allocations.blocks, 100)
+        self.assertTrue(any(line.filename == __file__ and line.blocks >= 100 for line in allocations.lines))
+        self.assertIn(__file__, self.tracker.report())
+
+    def test_steady_state_frame_stays_within_budget(self) -> None:
+        game = WorldGame()
+        for time in game.next_times(60):
+            game.run_frame(time)
+        frame_blocks: List[int] = []
+        # Made up front so that only the frames themselves are tracked.
+        for time in game.next_times(60):
+            self.tracker.begin_frame()
+            game.run_frame(time)
+            allocations = self.tracker.end_frame()
+            assert allocations is not None
+            frame_blocks.append(allocations.blocks)
+        self.assertLessEqual(median(frame_blocks), ALLOCATION_BUDGET, f'{frame_blocks}\n{self.tracker.report()}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from threading import Event
+from typing import List
+
+from engine.assets import AssetLoader
+from engine.utils import Rectangle
+
+
+class FakeSurface:
+    def __init__(self, path: bytes) -> None:
+        self.path = path
+        self.dimensions = 16 + 32j
+        self.destroyed = False
+
+    def destroy(self) -> None:
+        self.destroyed = True
+
+
+class FakeTexture:
+    def __init__(self, surface: FakeSurface) -> None:
+        self.surface = surface
+        self.destroyed = False
+
+    def destroy(self) -> None:
+        self.destroyed = True
+
+
+class FakeRenderer:
+    def create_texture_from_surface(self, surface: FakeSurface, region: Rectangle) -> FakeTexture:
+        return FakeTexture(surface)
+
+
+class AssetLoaderTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.decoding_allowed = Event()
+        self.decoded: List[FakeSurface] = []
+        self.loader = AssetLoader(FakeRenderer(), workers=2, decode=self.decode)  # type: ignore
+
+    def tearDown(self) -> None:
+        self.decoding_allowed.set()
+        self.loader.destroy()
+
+    def decode(self, path: bytes) -> FakeSurface:
+        self.decoding_allowed.wait()
+        if path == b'missing.png':
+            raise FileNotFoundError(path)
+        surface = FakeSurface(path)
+        self.decoded.append(surface)
+        return surface
+
+    def test_textures_are_created_in_update_once_decoded(self) -> None:
+        first = self.loader.load(b'first.png')
+        self.assertIs(self.loader.load(b'first.png'), first)
+        self.assertEqual(self.loader.update(), 0)
+        self.assertFalse(first.ready)
+        with self.assertRaises(RuntimeError):
+            first.result()
+
+        second = self.loader.load(b'second.png')
+        self.decoding_allowed.set()
+        self.loader.wait([second])
+        self.assertTrue(first.ready and second.ready)
+        self.assertEqual(first.result().surface.path, b'first.png')  # type: ignore
+        self.assertTrue(all(surface.destroyed for surface in self.decoded))
+
+    def test_errors_are_raised_from_result(self) -> None:
+        self.decoding_allowed.set()
+        missing = self.loader.load(b'missing.png')
+        self.loader.wait([missing])
+        with self.assertRaises(FileNotFoundError):
+            missing.result()
+
+    def test_unloaded_while_decoding(self) -> None:
+        handle = self.loader.load(b'first.png')
+        self.loader.unload(b'first.png')
+        self.decoding_allowed.set()
+        self.loader.wait([handle])
+        self.assertFalse(handle.ready)
+        self.assertTrue(self.decoded[0].destroyed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from typing import Sequence
+
+from engine.graphics import Camera, scale_rectangle
+from engine.sdl import RawRect, RawVertex, Flip, Color
+from engine.utils import Rectangle
+
+try:
+    from engine.batching import SpriteBatch, SpriteBatches
+except ImportError:
+    SpriteBatch = SpriteBatches = None  # type: ignore
+
+
+@unittest.skipIf(SpriteBatch is None, 'numpy is not installed')
+class SpriteBatchTests(unittest.TestCase):
+    def test_matches_scalar_transform_and_culls(self) -> None:
+        view = Rectangle(upper_left=18 - 9j, dimensions=150 + 150j)
+        camera = Camera(view, window_dimensions=50 + 50j, renderer=None)  # type: ignore
+        batch = SpriteBatch(capacity=1)
+        visible = Rectangle(upper_left=-9 + 12j, dimensions=30 + 90j)
+        batch.add(Rectangle(upper_left=500 + 500j, dimensions=16 + 16j), RawRect())
+        batch.add(visible, RawRect())
+        batch.add(Rectangle(upper_left=-100 - 100j, dimensions=16 + 16j), RawRect())
+        self.assertEqual(batch.capacity, 4)
+
+        self.assertEqual(batch.transform(camera), 1)
+        self.assertEqual(batch.visible.tolist(), [1])
+        expected = scale_rectangle(view, visible, new_dimensions=50 + 50j)
+        destination = batch.raw_destinations[0]
+        self.assertEqual((destination.x, destination.y, destination.w, destination.h), (
+            int(expected.upper_left.real), int(expected.upper_left.imag),
+            int(expected.dimensions.real), int(expected.dimensions.imag)))
+
+    def test_native_camera_offsets_by_whole_pixels(self) -> None:
+        view = Rectangle(upper_left=10.6 - 3.2j, dimensions=50 + 50j)
+        camera = Camera(view, window_dimensions=50 + 50j, renderer=None)  # type: ignore
+        batch = SpriteBatch()
+        batch.add(Rectangle(upper_left=20.5 + 7.9j, dimensions=16 + 32j), RawRect())
+        self.assertEqual(batch.transform(camera), 1)
+        self.assertEqual(batch.destinations[0].tolist(), [9, 11, 16, 32])
+
+    def test_one_geometry_call_per_texture(self) -> None:
+        calls = []
+
+        class FakeTexture:
+            dimensions = 64 + 32j
+
+        class RecordingRenderer:
+            supports_geometry = True
+
+            def draw_geometry(
+                    self, texture: object, vertices: Sequence[RawVertex], vertex_count: int,
+                    indices: Sequence[int], index_count: int) -> None:
+                calls.append((texture, list(vertices)[:vertex_count], list(indices)[:index_count]))
+
+        camera = Camera(
+            Rectangle(upper_left=0, dimensions=100 + 100j), window_dimensions=100 + 100j,
+            renderer=RecordingRenderer())  # type: ignore
+        texture = FakeTexture()
+        batches = SpriteBatches(capacity=1)
+        batches.add(texture, Rectangle(upper_left=500, dimensions=16 + 16j), RawRect(0, 0, 16, 16))  # type: ignore
+        batches.add(
+            texture, Rectangle(upper_left=10 + 20j, dimensions=16 + 32j), RawRect(16, 0, 16, 32),  # type: ignore
+            flip=Flip.HORIZONTAL, color=Color.red(a=128))
+        batches.flush(camera)
+
+        self.assertEqual(len(calls), 1)
+        drawn_texture, vertices, indices = calls[0]
+        self.assertIs(drawn_texture, texture)
+        self.assertEqual(indices, [0, 1, 2, 0, 2, 3])
+        self.assertEqual([(vertex.x, vertex.y, vertex.u, vertex.v) for vertex in vertices], [
+            (10, 20, 0.5, 0), (26, 20, 0.25, 0), (26, 52, 0.25, 1), (10, 52, 0.5, 1)])
+        self.assertEqual((vertices[0].r, vertices[0].g, vertices[0].b, vertices[0].a), (255, 0, 0, 128))
+        self.assertEqual(batches.batches[texture].count, 0)  # type: ignore
+
+    def test_falls_back_to_one_copy_per_sprite(self) -> None:
+        drawn = []
+
+        class OldRenderer:
+            supports_geometry = False
+
+            def draw_raw_texture(self, texture: object, source: RawRect, destination: RawRect, flip: Flip) -> None:
+                drawn.append((
+                    texture, (source.x, source.y, source.w, source.h),
+                    (destination.x, destination.y, destination.w, destination.h), flip))
+
+        camera = Camera(
+            Rectangle(upper_left=0, dimensions=100 + 100j), window_dimensions=100 + 100j,
+            renderer=OldRenderer())  # type: ignore
+        batches = SpriteBatches(capacity=1)
+        batches.add('mario', Rectangle(upper_left=500, dimensions=16 + 16j), RawRect(0, 0, 16, 16))  # type: ignore
+        batches.add(
+            'mario', Rectangle(upper_left=10 + 20j, dimensions=16 + 32j), RawRect(16, 0, 16, 32),  # type: ignore
+            flip=Flip.HORIZONTAL)
+        batches.add(
+            'goomba', Rectangle(upper_left=40 + 20j, dimensions=16 + 16j), RawRect(0, 0, 16, 16))  # type: ignore
+        batches.flush(camera)
+
+        self.assertEqual(drawn, [
+            ('mario', (16, 0, 16, 32), (10, 20, 16, 32), Flip.HORIZONTAL),
+            ('goomba', (0, 0, 16, 16), (40, 20, 16, 16), Flip.NONE)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from threading import Event
+from typing import List, Tuple
+
+from engine.capture import count_different_pixels, CapturePipeline, FrameWriter
+
+
+class CountingRenderer:
+    output_dimensions = 2 + 1j
+
+    def __init__(self) -> None:
+        self.frame_num = 0
+
+    def read_pixels(self, pixels: bytearray, dimensions: complex) -> None:
+        pixels[:] = bytes([self.frame_num]) * len(pixels)
+        self.frame_num += 1
+
+
+class BlockedWriter(FrameWriter):
+    def __init__(self) -> None:
+        self.unblocked = Event()
+        self.written: List[Tuple[int, bytes]] = []
+        self.closed = False
+
+    def write(self, frame_num: int, pixels: bytearray, dimensions: complex) -> None:
+        self.unblocked.wait()
+        self.written.append((frame_num, bytes(pixels[:1])))
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class CaptureTests(unittest.TestCase):
+    def test_count_different_pixels(self) -> None:
+        expected = bytes([10, 20, 30, 255] * 3)
+        pixels = bytearray(expected)
+        self.assertEqual(count_different_pixels(pixels, expected), 0)
+        pixels[1] = 22
+        pixels[8] = 0
+        self.assertEqual(count_different_pixels(pixels, expected), 2)
+        self.assertEqual(count_different_pixels(pixels, expected, tolerance=2), 1)
+        with self.assertRaises(ValueError):
+            count_different_pixels(pixels, expected[:4])
+
+    def test_count_different_pixels_in_rows(self) -> None:
+        expected = bytes(range(256)) * 9
+        pixels = bytearray(expected)
+        pixels[5] += 1
+        pixels[4 * 300 + 2] += 3
+        pixels[-1] -= 1
+        self.assertEqual(count_different_pixels(pixels, expected, width=64), 3)
+        self.assertEqual(count_different_pixels(pixels, expected, tolerance=1, width=64), 1)
+        self.assertEqual(count_different_pixels(pixels, expected, width=100), 3)
+
+    def test_pipeline_drops_frames_instead_of_waiting(self) -> None:
+        writer = BlockedWriter()
+        pipeline = CapturePipeline(CountingRenderer(), writer, buffer_count=2)  # type: ignore
+        self.assertEqual(pipeline.free_buffers.qsize(), 2)
+        captured = [pipeline.capture() for _ in range(4)]
+        self.assertEqual(captured, [True, True, False, False])
+        self.assertEqual(pipeline.dropped, 2)
+
+        writer.unblocked.set()
+        pipeline.destroy()
+        self.assertEqual(writer.written, [(0, b'\x00'), (1, b'\x01')])
+        self.assertTrue(writer.closed)
+        self.assertEqual(pipeline.free_buffers.qsize(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from typing import List, Tuple, Any
+
+from engine.debug_draw import DebugDraw
+from engine.graphics import Camera
+from engine.sdl import Color
+from engine.utils import Rectangle, Line
+
+
+class RecordingRenderer:
+    def __init__(self) -> None:
+        self.calls: List[Tuple[Any, ...]] = []
+
+    def set_draw_color(self, color: Color) -> None:
+        self.calls.append(('color', color))
+
+    def fill_raw_rectangles(self, rectangles: Any, count: int) -> None:
+        self.calls.append(('fill', [(r.x, r.y, r.w, r.h) for r in rectangles[:count]]))
+
+    def draw_raw_rectangles(self, rectangles: Any, count: int) -> None:
+        self.calls.append(('outline', [(r.x, r.y, r.w, r.h) for r in rectangles[:count]]))
+
+    def draw_raw_lines(self, first_point: Any, count: int) -> None:
+        self.calls.append(('lines', count))
+
+
+class DebugDrawTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.renderer = RecordingRenderer()
+        self.debug_draw = DebugDraw(self.renderer, capacity=1)  # type: ignore
+        self.debug_draw.begin(Camera(
+            Rectangle(upper_left=10 + 10j, dimensions=100 + 100j), window_dimensions=200 + 200j,
+            renderer=self.renderer))  # type: ignore
+
+    def test_shapes_are_batched_per_colour(self) -> None:
+        for upper_left in (10 + 10j, 20 + 10j, 30 + 10j):
+            self.debug_draw.rectangle(Color.blue(), Rectangle(upper_left, 5 + 5j), fill=True)
+        self.debug_draw.rectangle(Color.blue(), Rectangle(10 + 10j, 1 + 1j), fill=False)
+        self.debug_draw.rectangle(Color.red(), Rectangle(10 + 10j, 1 + 1j), fill=True)
+        self.debug_draw.flush()
+        self.assertEqual(self.renderer.calls, [
+            ('color', Color.blue()),
+            ('fill', [(0, 0, 10, 10), (20, 0, 10, 10), (40, 0, 10, 10)]),
+            ('outline', [(0, 0, 2, 2)]),
+            ('color', Color.red()),
+            ('fill', [(0, 0, 2, 2)]),
+        ])
+
+    def test_native_camera_rounds_like_sprites(self) -> None:
+        camera = Camera(
+            Rectangle(upper_left=10.6 + 10.4j, dimensions=100 + 100j), window_dimensions=100 + 100j,
+            renderer=self.renderer)  # type: ignore
+        self.debug_draw.begin(camera)
+        checkbox = Rectangle(upper_left=20.7 + 30.5j, dimensions=15.6 + 31.6j)
+        self.debug_draw.rectangle(Color.blue(), checkbox, fill=False)
+        self.debug_draw.flush()
+        native = camera.to_native(checkbox)
+        self.assertEqual(self.renderer.calls[1], ('outline', [(
+            native.upper_left.real, native.upper_left.imag, native.dimensions.real, native.dimensions.imag)]))
+
+    def test_connected_lines_share_a_strip(self) -> None:
+        self.debug_draw.line(Color.red(), Line.from_to(origin=10 + 10j, end=20 + 10j))
+        self.debug_draw.line(Color.red(), Line.from_to(origin=20 + 10j, end=20 + 20j))
+        self.debug_draw.line(Color.red(), Line.from_to(origin=50 + 50j, end=60 + 60j))
+        self.debug_draw.flush()
+        self.assertEqual(self.renderer.calls, [('color', Color.red()), ('lines', 3), ('lines', 2)])
+
+    def test_flush_clears_batches(self) -> None:
+        self.debug_draw.polyline(Color.red(), (10 + 10j, 20 + 20j))
+        self.debug_draw.flush()
+        self.renderer.calls.clear()
+        self.debug_draw.flush()
+        self.assertEqual(self.renderer.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from typing import List
+
+from engine.entities import ObjectPool, EntityManager
+
+
+class Particle:
+    def __init__(self) -> None:
+        self.age = 0
+
+
+def reset_particle(particle: Particle) -> None:
+    particle.age = 0
+
+
+class ObjectPoolTests(unittest.TestCase):
+    def test_released_items_are_reset_and_reused(self) -> None:
+        created: List[Particle] = []
+
+        def create() -> Particle:
+            created.append(Particle())
+            return created[-1]
+
+        pool = ObjectPool(create, reset=reset_particle, capacity=2)
+        self.assertEqual(len(created), 2)
+        first = pool.acquire()
+        pool.acquire()
+        third = pool.acquire()
+        self.assertEqual(len(created), 3)
+        first.age = 10
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(first.age, 0)
+        self.assertIsNot(first, third)
+
+
+class EntityManagerTests(unittest.TestCase):
+    def test_changes_are_deferred(self) -> None:
+        a, b, c, d = Particle(), Particle(), Particle(), Particle()
+        manager = EntityManager([a, b, c])
+        for entity in manager:
+            if entity is a:
+                manager.spawn(d)
+                manager.despawn(b)
+        self.assertEqual(list(manager), [a, b, c])
+        manager.apply_pending()
+        self.assertEqual(list(manager), [a, c, d])
+
+    def test_despawned_pooled_entities_return_to_their_pool(self) -> None:
+        manager: EntityManager[Particle] = EntityManager()
+        manager.register_pool(Particle, ObjectPool(Particle, reset=reset_particle))
+        particle = manager.spawn_pooled(Particle)
+        manager.apply_pending()
+        self.assertEqual(list(manager), [particle])
+        particle.age = 3
+        manager.despawn(particle)
+        manager.apply_pending()
+        self.assertEqual(len(manager), 0)
+        self.assertIs(manager.spawn_pooled(Particle), particle)
+        self.assertEqual(particle.age, 0)
+
+    def test_pools_get_entities_back_in_despawn_order(self) -> None:
+        manager: EntityManager[Particle] = EntityManager()
+        pool = ObjectPool(Particle)
+        manager.register_pool(Particle, pool)
+        particles = [manager.spawn_pooled(Particle) for _ in range(20)]
+        manager.apply_pending()
+        despawned = particles[7::3] + particles[:5]
+        for particle in despawned:
+            manager.despawn(particle)
+        manager.despawn(despawned[0])
+        manager.apply_pending()
+        self.assertEqual(pool.free, despawned)
+
+    def test_despawn_before_spawn_is_applied(self) -> None:
+        particle = Particle()
+        manager = EntityManager([Particle()])
+        manager.spawn(particle)
+        manager.despawn(particle)
+        manager.apply_pending()
+        self.assertNotIn(particle, list(manager))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import io
+import unittest
+from collections import OrderedDict
+from typing import List
+
+from engine.entities import ObjectPool, EntityManager
+from engine.game import State, StateGraph, GenericStateMachine, Game, Actor
+from engine.graphics import Sprite, Animation, AnimationSystem
+from engine.physics import Integrator, PhysicalEntity
+from engine.replay import InputRecorder, InputLog
+from engine.sdl import Scancode, KeyState
+from engine.timer import Time
+from engine.utils import Rectangle
+
+
+class RecordingState(State[List[str]]):
+    def __init__(self, name: str) -> None:
+        super().__init__()
+        self.name = name
+
+    def enter(self, parent: List[str]) -> None:
+        parent.append(self.name)
+
+
+class StateMachineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.idle = RecordingState('idle')
+        self.walk = RecordingState('walk')
+        self.jump = RecordingState('jump')
+        self.fall = RecordingState('fall')
+        self.entered: List[str] = []
+        self.state_machine = GenericStateMachine(self.entered, default_state=self.idle, state_graph=StateGraph(
+            connections=OrderedDict([
+                (self.jump, (self.fall,)),
+                (self.walk, (self.jump,)),
+                (self.idle, (self.walk, self.jump)),
+            ]),
+            any_state_connections=(self.idle, self.fall)))
+
+    def test_only_reachable_states_are_entered(self) -> None:
+        self.walk.trigger = True
+        self.state_machine.execute_triggers()
+        self.assertIs(self.state_machine.current_state, self.walk)
+        self.assertEqual(tuple(self.state_machine.reachable_states), (self.jump, self.idle, self.fall))
+        self.assertTrue(self.state_machine.switch_state(self.fall))
+        self.assertFalse(self.state_machine.switch_state(self.walk))
+        self.assertIs(self.state_machine.current_state, self.fall)
+
+    def test_triggers_follow_connection_order(self) -> None:
+        self.walk.trigger = True
+        self.jump.trigger = True
+        self.state_machine.execute_triggers()
+        self.assertIs(self.state_machine.current_state, self.jump)
+        self.assertEqual(self.entered, ['idle', 'jump'])
+
+    def test_falls_back_to_default_state(self) -> None:
+        self.walk.trigger = True
+        self.state_machine.update(time=None)  # type: ignore
+        self.walk.trigger = False
+        self.state_machine.update(time=None)  # type: ignore
+        self.assertEqual(self.entered, ['idle', 'walk', 'idle'])
+
+    def test_unreachable_trigger_is_ignored(self) -> None:
+        self.jump.trigger = True
+        self.state_machine.execute_triggers()
+        self.jump.trigger = False
+        self.walk.trigger = True
+        self.assertFalse(self.state_machine.execute_triggers())
+        self.assertIs(self.state_machine.current_state, self.jump)
+
+    def test_trigger_set_before_compilation_is_kept(self) -> None:
+        state = RecordingState('state')
+        state.trigger = True
+        StateGraph(connections=OrderedDict([(state, ())]), any_state_connections=())
+        self.assertTrue(state.trigger)
+        state.trigger = False
+        self.assertFalse(state.trigger)
+
+
+class ActorTests(unittest.TestCase):
+    def test_pooled_actors_only_hold_animation_slots_while_spawned(self) -> None:
+        animation_system = AnimationSystem(capacity=2)
+        sprite = Sprite(texture=None, animation=Animation(  # type: ignore
+            starting_frame=Rectangle(upper_left=0, dimensions=10 + 10j), frame_count=4, frame_delay=100, loop=True))
+        pool = ObjectPool(lambda: Actor(
+            sprite, Rectangle(upper_left=0, dimensions=10 + 10j), animation_system=animation_system))
+        integrator = Integrator(timestep=10, gravity=0, horizontal_drag=0, entities=[], terrain=[])
+        integrator.entities.register_pool(Actor, pool)
+
+        for _ in range(10):
+            actors = [integrator.entities.spawn_pooled(Actor) for _ in range(2)]
+            integrator.update(Time(current=0, delta=0))
+            self.assertEqual(sorted(actor.sprite_player.slot for actor in actors), [0, 1])
+            for actor in actors:
+                integrator.entities.despawn(actor)
+            integrator.update(Time(current=0, delta=0))
+            self.assertEqual(len(animation_system.free_slots), 2)
+        self.assertEqual(animation_system.capacity, 2)
+
+    def test_entity_manager_keeps_its_own_hooks(self) -> None:
+        animation_system = AnimationSystem(capacity=1)
+        sprite = Sprite(texture=None, animation=Animation(  # type: ignore
+            starting_frame=Rectangle(upper_left=0, dimensions=10 + 10j), frame_count=4, frame_delay=100, loop=True))
+        actor = Actor(sprite, Rectangle(upper_left=0, dimensions=10 + 10j), animation_system=animation_system)
+        actor.sprite_player.release()
+        spawned: List[PhysicalEntity] = []
+        despawned: List[PhysicalEntity] = []
+        entities = EntityManager[PhysicalEntity](on_spawned=spawned.append, on_despawned=despawned.append)
+        integrator = Integrator(timestep=10, gravity=0, horizontal_drag=0, entities=entities, terrain=[])
+
+        integrator.entities.spawn(actor)
+        self.assertEqual(spawned, [actor])
+        self.assertEqual(actor.sprite_player.slot, 0)
+        integrator.entities.despawn(actor)
+        integrator.update(Time(current=0, delta=0))
+        self.assertEqual(despawned, [actor])
+        self.assertEqual(actor.sprite_player.slot, -1)
+
+    def test_released_player_is_paused_once_acquired(self) -> None:
+        animation_system = AnimationSystem(capacity=1)
+        sprite = Sprite(texture=None, animation=Animation(  # type: ignore
+            starting_frame=Rectangle(upper_left=0, dimensions=10 + 10j), frame_count=4, frame_delay=100, loop=True))
+        actor = Actor(sprite, Rectangle(upper_left=0, dimensions=10 + 10j), animation_system=animation_system)
+        actor.sprite_player.release()
+        actor.sprite_player.pause()
+        actor.sprite_player.acquire()
+        self.assertTrue(animation_system.paused[actor.sprite_player.slot])
+
+    def test_game_has_its_own_animation_system(self) -> None:
+        self.assertIsNot(Game(fps=60).animation_system, Game(fps=60).animation_system)
+
+
+class ReplayTests(unittest.TestCase):
+    def test_frames_are_advanced_by_the_hook(self) -> None:
+        stream = io.BytesIO()
+        recorder = InputRecorder(stream, start_time=100)
+        for delta in (16, 17, 16):
+            recorder.record_frame(delta)
+        recorder.flush()
+        game = Game(fps=60)
+        event_handler = game.event_handler
+        game.keyboard.keys[Scancode.RIGHT] = KeyState.DOWN
+        advanced: List[Time] = []
+
+        def advance(time: Time) -> None:
+            self.assertIsNot(game.event_handler, event_handler)
+            advanced.append(time)
+
+        game.replay(InputLog(stream.getvalue()), advance)
+        self.assertEqual(advanced, [
+            Time(current=116, delta=16), Time(current=133, delta=17), Time(current=149, delta=16)])
+        self.assertIs(game.event_handler, event_handler)
+        self.assertIs(game.keyboard.key_state(Scancode.RIGHT), KeyState.UP)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 import unittest
 
-from engine.graphics import scale_rectangle, scale_line
+from engine.graphics import (
+    scale_rectangle, scale_line, AnimationSystem, Animation, Sprite, SpritePlayer, Camera, TiledBackground)
+from engine.sdl import RawRect, Flip
+from engine.timer import Time
 from engine.utils import Rectangle, Line
 
 
@@ -63,6 +66,120 @@ class GraphicsTests(unittest.TestCase):
         self.assertAlmostEqual(result.end.real, 4)
         self.assertAlmostEqual(result.end.imag, 33)
 
+    def test_texture_frame_scaling_matches_rectangle_scaling(self) -> None:
+        drawn = []
+
+        class RecordingRenderer:
+            def draw_raw_texture(self, texture: object, source: RawRect, destination: RawRect, flip: Flip) -> None:
+                drawn.append((destination.x, destination.y, destination.w, destination.h))
+
+        view = Rectangle(upper_left=18 - 9j, dimensions=150 + 150j)
+        camera = Camera(view, window_dimensions=50 + 50j, renderer=RecordingRenderer())  # type: ignore
+        destination = Rectangle(upper_left=-9 + 12j, dimensions=30 + 90j)
+        camera.draw_texture_frame(None, RawRect(), destination)  # type: ignore
+        expected = scale_rectangle(view, destination, new_dimensions=50 + 50j)
+        self.assertEqual(drawn, [(
+            int(expected.upper_left.real), int(expected.upper_left.imag),
+            int(expected.dimensions.real), int(expected.dimensions.imag))])
+
+    def test_native_camera_only_offsets_by_whole_pixels(self) -> None:
+        drawn = []
+
+        class RecordingRenderer:
+            def draw_raw_texture(self, texture: object, source: RawRect, destination: RawRect, flip: Flip) -> None:
+                drawn.append((destination.x, destination.y, destination.w, destination.h))
+
+        view = Rectangle(upper_left=10.6 - 3.2j, dimensions=50 + 50j)
+        camera = Camera(view, window_dimensions=50 + 50j, renderer=RecordingRenderer())  # type: ignore
+        self.assertTrue(camera.native)
+        self.assertEqual(camera.offset, 11 - 3j)
+        destination = Rectangle(upper_left=20.5 + 7.9j, dimensions=16 + 32j)
+        camera.draw_texture_frame(None, RawRect(), destination)  # type: ignore
+        self.assertEqual(drawn, [(9, 11, 16, 32)])
+
+    def test_native_camera_does_not_jitter(self) -> None:
+        drawn = []
+
+        class RecordingRenderer:
+            def draw_raw_texture(self, texture: object, source: RawRect, destination: RawRect, flip: Flip) -> None:
+                drawn.append(destination.x)
+
+        # A sprite moving along with the view stays at the same pixel on screen.
+        view = Rectangle(upper_left=0, dimensions=50 + 50j)
+        camera = Camera(view, window_dimensions=50 + 50j, renderer=RecordingRenderer())  # type: ignore
+        for step in range(20):
+            camera.center_on(25 + 25j + step * 0.3)
+            camera.draw_texture_frame(
+                None, RawRect(), Rectangle(upper_left=20 + step * 0.3, dimensions=16 + 32j))  # type: ignore
+        self.assertEqual(set(drawn), {20})
+
+
+class TiledBackgroundTests(unittest.TestCase):
+    def test_draws_only_visible_tiles(self) -> None:
+        drawn = []
+
+        class RecordingRenderer:
+            def draw_raw_texture(self, texture: object, source: RawRect, destination: RawRect, flip: Flip) -> None:
+                drawn.append((texture, destination.x, destination.y, destination.w, destination.h))
+
+        background = TiledBackground(list(range(6)), dimensions=250 + 150j, tile_size=100)  # type: ignore
+        camera = Camera(
+            Rectangle(upper_left=150 + 50j, dimensions=100 + 100j), window_dimensions=100 + 100j,
+            renderer=RecordingRenderer())  # type: ignore
+        background.render(camera)
+        self.assertEqual(drawn, [
+            (1, -50, -50, 100, 100), (2, 50, -50, 50, 100),
+            (4, -50, 50, 100, 50), (5, 50, 50, 50, 50)])
+
+    def test_parallax_layers_are_culled_on_their_own(self) -> None:
+        view = Rectangle(upper_left=400 + 0j, dimensions=100 + 100j)
+        near = TiledBackground(list(range(10)), dimensions=1000 + 100j, tile_size=100)  # type: ignore
+        far = TiledBackground(list(range(10)), dimensions=1000 + 100j, tile_size=100, parallax=0.5 + 1j)  # type: ignore
+        fixed = TiledBackground(list(range(10)), dimensions=1000 + 100j, tile_size=100, parallax=0)  # type: ignore
+        self.assertEqual(near.visible_tiles(view), (range(0, 1), range(4, 5)))
+        self.assertEqual(far.visible_tiles(view), (range(0, 1), range(2, 3)))
+        self.assertEqual(fixed.visible_tiles(view), (range(0, 1), range(0, 1)))
+
+
+class AnimationSystemTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.animation_system = AnimationSystem(capacity=1)
+        self.looping = Sprite(texture=None, animation=Animation(  # type: ignore
+            starting_frame=Rectangle(upper_left=0, dimensions=16 + 32j), frame_count=3, frame_delay=100, loop=True))
+        self.once = Sprite(texture=None, animation=Animation(  # type: ignore
+            starting_frame=Rectangle(upper_left=0, dimensions=16 + 32j), frame_count=2, frame_delay=100))
+
+    def test_catches_up_on_missed_frames(self) -> None:
+        player = SpritePlayer(self.looping, self.animation_system)
+        self.animation_system.update(Time(current=99, delta=99))
+        self.assertEqual(player.frame_num, 0)
+        self.animation_system.update(Time(current=100, delta=1))
+        self.assertEqual(player.frame_num, 1)
+        self.animation_system.update(Time(current=420, delta=320))
+        self.assertEqual(player.frame_num, 1)
+        self.animation_system.update(Time(current=500, delta=80))
+        self.assertEqual(player.frame_num, 2)
+
+    def test_finishes_without_looping(self) -> None:
+        player = SpritePlayer(self.once, self.animation_system)
+        self.animation_system.update(Time(current=1000, delta=1000))
+        self.assertTrue(player.is_done)
+        self.assertEqual(player.frame_num, 1)
+
+    def test_switch_restarts_in_place(self) -> None:
+        player = SpritePlayer(self.looping, self.animation_system)
+        other = SpritePlayer(self.once, self.animation_system)
+        self.assertEqual(self.animation_system.capacity, 2)
+        self.animation_system.update(Time(current=150, delta=150))
+        player.switch(self.once)
+        self.assertEqual(player.frame_num, 0)
+        self.animation_system.update(Time(current=249, delta=99))
+        self.assertEqual(player.frame_num, 0)
+        self.animation_system.update(Time(current=250, delta=1))
+        self.assertEqual(player.frame_num, 1)
+        self.assertEqual(other.frame_num, 1)
+        self.assertEqual(self.animation_system.capacity, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
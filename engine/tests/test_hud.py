@@ -0,0 +1,78 @@
+import unittest
+from typing import Any
+
+from engine.hud import (
+    GLYPHS, GLYPH_WIDTH, GLYPH_HEIGHT, BitmapFont, TextLabel, PerformanceHud, glyph_atlas_pixels)
+from engine.sdl import Color, RawRect, RenderCall, RenderStats
+from engine.timer import Time
+
+
+class FakeRenderer:
+    def __init__(self) -> None:
+        self.stats = RenderStats()
+
+    @property
+    def draw_calls(self) -> int:
+        return self.stats.draw_calls
+
+    def create_texture(self, pixels: bytes, dimensions: complex) -> None:
+        assert len(pixels) == 4 * int(dimensions.real) * int(dimensions.imag)
+
+    def set_draw_color(self, color: Color) -> None:
+        pass
+
+    def fill_raw_rectangles(self, rectangles: Any, count: int) -> None:
+        self.stats.issued[RenderCall.FILL_RECTANGLES] += 1
+
+    def draw_raw_texture(self, texture: Any, source: RawRect, destination: RawRect) -> None:
+        self.stats.issued[RenderCall.DRAW_TEXTURE] += 1
+
+
+class BitmapFontTests(unittest.TestCase):
+    def test_glyph_shapes(self) -> None:
+        for glyph in GLYPHS.values():
+            rows = glyph.split()
+            self.assertEqual(len(rows), GLYPH_HEIGHT)
+            self.assertTrue(all(len(row) == GLYPH_WIDTH for row in rows))
+        self.assertEqual(len(glyph_atlas_pixels()), 4 * GLYPH_WIDTH * GLYPH_HEIGHT * len(GLYPHS))
+
+    def test_layout(self) -> None:
+        font = BitmapFont(FakeRenderer())  # type: ignore
+        quads = font.layout('fps 60', position=10 + 20j, scale=2)
+        self.assertEqual(len(quads), 5)
+        self.assertEqual([destination.x for _, destination in quads], [10, 18, 26, 42, 50])
+        self.assertTrue(all(destination.y == 20 and destination.h == 10 for _, destination in quads))
+        self.assertIs(quads[0][0], font.glyph_sources['F'])
+
+    def test_label_keeps_quads_of_unchanged_text(self) -> None:
+        label = TextLabel(BitmapFont(FakeRenderer()), position=0)  # type: ignore
+        label.set_text('FPS 60')
+        quads = label.quads
+        label.set_text('FPS 60')
+        self.assertIs(label.quads, quads)
+        label.set_text('FPS 59')
+        self.assertIsNot(label.quads, quads)
+
+
+class PerformanceHudTests(unittest.TestCase):
+    def test_budget_line_tops_a_frame_of_the_budget(self) -> None:
+        hud = PerformanceHud(FakeRenderer(), frame_budget=20)  # type: ignore
+        hud.update(Time(current=0, delta=20), physics_steps=0, draw_calls=0, entity_count=0)
+        hud.render()
+        self.assertEqual(hud.budget_line.y, hud.graph_rectangles[-1].y)
+
+    def test_leaves_out_its_own_draw_calls(self) -> None:
+        renderer = FakeRenderer()
+        hud = PerformanceHud(renderer, frame_budget=17)  # type: ignore
+        hud.update(Time(current=0, delta=17), physics_steps=0, draw_calls=0, entity_count=0)
+        renderer.stats.issued[RenderCall.DRAW_TEXTURE] += 7
+        hud.render()
+        renderer.stats.end_frame()
+        hud.update(
+            Time(current=1000, delta=17), physics_steps=0, draw_calls=renderer.stats.presented_draw_calls,
+            entity_count=0)
+        self.assertEqual(hud.labels[3].text, 'DRAWS 7')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import random
+import unittest
+from typing import List, Optional
+
+from engine.game import Actor
+from engine.graphics import Sprite, Animation, AnimationSystem
+from engine.physics import (
+    PhysicalEntity, Integrator, UpdateLod, UpdateLevel, TerrainIndex, TerrainElement, Block, Platform, Wall, Roof)
+from engine.timer import Time
+from engine.utils import Rectangle, Line
+
+
+class UpdatedEntity(PhysicalEntity):
+    def __init__(self, upper_left: complex) -> None:
+        super().__init__(Rectangle(upper_left, dimensions=10 + 10j))
+        self.deltas: List[int] = []
+
+    def update(self, time: Time) -> None:
+        self.deltas.append(time.delta)
+
+
+class UpdateLodTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.view = Rectangle(upper_left=0, dimensions=100 + 100j)
+        self.lod = UpdateLod(self.view, full_distance=50, suspend_distance=200, reduced_interval=4)
+        self.time = Time(current=0, delta=0)
+
+    def run_frames(self, integrator: Integrator, count: int) -> None:
+        for _ in range(count):
+            self.time = Time(current=self.time.current + 10, delta=10)
+            integrator.update(self.time)
+
+    def test_update_rate_depends_on_distance(self) -> None:
+        near = UpdatedEntity(upper_left=120 + 50j)
+        reduced = UpdatedEntity(upper_left=200 + 50j)
+        suspended = UpdatedEntity(upper_left=400 + 50j)
+        suspended.velocity = 100
+        integrator = Integrator(
+            timestep=2, gravity=0, horizontal_drag=0, entities=[near, reduced, suspended], terrain=[], lod=self.lod)
+
+        self.run_frames(integrator, 8)
+        self.assertEqual(near.deltas, [10] * 8)
+        self.assertEqual(reduced.update_level, UpdateLevel.REDUCED)
+        self.assertEqual(reduced.deltas[1:], [40])
+        self.assertEqual(suspended.update_level, UpdateLevel.SUSPENDED)
+        self.assertEqual(suspended.deltas, [])
+        self.assertEqual(suspended.checkbox.upper_left, 400 + 50j)
+
+        # Waking up does not catch up on the time spent suspended.
+        self.view.upper_left = 300
+        self.run_frames(integrator, 1)
+        self.assertEqual(suspended.update_level, UpdateLevel.FULL)
+        self.assertEqual(suspended.deltas, [10])
+        self.assertAlmostEqual(suspended.checkbox.upper_left.real, 401)
+
+    def test_animations_only_run_on_screen(self) -> None:
+        animation_system = AnimationSystem(capacity=1)
+        sprite = Sprite(texture=None, animation=Animation(  # type: ignore
+            starting_frame=Rectangle(upper_left=0, dimensions=10 + 10j), frame_count=4, frame_delay=100, loop=True))
+        actor = Actor(sprite, Rectangle(upper_left=50 + 50j, dimensions=10 + 10j), animation_system=animation_system)
+        integrator = Integrator(timestep=10, gravity=0, horizontal_drag=0, entities=[actor], terrain=[], lod=self.lod)
+
+        def advance(frames: int) -> None:
+            for _ in range(frames):
+                self.time = Time(current=self.time.current + 10, delta=10)
+                animation_system.update(self.time)
+                integrator.update(self.time)
+
+        advance(15)
+        self.assertEqual(actor.sprite_player.frame_num, 1)
+        self.view.upper_left = 1000
+        advance(100)
+        self.assertFalse(actor.on_screen)
+        self.assertEqual(actor.sprite_player.frame_num, 1)
+        self.view.upper_left = 0
+        # Picks up where it stopped, 50 ms before its next frame.
+        advance(4)
+        self.assertEqual(actor.sprite_player.frame_num, 1)
+        advance(2)
+        self.assertEqual(actor.sprite_player.frame_num, 2)
+
+
+class TerrainIndexTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.block = Block(upper_left=200j, dimensions=256 + 24j)
+        self.platform = Platform(origin=288 + 184j, width=64)
+        self.wall = Wall(origin=600 + 0j, height=200)
+        self.roof = Roof(origin=100 + 50j, width=100)
+        self.index = TerrainIndex([self.block, self.platform, self.wall, self.roof], cell_size=32)
+
+    def test_query_region(self) -> None:
+        self.assertEqual(self.index.query_region(Rectangle(upper_left=250 + 150j, dimensions=50 + 60j)), [
+            self.block, self.platform])
+        self.assertEqual(self.index.query_region(Rectangle(upper_left=400 + 300j, dimensions=100 + 100j)), [])
+
+    def test_raycast_returns_the_first_hit(self) -> None:
+        hit = self.index.raycast(Line(origin=320 + 100j, offset=200j))
+        self.assertIsNotNone(hit)
+        self.assertIs(hit.element, self.platform)  # type: ignore
+        self.assertEqual(hit.point, 320 + 184j)  # type: ignore
+        self.assertEqual(hit.distance, 84)  # type: ignore
+
+        self.assertIsNone(self.index.raycast(
+            Line(origin=320 + 100j, offset=200j), predicate=lambda element: element is not self.platform))
+        self.assertIs(self.index.raycast(Line(origin=700 + 100j, offset=-300)).element, self.wall)  # type: ignore
+        self.assertIsNone(self.index.raycast(Line(origin=10 + 10j, offset=0)))
+
+    def test_point_in_solid(self) -> None:
+        self.assertTrue(self.index.point_in_solid(100 + 210j))
+        self.assertFalse(self.index.point_in_solid(100 + 190j))
+        # Lines have no inside.
+        self.assertFalse(self.index.point_in_solid(320 + 184j))
+
+    def test_matches_testing_every_element(self) -> None:
+        generator = random.Random(4)
+        terrain: List[TerrainElement] = []
+        for _ in range(40):
+            origin = complex(generator.uniform(-500, 500), generator.uniform(-500, 500))
+            terrain.append(generator.choice([
+                Block(origin, complex(generator.uniform(1, 100), generator.uniform(1, 100))),
+                Platform(origin, generator.uniform(1, 200)), Wall(origin, generator.uniform(1, 200))]))
+        index = TerrainIndex(terrain, cell_size=50)
+
+        for _ in range(300):
+            ray = Line(
+                complex(generator.uniform(-600, 600), generator.uniform(-600, 600)),
+                complex(generator.uniform(-800, 800), generator.uniform(-800, 800)))
+            fractions = [element.raycast(ray) for element in terrain]
+            expected: Optional[float] = min((fraction for fraction in fractions if fraction is not None), default=None)
+            hit = index.raycast(ray)
+            if expected is None:
+                self.assertIsNone(hit)
+            else:
+                self.assertIsNotNone(hit)
+                self.assertAlmostEqual(hit.distance, expected * abs(ray.offset))  # type: ignore
+
+            region = Rectangle(ray.origin, complex(generator.uniform(0, 300), generator.uniform(0, 300)))
+            self.assertEqual(
+                index.query_region(region), [element for element in terrain if element.bounds.overlaps(region)])
+            self.assertEqual(
+                index.point_in_solid(ray.origin), any(element.contains_point(ray.origin) for element in terrain))
+
+
+if __name__ == '__main__':
+    unittest.main()
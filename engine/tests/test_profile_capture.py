@@ -0,0 +1,45 @@
+import os
+import pstats
+import tempfile
+import unittest
+from typing import List
+
+from engine.game import Game
+from engine.profile_capture import ProfileCapture, frame_boundary
+from engine.replay import ReplayEventHandler
+from engine.timer import Time
+
+
+class ProfileCaptureTests(unittest.TestCase):
+    def test_captures_the_next_frames(self) -> None:
+        saved: List[str] = []
+        game = Game(fps=60, event_handler=ReplayEventHandler())
+        with tempfile.TemporaryDirectory() as directory:
+            game.profile_capture = ProfileCapture(frame_count=5, directory=directory, on_saved=saved.append)
+            game.profile_capture.toggle()
+            for frame_num in range(1, 9):
+                game.frame_advance(Time(current=frame_num * 17, delta=17))
+                game.end_frame()
+
+            self.assertFalse(game.profile_capture.active)
+            self.assertEqual(len(saved), 1)
+            self.assertEqual(os.path.dirname(saved[0]), directory)
+            stats = pstats.Stats(saved[0])
+            boundaries = [
+                calls for (filename, _, name), (_, calls, _, _, _) in stats.stats.items()  # type: ignore
+                if name == frame_boundary.__name__ and filename == frame_boundary.__code__.co_filename]
+            self.assertEqual(boundaries, [5])
+
+    def test_stopping_early_saves_what_was_captured(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            capture = ProfileCapture(frame_count=100, directory=directory)
+            capture.start()
+            capture.end_frame()
+            path = capture.stop()
+            self.assertIsNotNone(path)
+            self.assertEqual(capture.saved_paths, [path])
+            self.assertIsNone(capture.stop())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from engine.profiler import FrameProfiler, Percentiles, Phase
+
+
+class PercentilesTests(unittest.TestCase):
+    def test_nearest_rank(self) -> None:
+        self.assertEqual(Percentiles.of(range(1, 101)), Percentiles(50, 95, 99))
+        self.assertEqual(Percentiles.of([3, 1, 2]), Percentiles(2, 3, 3))
+        self.assertEqual(Percentiles.of([]), Percentiles(0, 0, 0))
+
+
+class FrameProfilerTests(unittest.TestCase):
+    def test_disabled_profiler_records_nothing(self) -> None:
+        profiler = FrameProfiler(capacity=4)
+        profiler.begin_frame()
+        profiler.end_phase(Phase.EVENTS)
+        profiler.end_frame()
+        self.assertEqual(profiler.count, 0)
+
+    def test_ring_buffer_keeps_newest_frames(self) -> None:
+        profiler = FrameProfiler(capacity=4, enabled=True)
+        for steps in range(10):
+            profiler.begin_frame()
+            profiler.record_physics_steps(steps)
+            profiler.end_phase(Phase.PHYSICS)
+            profiler.end_frame()
+        self.assertEqual(profiler.count, 4)
+        self.assertEqual(profiler.physics_steps_percentiles(), Percentiles(7, 9, 9))
+        self.assertGreaterEqual(profiler.frame_percentiles().p50, profiler.phase_percentiles(Phase.PHYSICS).p50)
+        self.assertIn('physics steps', profiler.report())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import io
+import unittest
+from typing import List, Dict
+from unittest import mock
+
+from engine.replay import (
+    InputRecorder, InputLog, InputFrame, KeyChange, ReplayEventHandler, write_varint, read_varint)
+from engine.sdl import EventHandler, EventType, RawEvent, Scancode, KeyState
+
+
+class VarintTests(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        for value in (0, 1, 127, 128, 300, 16383, 16384, 2 ** 32 - 1):
+            buffer = bytearray()
+            write_varint(buffer, value)
+            self.assertEqual(read_varint(bytes(buffer), 0), (value, len(buffer)))
+
+
+class InputLogTests(unittest.TestCase):
+    def test_recorded_frames_are_replayed(self) -> None:
+        stream = io.BytesIO()
+        recorder = InputRecorder(stream, start_time=1234, flush_interval=20)
+        recorder.record_frame(16)
+        recorder.record_key(Scancode.SPACE, pressed=True)
+        recorder.record_key(Scancode.RIGHT, pressed=True)
+        recorder.record_frame(17)
+        recorder.record_key(Scancode.SPACE, pressed=False)
+        recorder.record_frame(300)
+        recorder.flush()
+
+        log = InputLog(stream.getvalue())
+        self.assertEqual(log.start_time, 1234)
+        frames = list(log)
+        self.assertEqual([frame.delta for frame in frames], [16, 17, 300])
+        self.assertEqual(frames[0].key_changes, ())
+        self.assertEqual(frames[1].key_changes, (KeyChange(Scancode.SPACE, True), KeyChange(Scancode.RIGHT, True)))
+        self.assertEqual(frames[2].key_changes, (KeyChange(Scancode.SPACE, False),))
+
+    def test_idle_frames_take_one_byte(self) -> None:
+        stream = io.BytesIO()
+        recorder = InputRecorder(stream, start_time=0)
+        header_size = len(recorder.buffer)
+        for _ in range(1000):
+            recorder.record_frame(17)
+        recorder.flush()
+        self.assertEqual(len(stream.getvalue()) - header_size, 1000)
+
+    def test_flushes_after_every_interval_of_frames(self) -> None:
+        stream = io.BytesIO()
+        recorder = InputRecorder(stream, start_time=0, flush_interval=50)
+        recorder.record_frame(17)
+        recorder.record_frame(17)
+        self.assertEqual(stream.getvalue(), b'')
+        recorder.record_frame(17)
+        self.assertEqual(len(list(InputLog(stream.getvalue()))), 3)
+        recorder.record_frame(17)
+        self.assertEqual(len(list(InputLog(stream.getvalue()))), 3)
+
+    def test_truncated_log_ends_with_last_complete_frame(self) -> None:
+        stream = io.BytesIO()
+        recorder = InputRecorder(stream, start_time=0)
+        recorder.record_frame(16)
+        recorder.record_key(Scancode.SPACE, pressed=True)
+        recorder.record_key(Scancode.RIGHT, pressed=True)
+        recorder.record_frame(300)
+        recorder.flush()
+
+        with self.assertWarns(UserWarning):
+            frames = list(InputLog(stream.getvalue()[:-1]))
+        self.assertEqual(frames, [InputFrame(delta=16, key_changes=())])
+
+    def test_skips_keys_without_scancode(self) -> None:
+        stream = io.BytesIO()
+        recorder = InputRecorder(stream, start_time=0)
+        recorder.record_key(4, pressed=True)
+        recorder.record_key(Scancode.SPACE, pressed=True)
+        recorder.record_frame(16)
+        recorder.flush()
+
+        frames = list(InputLog(stream.getvalue()))
+        self.assertEqual(frames[0].key_changes, (KeyChange(Scancode.SPACE, True),))
+        self.assertIs(frames[0].key_changes[0].scancode, Scancode.SPACE)
+
+    def test_rejects_foreign_data(self) -> None:
+        with self.assertRaises(ValueError):
+            InputLog(b'\x89PNG\r\n')
+
+
+def key_event(event_type: EventType, scancode: Scancode, repeat: bool = False) -> RawEvent:
+    event = RawEvent()
+    event.type = event.key.type = event_type
+    event.key.keysym = scancode
+    event.key.repeat = repeat
+    return event
+
+
+class ReplayTests(unittest.TestCase):
+    def test_replay_matches_live_input(self) -> None:
+        # Several key changes and repeats within one frame.
+        frames_events = [
+            [key_event(EventType.KEY_DOWN, Scancode.RIGHT), key_event(EventType.KEY_DOWN, Scancode.SPACE)],
+            [key_event(EventType.KEY_DOWN, Scancode.RIGHT, repeat=True), key_event(EventType.KEY_UP, Scancode.SPACE),
+             key_event(EventType.KEY_DOWN, Scancode.LEFT)],
+            [],
+            [key_event(EventType.KEY_UP, Scancode.RIGHT), key_event(EventType.KEY_DOWN, Scancode.RIGHT),
+             key_event(EventType.KEY_UP, Scancode.LEFT)],
+            [],
+        ]
+        scancodes = (Scancode.RIGHT, Scancode.LEFT, Scancode.SPACE)
+
+        stream = io.BytesIO()
+        recorder = InputRecorder(stream, start_time=0)
+        live = EventHandler()
+        live.keyboard.recorder = recorder
+        live_states: List[Dict[Scancode, KeyState]] = []
+        for events in frames_events:
+            with mock.patch.object(EventHandler, 'pending_events', lambda: iter(events)):
+                live.update()
+            recorder.record_frame(17)
+            live_states.append({scancode: live.keyboard.key_state(scancode) for scancode in scancodes})
+        recorder.flush()
+
+        replay = ReplayEventHandler()
+        replay_states: List[Dict[Scancode, KeyState]] = []
+        for frame in InputLog(stream.getvalue()):
+            replay.key_changes = frame.key_changes
+            replay.update()
+            replay_states.append({scancode: replay.keyboard.key_state(scancode) for scancode in scancodes})
+
+        self.assertEqual(replay_states, live_states)
+        self.assertIs(live_states[1][Scancode.RIGHT], KeyState.DOWN)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from typing import List
+
+from engine.sdl import RenderStats, RenderCall, EventHandler, EventType, RawEvent, Scancode, KeyState
+
+
+class RenderStatsTests(unittest.TestCase):
+    def test_frames_are_counted_separately(self) -> None:
+        stats = RenderStats()
+        stats.issued[RenderCall.DRAW_TEXTURE] += 3
+        stats.issued[RenderCall.FILL_RECTANGLES] += 1
+        stats.issued[RenderCall.SET_DRAW_COLOR] += 2
+        stats.skipped[RenderCall.SET_DRAW_COLOR] += 5
+        self.assertEqual(stats.draw_calls, 4)
+        stats.end_frame()
+        self.assertEqual(stats.draw_calls, 0)
+        self.assertEqual(stats.presented_draw_calls, 4)
+        presented = stats.presented()
+        self.assertEqual(presented['set_draw_color'], (2, 5))
+        self.assertEqual(presented['draw_texture'], (3, 0))
+        self.assertEqual(presented['clear'], (0, 0))
+
+
+def key_event(event_type: EventType, scancode: Scancode, repeat: bool = False) -> RawEvent:
+    event = RawEvent()
+    event.type = event.key.type = event_type
+    event.key.keysym = scancode
+    event.key.repeat = repeat
+    return event
+
+
+class HotkeyTests(unittest.TestCase):
+    def test_hotkeys_never_reach_the_keyboard(self) -> None:
+        presses: List[None] = []
+        event_handler = EventHandler()
+        event_handler.hotkeys[Scancode.F5] = lambda: presses.append(None)
+
+        for event in (
+                key_event(EventType.KEY_DOWN, Scancode.F5), key_event(EventType.KEY_DOWN, Scancode.F5, repeat=True),
+                key_event(EventType.KEY_UP, Scancode.F5)):
+            self.assertTrue(event_handler.handle_hotkey(event))
+        self.assertEqual(len(presses), 1)
+        self.assertFalse(event_handler.handle_hotkey(key_event(EventType.KEY_DOWN, Scancode.SPACE)))
+        self.assertIs(event_handler.keyboard.key_state(Scancode.F5), KeyState.UP)
+
+
+if __name__ == '__main__':
+    unittest.main()
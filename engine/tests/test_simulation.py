@@ -0,0 +1,87 @@
+import unittest
+from typing import List
+
+from engine.game import Actor
+from engine.graphics import Sprite, Animation, AnimationSystem
+from engine.physics import Integrator
+from engine.sdl import Flip, Keyboard, KeyState, Scancode
+from engine.simulation import TripleBuffer, RenderSnapshot, SimulationThread, InputSnapshot
+from engine.timer import Time
+from engine.utils import Rectangle
+
+
+class TripleBufferTests(unittest.TestCase):
+    def test_writer_avoids_latest_and_read_buffers(self) -> None:
+        buffers: TripleBuffer[List[int]] = TripleBuffer(list)
+        reading = buffers.read()
+        for value in range(5):
+            written = buffers.write_buffer()
+            self.assertIsNot(written, reading)
+            self.assertIsNot(written, buffers.latest)
+            written[:] = [value]
+            buffers.publish(written)
+            self.assertEqual(reading, [])
+        self.assertEqual(buffers.read(), [4])
+
+
+class InputSnapshotTests(unittest.TestCase):
+    def test_simulation_sees_every_press_and_release_once(self) -> None:
+        main_keyboard = Keyboard()
+        simulation_keyboard = Keyboard()
+        snapshot = InputSnapshot()
+
+        def main_frame() -> None:
+            main_keyboard.update_keys()
+            snapshot.capture(main_keyboard)
+
+        def simulation_step() -> KeyState:
+            snapshot.apply(simulation_keyboard)
+            return simulation_keyboard.key_state(Scancode.SPACE)
+
+        main_keyboard.press(Scancode.SPACE)
+        snapshot.capture(main_keyboard)
+        # The main thread runs a few frames before the simulation steps.
+        main_frame()
+        main_frame()
+        self.assertIs(simulation_step(), KeyState.PRESSED)
+        self.assertIs(simulation_step(), KeyState.DOWN)
+        main_keyboard.release(Scancode.SPACE)
+        snapshot.capture(main_keyboard)
+        self.assertIs(simulation_step(), KeyState.RELEASED)
+        main_frame()
+        self.assertIs(simulation_step(), KeyState.UP)
+        self.assertEqual(snapshot.down_scancodes, [])
+        self.assertFalse(any(snapshot.down))
+
+
+class SimulationTests(unittest.TestCase):
+    def test_step_publishes_snapshot_of_actors(self) -> None:
+        animation_system = AnimationSystem(capacity=1)
+        sprite = Sprite(texture=None, animation=Animation(  # type: ignore
+            starting_frame=Rectangle(upper_left=0, dimensions=16 + 32j), frame_count=3, frame_delay=100, loop=True))
+        actor = Actor(
+            sprite, Rectangle(upper_left=10 + 20j, dimensions=16 + 32j), flip=Flip.HORIZONTAL,
+            animation_system=animation_system)
+        integrator = Integrator(timestep=2, gravity=0, horizontal_drag=0, entities=[actor], terrain=[])
+        simulation = SimulationThread(integrator, animation_system, Keyboard(), fps=60)
+
+        simulation.step(Time(current=150, delta=150))
+        snapshot: RenderSnapshot = simulation.snapshots.read()
+        self.assertEqual(snapshot.count, 1)
+        self.assertEqual(snapshot.time.current, 150)
+        self.assertEqual(list(snapshot.rectangles), [10, 20, 16, 32])
+        self.assertEqual(snapshot.center(0), 18 + 36j)
+        checkbox = snapshot.checkbox(0)
+        self.assertEqual((checkbox.upper_left, checkbox.dimensions), (10 + 20j, 16 + 32j))
+        self.assertEqual(snapshot.velocity(0), 0)
+        self.assertEqual(list(snapshot.on_ground), [False])
+        self.assertEqual(snapshot.physics_steps, 75)
+        self.assertEqual(snapshot.entity_count, 1)
+        self.assertEqual(list(snapshot.flips), [Flip.HORIZONTAL])
+        self.assertEqual(list(snapshot.frame_nums), [1])
+        self.assertIs(snapshot.sprites[0], sprite)
+        simulation.destroy()
+
+
+if __name__ == '__main__':
+    unittest.main()
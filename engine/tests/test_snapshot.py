@@ -0,0 +1,84 @@
+import unittest
+
+from engine.physics import Integrator, PhysicalEntity, Block
+from engine.snapshot import WorldSnapshots
+from engine.timer import Time
+from engine.utils import Rectangle
+
+
+class WorldSnapshotsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.entity = PhysicalEntity(Rectangle(upper_left=10 + 10j, dimensions=16 + 32j))
+        self.integrator = Integrator(
+            timestep=2, gravity=300, horizontal_drag=0.2,
+            entities=[self.entity], terrain=[Block(upper_left=200j, dimensions=256 + 24j)])
+
+    def test_restore(self) -> None:
+        snapshots = WorldSnapshots(self.integrator, capacity=4)
+        snapshots.save()
+        self.integrator.update(Time(current=17, delta=17))
+        moved_upper_left = self.entity.checkbox.upper_left
+        moved_velocity = self.entity.velocity
+        snapshots.save()
+        self.integrator.update(Time(current=50, delta=33))
+
+        snapshots.restore()
+        self.assertEqual(self.entity.checkbox.upper_left, moved_upper_left)
+        self.assertEqual(self.entity.velocity, moved_velocity)
+        self.assertEqual(self.integrator.time_accumulator, 1)
+
+        snapshots.restore(age=1)
+        self.assertEqual(self.entity.checkbox.upper_left, 10 + 10j)
+        self.assertEqual(self.entity.velocity, 0)
+        self.assertEqual(self.integrator.time_accumulator, 0)
+
+    def test_ring_keeps_newest(self) -> None:
+        snapshots = WorldSnapshots(self.integrator, capacity=3)
+        for real in range(5):
+            self.entity.checkbox.upper_left = real + 0j
+            snapshots.save()
+        self.assertEqual(len(snapshots), 3)
+        for age, real in enumerate((4, 3, 2)):
+            snapshots.restore(age)
+            self.assertEqual(self.entity.checkbox.upper_left, real)
+        with self.assertRaises(IndexError):
+            snapshots.restore(age=3)
+
+    def test_rewind(self) -> None:
+        snapshots = WorldSnapshots(self.integrator, capacity=8)
+        for real in range(5):
+            self.entity.checkbox.upper_left = real + 0j
+            snapshots.save()
+        snapshots.rewind(age=3)
+        self.assertEqual(self.entity.checkbox.upper_left, 1)
+        self.assertEqual(len(snapshots), 2)
+        snapshots.restore()
+        self.assertEqual(self.entity.checkbox.upper_left, 1)
+
+    def test_spawning_starts_a_new_history(self) -> None:
+        snapshots = WorldSnapshots(self.integrator, capacity=2)
+        snapshots.save()
+        spawned = PhysicalEntity(Rectangle(upper_left=0, dimensions=1 + 1j))
+        self.integrator.entities.spawn(spawned)
+        self.integrator.entities.apply_pending()
+        for real in range(3):
+            spawned.checkbox.upper_left = real + 0j
+            snapshots.save()
+        self.assertEqual(len(snapshots), 2)
+        self.assertTrue(snapshots.rewind(age=1))
+        self.assertEqual(spawned.checkbox.upper_left, 1)
+
+    def test_rewinding_across_a_despawn_is_ignored(self) -> None:
+        snapshots = WorldSnapshots(self.integrator, capacity=4)
+        snapshots.save()
+        snapshots.save()
+        self.integrator.entities.despawn(self.entity)
+        self.integrator.entities.apply_pending()
+        self.assertFalse(snapshots.rewind(age=1))
+        self.assertEqual(len(snapshots), 0)
+        snapshots.save()
+        self.assertEqual(len(snapshots), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import gc
+import io
+import unittest
+
+from engine.profiler import Percentiles
+from engine.telemetry import (
+    TelemetryRing, TelemetryWriter, FrameRecord, TELEMETRY_RECORD, read_telemetry, summarize, find_regressions)
+
+
+class KeptBytesIO(io.BytesIO):
+    # Keeps what was written readable after the writer closes it.
+
+    def close(self) -> None:
+        self.seek(0)
+
+
+class TelemetryRingTests(unittest.TestCase):
+    def test_drops_records_when_full(self) -> None:
+        ring = TelemetryRing(capacity=2)
+        self.assertTrue(ring.push(1, 0, 0, 0, 0))
+        self.assertTrue(ring.push(2, 0, 0, 0, 0))
+        self.assertFalse(ring.push(3, 0, 0, 0, 0))
+        self.assertEqual(ring.dropped, 1)
+
+        buffer = bytearray()
+        self.assertEqual(ring.drain(buffer), 2)
+        self.assertEqual([record[0] for record in TELEMETRY_RECORD.iter_unpack(buffer)], [1, 2])
+        self.assertTrue(ring.push(4, 0, 0, 0, 0))
+        buffer.clear()
+        self.assertEqual(ring.drain(buffer), 1)
+        self.assertEqual(TELEMETRY_RECORD.unpack(buffer)[0], 4)
+
+
+class TelemetryWriterTests(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        stream = KeptBytesIO()
+        writer = TelemetryWriter(stream, capacity=16, interval=0.01)
+        for frame_num in range(3):
+            writer.begin_frame()
+            if frame_num == 1:
+                gc.collect()
+            writer.record_counts(physics_steps=frame_num, entity_count=5, draw_calls=7)
+            writer.end_frame()
+        writer.destroy()
+
+        records = list(read_telemetry(stream))
+        self.assertEqual([record.physics_steps for record in records], [0, 1, 2])
+        self.assertEqual([record.entity_count for record in records], [5, 5, 5])
+        self.assertEqual([record.draw_calls for record in records], [7, 7, 7])
+        self.assertGreaterEqual(records[1].gc_collections, 1)
+        self.assertTrue(all(record.frame_time >= 0 for record in records))
+
+    def test_rejects_other_files(self) -> None:
+        with self.assertRaises(ValueError):
+            list(read_telemetry(io.BytesIO(b'not telemetry')))
+
+
+class RegressionTests(unittest.TestCase):
+    def test_finds_regressions(self) -> None:
+        baseline = summarize([FrameRecord(10, 5, 1, 3, 0)] * 100)
+        summary = summarize([FrameRecord(10.5, 5, 1, 3, 0)] * 90 + [FrameRecord(30, 5, 1, 3, 1)] * 10)
+
+        regressions = find_regressions(summary, baseline, tolerance=0.1)
+        self.assertEqual(
+            {(regression.field, regression.percentile) for regression in regressions},
+            {('frame_time', 'p95'), ('frame_time', 'p99'), ('gc_collections', 'p95'), ('gc_collections', 'p99')})
+        self.assertEqual(summary['frame_time'], Percentiles(10.5, 30, 30))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import ctypes
+import io
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+from engine.sdl import Surface, RawSurface
+from engine.texture_cache import (
+    TextureCache, MappedSurface, write_cache_file, read_cache_header, CACHE_HEADER)
+
+
+def fake_raw_surface(address: int, dimensions: complex, pitch: int) -> 'ctypes._Pointer[RawSurface]':
+    # What SDL_CreateRGBSurfaceWithFormatFrom would return, without SDL.
+    return ctypes.pointer(RawSurface(w=int(dimensions.real), h=int(dimensions.imag), pitch=pitch, pixels=address))
+
+
+class DecodedSurface(Surface):
+    __slots__ = 'buffer', 'destroyed'
+
+    def __init__(self, pixels: bytes, dimensions: complex) -> None:
+        self.buffer = ctypes.create_string_buffer(pixels, len(pixels))
+        self.destroyed = False
+        super().__init__(fake_raw_surface(ctypes.addressof(self.buffer), dimensions, pitch=4 * int(dimensions.real)))
+
+    def destroy(self) -> None:
+        self.destroyed = True
+
+
+class TextureCacheTests(unittest.TestCase):
+    def test_header_round_trip(self) -> None:
+        cache_file = io.BytesIO()
+        write_cache_file(cache_file, [bytes(range(8)), bytes(range(8, 16))], dimensions=2 + 2j)
+        data = cache_file.getvalue()
+        self.assertEqual(read_cache_header(data), 2 + 2j)
+        self.assertEqual(data[CACHE_HEADER.size:], bytes(range(16)))
+
+    def test_decoded_images_are_mapped_from_the_cache_next_time(self) -> None:
+        pixels = bytes(range(24))
+        decoded: List[DecodedSurface] = []
+
+        def load(path: bytes) -> Surface:
+            decoded.append(DecodedSurface(pixels, dimensions=2 + 3j))
+            return decoded[-1]
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(Surface, 'load', load), \
+                mock.patch.object(Surface, 'destroy', lambda surface: None), \
+                mock.patch('engine.texture_cache.raw_surface_from_pixels', fake_raw_surface):
+            image_path = os.path.join(directory, 'image.png')
+            with open(image_path, 'wb') as image_file:
+                image_file.write(b'image')
+            cache = TextureCache(os.path.join(directory, 'cache'))
+
+            self.assertIs(cache.load_surface(os.fsencode(image_path)), decoded[0])
+            cache_file_name = os.path.basename(cache.cache_path(os.fsencode(image_path)))
+            self.assertEqual(os.listdir(cache.directory), [cache_file_name])
+            surface = cache.load_surface(os.fsencode(image_path))
+            self.assertIsInstance(surface, MappedSurface)
+            self.assertEqual(len(decoded), 1)
+            self.assertEqual(surface.dimensions, 2 + 3j)
+            self.assertEqual(surface.read_pixels(), pixels)
+            # Unmaps the file, SDL's part is patched out.
+            surface.destroy()
+
+    def test_failing_to_store_still_returns_the_image(self) -> None:
+        decoded = DecodedSurface(bytes(16), dimensions=2 + 2j)
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(Surface, 'load', lambda path: decoded), \
+                mock.patch('engine.texture_cache.write_cache_file', side_effect=OSError('No space left on device')):
+            image_path = os.path.join(directory, 'image.png')
+            with open(image_path, 'wb') as image_file:
+                image_file.write(b'image')
+            cache = TextureCache(os.path.join(directory, 'cache'))
+
+            self.assertIs(cache.load_surface(os.fsencode(image_path)), decoded)
+            self.assertFalse(decoded.destroyed)
+            self.assertEqual(os.listdir(cache.directory), [])
+
+    def test_rejects_invalid_files(self) -> None:
+        cache_file = io.BytesIO()
+        write_cache_file(cache_file, [bytes(8)], dimensions=2 + 2j)
+        for data in (b'', b'MRTC', b'XXXX' + cache_file.getvalue()[4:], cache_file.getvalue()):
+            with self.assertRaises(ValueError):
+                read_cache_header(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
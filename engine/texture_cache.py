@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import ctypes
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from contextlib import suppress
+from typing import Iterable, BinaryIO, Union
+
+from engine.sdl import Surface, raw_surface_from_pixels
+
+CACHE_MAGIC = b'MRTC'
+CACHE_VERSION = 1
+# Magic, version, width and height, 16 bytes so the pixels after it stay aligned.
+CACHE_HEADER = struct.Struct('<4sIII')
+
+
+class MappedSurface(Surface):
+    __slots__ = 'mapping', 'pixels'
+
+    # A surface over the pixels of a memory-mapped cache file, which stays mapped until the surface is destroyed.
+
+    def __init__(self, mapping: mmap.mmap, dimensions: complex) -> None:
+        self.mapping = mapping
+        self.pixels = ctypes.c_char.from_buffer(mapping, CACHE_HEADER.size)
+        try:
+            super().__init__(raw_surface_from_pixels(
+                ctypes.addressof(self.pixels), dimensions, pitch=4 * int(dimensions.real)))
+        except BaseException:
+            self.release_mapping()
+            raise
+
+    def destroy(self) -> None:
+        super().destroy()
+        self.release_mapping()
+
+    def release_mapping(self) -> None:
+        # The mapping cannot be closed while ctypes still refers to it.
+        del self.pixels
+        self.mapping.close()
+
+
+class TextureCache:
+    __slots__ = 'directory'
+
+    # Decoded images are stored as raw RGBA under the hash of the image file's contents, so an edited image
+    # gets a new entry. A cached image is loaded by mapping its file instead of decoding it, and textures
+    # are then created straight from the mapped pixels. Safe to use from several loader threads.
+
+    def __init__(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def cache_path(self, path: bytes) -> str:
+        with open(path, 'rb') as image_file:
+            key = hashlib.sha1(image_file.read()).hexdigest()
+        return os.path.join(self.directory, f'{key}.rgba')
+
+    def load_surface(self, path: bytes) -> Surface:
+        cache_path = self.cache_path(path)
+        if os.path.exists(cache_path):
+            try:
+                return map_cache_file(cache_path)
+            except ValueError:
+                pass
+
+        surface = Surface.load(path)
+        width = int(surface.dimensions.real)
+        try:
+            store_cache_file(cache_path, (
+                ctypes.string_at(surface.pixels_address(0, y), 4 * width)
+                for y in range(int(surface.dimensions.imag))), surface.dimensions)
+        except OSError:
+            # E.g. a full disk or a read-only directory, the image is decoded again next time.
+            pass
+        except BaseException:
+            surface.destroy()
+            raise
+        return surface
+
+
+def map_cache_file(cache_path: str) -> MappedSurface:
+    with open(cache_path, 'rb') as cache_file:
+        # A private copy-on-write mapping, ctypes can only point into writable buffers.
+        mapping = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_COPY)
+    try:
+        dimensions = read_cache_header(mapping)
+        return MappedSurface(mapping, dimensions)
+    except BaseException:
+        if not mapping.closed:
+            mapping.close()
+        raise
+
+
+def read_cache_header(data: Union[bytes, mmap.mmap]) -> complex:
+    if len(data) < CACHE_HEADER.size:
+        raise ValueError('Not a texture cache file')
+    magic, version, width, height = CACHE_HEADER.unpack_from(data)
+    if magic != CACHE_MAGIC or version != CACHE_VERSION:
+        raise ValueError('Not a texture cache file, or one from another version')
+    if len(data) != CACHE_HEADER.size + 4 * width * height:
+        raise ValueError('Truncated texture cache file')
+    return complex(width, height)
+
+
+def store_cache_file(cache_path: str, rows: Iterable[bytes], dimensions: complex) -> None:
+    # Written under a temporary name and renamed, so other threads or processes never map a partial file.
+    temporary_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temporary_path, 'wb') as cache_file:
+            write_cache_file(cache_file, rows, dimensions)
+        os.replace(temporary_path, cache_path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(temporary_path)
+        raise
+
+
+def write_cache_file(cache_file: BinaryIO, rows: Iterable[bytes], dimensions: complex) -> None:
+    cache_file.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, int(dimensions.real), int(dimensions.imag)))
+    for row in rows:
+        cache_file.write(row)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import enum
 from builtins import bool
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
 import math
 
@@ -210,6 +210,20 @@ def dot_product(c1: complex, c2: complex) -> float:
     return c1.real * c2.real + c1.imag * c2.imag
 
 
+def intersection_fraction(ray: Line, segment: Line) -> Optional[float]:
+    # How far along the ray it crosses the segment, from 0 at its origin to 1 at its end.
+    # Parallel lines never cross, even when they overlap.
+    denominator = cross_product(ray.offset, segment.offset)
+    if denominator == 0:
+        return None
+    difference = segment.origin - ray.origin
+    ray_fraction = cross_product(difference, segment.offset) / denominator
+    segment_fraction = cross_product(difference, ray.offset) / denominator
+    if 0 <= ray_fraction <= 1 and 0 <= segment_fraction <= 1:
+        return ray_fraction
+    return None
+
+
 @enum.unique
 class Direction(enum.IntEnum):
     NONE = 0
@@ -1,49 +1,99 @@
 #!/usr/bin/env python3
-from typing import List
+from argparse import ArgumentParser
+from contextlib import ExitStack
+from typing import List, Any, Optional, Union
 
 from engine import sdl
+from engine.allocations import AllocationTracker
+from engine.assets import AssetLoader
+from engine.capture import FrameCapture, CapturePipeline, FrameWriter, PngSequenceWriter, RawFrameWriter
+from engine.debug_draw import DebugDraw
 from engine.game import Game
-from engine.graphics import FollowerCamera
-from engine.physics import Integrator, Block, Platform, TerrainElement
-from engine.sdl import Window, Color, destroying, Texture
+from engine.graphics import FollowerCamera, TiledBackground
+from engine.hud import PerformanceHud
+from engine.physics import Integrator, Block, Platform, TerrainElement, UpdateLod
+from engine.profiler import Phase
+from engine.replay import InputLog
+from engine.simulation import SimulationThread, RenderSnapshot
+from engine.sdl import Window, Color, destroying, Scancode, Keyboard
+from engine.snapshot import WorldSnapshots
+from engine.telemetry import TelemetryWriter
+from engine.texture_cache import TextureCache
 from engine.timer import Time
-from engine.utils import Line, Rectangle
+from engine.utils import Rectangle
 from mario import Mario
 
 FPS = 60
 
 VISUAL_VELOCITY_MULTIPLIER = 0.1
 
+CHECKBOX_COLOR = Color.blue(a=80)
+VELOCITY_COLOR = Color.red(a=120)
+ON_GROUND_COLOR = Color.green(a=200)
+
 ACTOR_DIMENSIONS = 16 + 32j
 
+VIEW_DIMENSIONS = 400 + 400j
+
+REWIND_FRAMES = 10 * FPS
+
+TEXTURE_CACHE_DIRECTORY = '.cache/textures'
+
+# Mario is the first actor in the integrator, and in render snapshots.
+MARIO_INDEX = 0
+
 
 class Background:
-    def __init__(self, color: Color, texture: Texture) -> None:
+    def __init__(self, color: Color, layers: List[TiledBackground]) -> None:
         self.color = color
-        self.texture = texture
+        self.layers = layers
 
 
 class MarioGame(Game):
-    def __init__(self, debug: bool = False) -> None:
+    def __init__(self, debug: bool = False, scale: int = 1, software: bool = False, threaded: bool = False) -> None:
         super().__init__(fps=FPS)
-        self.window = Window(b'', dimensions=400 + 400j)
-        self.renderer = self.window.renderer()
-        self.mario_texture = self.renderer.load_texture(b'res/mario.png')
+        # The game is drawn at the view's resolution and scaled up to the window once, by SDL.
+        self.window = Window(b'', dimensions=VIEW_DIMENSIONS * scale, resizable=True)
+        self.renderer = self.window.renderer(software=software)
+        self.renderer.set_logical_size(VIEW_DIMENSIONS)
+        # Assets needed later are requested from the loader and stream in while the game runs.
+        self.texture_cache = TextureCache(TEXTURE_CACHE_DIRECTORY)
+        self.assets = AssetLoader(self.renderer, decode=self.texture_cache.load_surface)
+        mario_texture = self.assets.load(b'res/mario.png')
+        self.assets.wait([mario_texture])
+        self.mario_texture = mario_texture.result()
         self.background = Background(
-            color=Color(107, 142, 255), texture=self.renderer.load_texture(b'res/background.png'))
-        self.mario = Mario(keyboard=self.keyboard, upper_left=100 + 100j, texture=self.mario_texture)
+            color=Color(107, 142, 255), layers=[TiledBackground.load(
+                self.renderer, b'res/background.png', decode=self.texture_cache.load_surface)])
+        # On the simulation thread Mario reads a keyboard of its own, which never changes while it steps.
+        mario_keyboard = Keyboard() if threaded else self.keyboard
+        self.mario = Mario(
+            keyboard=mario_keyboard, upper_left=100 + 100j, texture=self.mario_texture,
+            animation_system=self.animation_system)
         self.camera = FollowerCamera(
-            target=self.mario, view_dimensions=400 + 400j,
-            window_dimensions=400 + 400j, renderer=self.renderer)
+            target=self.mario, view_dimensions=VIEW_DIMENSIONS,
+            window_dimensions=VIEW_DIMENSIONS, renderer=self.renderer)
         self.integrator = Integrator(
             timestep=2, gravity=300, horizontal_drag=0.2,
-            entities=[self.mario], terrain=MarioGame.create_terrain())
+            entities=[self.mario], terrain=MarioGame.create_terrain(), lod=UpdateLod(self.camera.view))
 
         self.debug = debug
+        self.rendering = True
+        self.snapshots = WorldSnapshots(self.integrator, capacity=REWIND_FRAMES)
+        self.hud = PerformanceHud(self.renderer, frame_budget=self.frame_time)
+        self.debug_shapes = DebugDraw(self.renderer)
+        self.frame_capture: Optional[Union[FrameCapture, CapturePipeline]] = None
+        self.simulation = SimulationThread(
+            self.integrator, self.animation_system, mario_keyboard, fps=FPS) if threaded else None
 
     def destroy(self) -> None:
-        self.background.texture.destroy()
-        self.mario_texture.destroy()
+        if self.simulation:
+            self.simulation.destroy()
+        super().destroy()
+        self.hud.destroy()
+        for layer in self.background.layers:
+            layer.destroy()
+        self.assets.destroy()
         self.renderer.destroy()
         self.window.destroy()
 
@@ -59,43 +109,190 @@ class MarioGame(Game):
             Platform(origin=640 + 56j, width=112),
         ]
 
+    def main_loop(self) -> None:
+        if self.simulation:
+            self.simulation.start()
+        super().main_loop()
+
     def frame_advance(self, time: Time) -> None:
-        super().frame_advance(time)
-        self.integrator.update(time)
-        self.camera.update()
-        self.redraw_frame()
+        if self.simulation:
+            # Animations and physics run on the simulation thread, only events are handled here. So there is
+            # no rewinding, and the profiler's animation and physics phases stay empty.
+            self.handle_events(time)
+            self.simulation.publish_input(self.keyboard)
+        else:
+            super().frame_advance(time)
+        self.assets.update()
+        if self.keyboard.key_pressed(Scancode.F3):
+            self.toggle_profiler()
+        snapshot = None
+        if self.simulation:
+            # The integrator belongs to the simulation thread, everything about it is read from its snapshot.
+            snapshot = self.simulation.snapshots.read()
+            self.camera.center_on(snapshot.center(MARIO_INDEX))
+            physics_steps = snapshot.physics_steps
+            entity_count = snapshot.entity_count
+        else:
+            self.simulate(time)
+            self.camera.update()
+            physics_steps = self.integrator.step_count
+            entity_count = len(self.integrator.entities)
+        self.profiler.end_phase(Phase.CAMERA)
+        if self.debug:
+            self.hud.update(
+                time, physics_steps=physics_steps, draw_calls=self.renderer.presented_draw_calls,
+                entity_count=entity_count)
+        if self.rendering:
+            self.redraw_frame(snapshot)
+        if self.telemetry:
+            self.telemetry.record_counts(
+                physics_steps=physics_steps, entity_count=entity_count, draw_calls=self.renderer.presented_draw_calls)
+
+    def simulate(self, time: Time) -> None:
+        if self.debug and self.keyboard.key_down(Scancode.BACKSPACE):
+            self.rewind()
+        else:
+            self.integrator.update(time)
+            self.profiler.record_physics_steps(self.integrator.step_count)
+            if self.debug:
+                self.snapshots.save()
+        self.profiler.end_phase(Phase.PHYSICS)
+
+    def toggle_profiler(self) -> None:
+        if self.profiler.enabled:
+            print(self.performance_report())
+        self.profiler.clear()
+        self.profiler.enabled = not self.profiler.enabled
 
-    def redraw_frame(self) -> None:
+    def performance_report(self) -> str:
+        render_calls = '\n'.join(
+            f'{name:<18}{issued:>6} issued{skipped:>6} skipped'
+            for name, (issued, skipped) in self.renderer.stats.presented().items())
+        return f'{self.profiler.report()}\n\nNative render calls in the last frame:\n{render_calls}'
+
+    def rewind(self) -> None:
+        if len(self.snapshots) > 1:
+            self.snapshots.rewind(age=1)
+
+    def redraw_frame(self, snapshot: Optional[RenderSnapshot] = None) -> None:
         self.draw_background()
-        self.mario.render(self.camera)
+        if snapshot:
+            snapshot.render(self.camera)
+        else:
+            self.mario.render(self.camera)
         if self.debug:
-            self.debug_draw()
+            self.debug_draw(snapshot)
+            self.hud.render()
+        self.profiler.end_phase(Phase.REDRAW)
+        if self.frame_capture:
+            self.frame_capture.capture()
         self.renderer.present()
+        self.profiler.record_draw_calls(self.renderer.presented_draw_calls)
+        self.profiler.end_phase(Phase.PRESENT)
 
     def draw_background(self) -> None:
         self.renderer.set_draw_color(self.background.color)
         self.renderer.clear()
-        whole_background = Rectangle(upper_left=0, dimensions=self.background.texture.dimensions)
-        self.camera.draw_texture(self.background.texture, source=whole_background, destination=whole_background)
-
-    def debug_draw(self) -> None:
-        for entity in self.integrator.entities:
-            self.camera.renderer.set_draw_color(Color.blue(a=80))
-            self.camera.draw_rectangle(entity.checkbox, fill=True)
-            self.camera.renderer.set_draw_color(Color.red(a=120))
-            self.camera.draw_line(Line(entity.checkbox.center, entity.velocity * VISUAL_VELOCITY_MULTIPLIER))
-            self.camera.draw_line(Line(entity.checkbox.center - 1, entity.velocity * VISUAL_VELOCITY_MULTIPLIER))
-            self.camera.draw_line(Line(entity.checkbox.center + 1, entity.velocity * VISUAL_VELOCITY_MULTIPLIER))
-            self.camera.draw_line(Line(entity.checkbox.center - 1j, entity.velocity * VISUAL_VELOCITY_MULTIPLIER))
-            self.camera.draw_line(Line(entity.checkbox.center + 1j, entity.velocity * VISUAL_VELOCITY_MULTIPLIER))
-            if entity.on_ground:
-                self.camera.renderer.set_draw_color(Color.green(a=200))
-                self.camera.draw_rectangle(Rectangle(entity.checkbox.upper_left, 3 + 3j), fill=True)
+        for layer in self.background.layers:
+            layer.render(self.camera)
+
+    def debug_draw(self, snapshot: Optional[RenderSnapshot] = None) -> None:
+        self.debug_shapes.begin(self.camera)
+        if snapshot:
+            # Only actors are in snapshots.
+            for index in range(snapshot.count):
+                self.debug_draw_entity(
+                    snapshot.checkbox(index), snapshot.velocity(index), bool(snapshot.on_ground[index]))
+        else:
+            for entity in self.integrator.entities:
+                self.debug_draw_entity(entity.checkbox, entity.velocity, entity.on_ground)
+        self.debug_shapes.flush()
+
+    def debug_draw_entity(self, checkbox: Rectangle, velocity: complex, on_ground: bool) -> None:
+        self.debug_shapes.rectangle(CHECKBOX_COLOR, checkbox, fill=True)
+        center = checkbox.center
+        velocity *= VISUAL_VELOCITY_MULTIPLIER
+        # The five parallel velocity lines are drawn as a single zig-zag strip.
+        self.debug_shapes.polyline(VELOCITY_COLOR, (
+            center, center + velocity,
+            center - 1 + velocity, center - 1,
+            center + 1, center + 1 + velocity,
+            center - 1j + velocity, center - 1j,
+            center + 1j, center + 1j + velocity))
+        if on_ground:
+            self.debug_shapes.rectangle(ON_GROUND_COLOR, Rectangle(checkbox.upper_left, 3 + 3j), fill=True)
 
 
 def main() -> None:
-    with sdl.init_and_quit(), destroying(MarioGame()) as game:
-        game.main_loop()
+    arguments = parse_arguments()
+    threaded = arguments.threaded and not arguments.replay
+    with sdl.init_and_quit(headless=arguments.headless), \
+            destroying(MarioGame(
+                debug=arguments.debug, scale=arguments.scale, software=arguments.headless,
+                threaded=threaded)) as game, \
+            ExitStack() as stack:
+        game.profiler.enabled = arguments.profile
+        game.profile_capture.frame_count = arguments.profile_frames
+        game.profile_capture.on_saved = lambda path: print(f'Saved a profile of the last frames to {path}')
+        if arguments.telemetry:
+            game.telemetry = stack.enter_context(destroying(TelemetryWriter(open(arguments.telemetry, 'wb'))))
+        if arguments.allocations:
+            game.allocations = AllocationTracker()
+            game.allocations.start()
+        capture_writer = frame_writer(arguments)
+        if capture_writer:
+            game.frame_capture = stack.enter_context(destroying(CapturePipeline(game.renderer, capture_writer)))
+        if arguments.replay:
+            game.rendering = not arguments.headless
+            game.replay(InputLog.load(arguments.replay))
+        else:
+            if arguments.record:
+                game.start_recording(open(arguments.record, 'wb'))
+            game.main_loop()
+        if game.profiler.enabled:
+            print(game.performance_report())
+        if game.allocations:
+            print(game.allocations.report())
+            game.allocations.stop()
+        if game.telemetry and game.telemetry.dropped:
+            print(f'Dropped the telemetry of {game.telemetry.dropped} frames')
+        if isinstance(game.frame_capture, CapturePipeline):
+            print(f'Captured {game.frame_capture.frame_num} frames, dropped {game.frame_capture.dropped}')
+
+
+def frame_writer(arguments: Any) -> Optional[FrameWriter]:
+    if arguments.capture:
+        return PngSequenceWriter(arguments.capture)
+    if arguments.capture_raw:
+        return RawFrameWriter(open(arguments.capture_raw, 'wb'))
+    return None
+
+
+def parse_arguments() -> Any:
+    argument_parser = ArgumentParser()
+    argument_parser.add_argument('--debug', action='store_true')
+    argument_parser.add_argument('--record', metavar='LOG')
+    argument_parser.add_argument('--replay', metavar='LOG')
+    argument_parser.add_argument('--headless', action='store_true')
+    argument_parser.add_argument('--profile', action='store_true')
+    argument_parser.add_argument(
+        '--profile-frames', type=int, default=120, help='How many frames F5 profiles with cProfile')
+    argument_parser.add_argument('--scale', type=int, default=1)
+    argument_parser.add_argument('--capture', metavar='DIRECTORY', help='Writes every frame there as a PNG')
+    argument_parser.add_argument('--capture-raw', metavar='FILE', help='Writes every frame there as raw RGBA')
+    argument_parser.add_argument(
+        '--telemetry', metavar='FILE', help='Writes frame times and counts there, see tools/telemetry_report.py')
+    argument_parser.add_argument(
+        '--allocations', action='store_true', help='Reports the memory blocks frames leave allocated, slowly')
+    argument_parser.add_argument(
+        '--threaded', action='store_true', help='Runs physics on a thread of its own, replays ignore it')
+    arguments = argument_parser.parse_args()
+    if arguments.headless and not arguments.replay:
+        argument_parser.error('--headless only applies to --replay')
+    if arguments.threaded and arguments.record:
+        # Recorded frames would not match the simulation's steps.
+        argument_parser.error('--record cannot be combined with --threaded')
+    return arguments
 
 
 if __name__ == '__main__':
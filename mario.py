@@ -3,8 +3,9 @@ from __future__ import annotations
 from collections import OrderedDict
 
 from engine.game import Actor, GenericStateMachine, State, StateGraph
-from engine.graphics import Sprite, Animation
+from engine.graphics import Sprite, Animation, AnimationSystem
 from engine.sdl import Texture, Scancode, Flip, Keyboard
+from engine.snapshot import SnapshotCursor
 from engine.timer import Time
 from engine.utils import Rectangle, Direction
 
@@ -42,6 +43,16 @@ class Mario(Actor):
             if self.remaining_duration <= 0:
                 self.trigger = False
 
+        def save_state(self, cursor: SnapshotCursor) -> None:
+            super().save_state(cursor)
+            cursor.write(self.direction)
+            cursor.write(self.remaining_duration)
+
+        def restore_state(self, cursor: SnapshotCursor) -> None:
+            super().restore_state(cursor)
+            self.direction = Direction(int(cursor.read()))
+            self.remaining_duration = cursor.read()
+
     class Jumping(State['Mario']):
         def enter(self, mario: Mario) -> None:
             mario.velocity = mario.velocity.real + mario.jump_velocity
@@ -95,9 +106,12 @@ class Mario(Actor):
                 starting_frame=Rectangle(upper_left=64, dimensions=16 + 32j),
                 frame_count=1, frame_delay=0, loop=True))
 
-    def __init__(self, keyboard: Keyboard, upper_left: complex, texture: Texture) -> None:
+    def __init__(
+            self, keyboard: Keyboard, upper_left: complex, texture: Texture, animation_system: AnimationSystem) -> None:
         self.sprites = Mario.Sprites(texture)
-        super().__init__(sprite=self.sprites.idle, checkbox=Rectangle(upper_left, dimensions=16 + 32j))
+        super().__init__(
+            sprite=self.sprites.idle, checkbox=Rectangle(upper_left, dimensions=16 + 32j),
+            animation_system=animation_system)
         self.speed = 200.0
         self.jump_velocity = -200j
         self.direction = Direction.NONE
@@ -106,6 +120,16 @@ class Mario(Actor):
         self.keyboard = keyboard
         self.state_machine = Mario.StateMachine(self)
 
+    def save_state(self, cursor: SnapshotCursor) -> None:
+        super().save_state(cursor)
+        cursor.write(self.direction)
+        self.state_machine.save_state(cursor)
+
+    def restore_state(self, cursor: SnapshotCursor) -> None:
+        super().restore_state(cursor)
+        self.direction = Direction(int(cursor.read()))
+        self.state_machine.restore_state(cursor)
+
     def hit_ground(self, ground_imag: float) -> None:
         if self.velocity.imag >= self.stun_velocity:
             self.state_machine.stunned.trigger = True
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import os
+import sys
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Any
+
+from engine import sdl
+from engine.capture import FrameCapture, count_different_pixels, load_png
+from engine.replay import InputLog
+from engine.sdl import destroying
+from engine.timer import Time
+from main import MarioGame
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    with sdl.init_and_quit(headless=True), destroying(MarioGame(debug=arguments.debug, software=True)) as game:
+        game.profiler.enabled = True
+        frames = CheckedFrames(game, arguments)
+        start = perf_counter()
+        if arguments.replay:
+            game.replay(InputLog.load(arguments.replay), advance=frames.advance)
+        else:
+            # Without a log the game runs on its own for the given number of frames, at exactly its frame time.
+            for frame_num in range(1, arguments.frames + 1):
+                frames.advance(Time(current=frame_num * game.frame_time, delta=game.frame_time))
+                game.end_frame()
+        elapsed = perf_counter() - start
+
+        print(f'{frames.frame_count} frames in {elapsed:.3f} s, {frames.frame_count / elapsed:.1f} frames per second\n')
+        print(game.performance_report())
+    if frames.failures:
+        sys.exit(f'{frames.failures} frames differ from their golden images')
+
+
+class CheckedFrames:
+    __slots__ = 'game', 'arguments', 'frame_capture', 'frame_count', 'failures'
+
+    # Advances the game's frames, comparing every golden_interval-th one with its golden image.
+
+    def __init__(self, game: MarioGame, arguments: Any) -> None:
+        self.game = game
+        self.arguments = arguments
+        self.frame_capture = FrameCapture(game.renderer)
+        self.frame_count = 0
+        self.failures = 0
+        if arguments.golden:
+            os.makedirs(arguments.golden, exist_ok=True)
+
+    def advance(self, time: Time) -> None:
+        frame_num = self.frame_count
+        golden_frame = bool(self.arguments.golden) and frame_num % self.arguments.golden_interval == 0
+        self.game.frame_capture = self.frame_capture if golden_frame else None
+        self.game.frame_advance(time)
+        if golden_frame:
+            self.failures += check_golden_frame(self.frame_capture, self.arguments, frame_num)
+        self.frame_count += 1
+
+
+def check_golden_frame(frame_capture: FrameCapture, arguments: Any, frame_num: int) -> int:
+    path = os.path.join(arguments.golden, f'{frame_num:05}.png')
+    if arguments.update_golden or not os.path.exists(path):
+        frame_capture.save_png(path)
+        return 0
+
+    expected_pixels, expected_dimensions = load_png(path)
+    if expected_dimensions != frame_capture.dimensions:
+        print(f'Frame {frame_num}: {frame_capture.dimensions} instead of {expected_dimensions}')
+        return 1
+    different = count_different_pixels(
+        frame_capture.pixels, expected_pixels, arguments.tolerance, width=int(frame_capture.dimensions.real))
+    if different <= arguments.max_different_pixels:
+        return 0
+    print(f'Frame {frame_num}: {different} pixels differ from {path}')
+    if arguments.failed:
+        os.makedirs(arguments.failed, exist_ok=True)
+        frame_capture.save_png(os.path.join(arguments.failed, f'{frame_num:05}.png'))
+    return 1
+
+
+def parse_arguments() -> Any:
+    argument_parser = ArgumentParser(
+        description="Runs the game with a software renderer on SDL's dummy video driver, "
+                    "prints how long each phase of a frame took and compares frames with golden images.")
+    argument_parser.add_argument('--frames', type=int, default=600)
+    argument_parser.add_argument('--replay', metavar='LOG', help='Input log to replay instead of idling')
+    argument_parser.add_argument('--debug', action='store_true')
+    argument_parser.add_argument('--golden', metavar='DIRECTORY', help='Golden images, missing ones are written')
+    argument_parser.add_argument('--golden-interval', type=int, default=60)
+    argument_parser.add_argument('--update-golden', action='store_true')
+    argument_parser.add_argument('--tolerance', type=int, default=0, help='Allowed difference per channel')
+    argument_parser.add_argument('--max-different-pixels', type=int, default=0)
+    argument_parser.add_argument('--failed', metavar='DIRECTORY', help='Where frames differing from golden ones go')
+    return argument_parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
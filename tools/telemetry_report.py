@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import sys
+from argparse import ArgumentParser
+from typing import Any, Dict
+
+from engine.profiler import Percentiles, format_percentiles
+from engine.telemetry import load_telemetry, summarize, find_regressions
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    records = load_telemetry(arguments.telemetry)
+    summary = summarize(records)
+    print_summary(f'{len(records)} frames', summary)
+    if not arguments.baseline:
+        return
+
+    baseline_records = load_telemetry(arguments.baseline)
+    baseline = summarize(baseline_records)
+    print()
+    print_summary(f'baseline {len(baseline_records)}', baseline)
+    regressions = find_regressions(summary, baseline, arguments.tolerance)
+    for regression in regressions:
+        print(f'{regression.field} {regression.percentile}: {regression.value:.3f}, '
+              f'{regression.baseline:.3f} in the baseline')
+    if regressions:
+        sys.exit(f'{len(regressions)} regressions of more than {arguments.tolerance:.0%} against the baseline')
+
+
+def print_summary(title: str, summary: Dict[str, Percentiles]) -> None:
+    print(f'{title:<16}' + ''.join(f'{name:>9}' for name in Percentiles._fields))
+    for field, percentiles in summary.items():
+        print(format_percentiles(field.replace('_', ' '), percentiles))
+
+
+def parse_arguments() -> Any:
+    argument_parser = ArgumentParser(
+        description='Summarizes a telemetry file written with --telemetry into percentiles, '
+                    'and fails when they are worse than in a baseline run.')
+    argument_parser.add_argument('telemetry', metavar='FILE')
+    argument_parser.add_argument('--baseline', metavar='FILE')
+    argument_parser.add_argument(
+        '--tolerance', type=float, default=0.1, help='How much worse than the baseline is allowed, as a fraction')
+    return argument_parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()